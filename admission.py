@@ -0,0 +1,61 @@
+"""Admission control: a bounded number of requests in flight, with a bounded wait queue."""
+from contextlib import contextmanager
+import threading
+import time
+
+
+class Overloaded(Exception):
+    """The request is shed: the queue is full ("queue_full"), or it waited too long ("timeout")."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionGate:
+    """Let `limit` requests in at most, and `queue_size` requests wait at most `timeout` seconds for their turn.
+
+    The other requests are refused at once, instead of piling up behind the slow ones. A limit of 0 (or None) lets
+    all the requests in. The limits are of one process: each process of the server has its own gates.
+    """
+
+    def __init__(self, limit, queue_size=0, timeout=0.0):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = {"queue_full": 0, "timeout": 0}
+        self._condition = threading.Condition()
+
+    def _refuse(self, reason):
+        self.shed[reason] += 1
+        raise Overloaded(reason)
+
+    @contextmanager
+    def admit(self):
+        """Hold a place for the block, waiting for it if needed. Raise Overloaded if there is none."""
+        if not self.limit:
+            yield
+            return
+        with self._condition:
+            if self.in_flight >= self.limit:
+                if self.waiting >= self.queue_size:
+                    self._refuse("queue_full")
+                self.waiting += 1
+                try:
+                    deadline = time.monotonic() + self.timeout
+                    while self.in_flight >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._refuse("timeout")
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify()
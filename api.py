@@ -0,0 +1,166 @@
+"""Read API for the clubs and the competitions, in json or msgpack, with field selection and cursor pagination."""
+import base64
+import hmac
+import json
+
+from flask import Blueprint, Response, current_app, request, jsonify
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional: without it, only json is served.
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+CLUB_FIELDS = ("name", "email", "points")
+# The email of a club is its login: it is given to the clients with the API token only.
+PUBLIC_CLUB_FIELDS = ("name", "points")
+COMPETITION_FIELDS = ("name", "date", "number_of_places")
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except (ValueError, KeyError, TypeError):
+        raise ApiError(400, "Invalid cursor.")
+    if not isinstance(offset, int) or offset < 0:
+        raise ApiError(400, "Invalid cursor.")
+    return offset
+
+
+def use_msgpack():
+    """Choose msgpack if it is asked with ?format=msgpack or preferred in the Accept header."""
+    requested_format = request.args.get("format")
+    if requested_format is not None:
+        if requested_format not in ("json", "msgpack"):
+            raise ApiError(400, f"Unknown format: {requested_format}.")
+        wanted = requested_format == "msgpack"
+    else:
+        best = request.accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES, default=JSON_MIMETYPE)
+        wanted = best in MSGPACK_MIMETYPES
+    if wanted and msgpack is None:
+        raise ApiError(406, "msgpack is not installed on the server.")
+    return wanted
+
+
+def selected_fields(allowed_fields):
+    """Get the fields asked with ?fields=name,points (all the fields by default)."""
+    fields = request.args.get("fields")
+    if not fields:
+        return allowed_fields
+    fields = tuple(field.strip() for field in fields.split(","))
+    unknown_fields = [field for field in fields if field not in allowed_fields]
+    if unknown_fields:
+        raise ApiError(400, f"Unknown fields: {', '.join(unknown_fields)}.")
+    return fields
+
+
+def check_api_token():
+    """Refuse the request unless it has the header `Authorization: Bearer <API_TOKEN>`. Without API_TOKEN in the
+    config, every request is refused."""
+    token = current_app.config.get("API_TOKEN")
+    authorization = request.headers.get("Authorization", "")
+    if not token or not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        raise ApiError(401, "A valid API token is required.")
+
+
+def page_size():
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, "Invalid limit.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ApiError(400, f"The limit must be between 1 and {MAX_PAGE_SIZE}.")
+    return limit
+
+
+def selected_item(record, fields):
+    """Give the fields of a record, in the json schema of the data files."""
+    data = record.to_json()
+    return {field: data[field] for field in fields}
+
+
+def stream_page(records, fields, next_cursor, as_msgpack):
+    """Encode a page record by record, so that the response is sent while it is built."""
+    if as_msgpack:
+        packer = msgpack.Packer()
+        yield packer.pack_map_header(2) + packer.pack("items") + packer.pack_array_header(len(records))
+        for record in records:
+            yield packer.pack(selected_item(record, fields))
+        yield packer.pack("next_cursor") + packer.pack(next_cursor)
+    else:
+        yield '{"items":['
+        for index, record in enumerate(records):
+            item = json.dumps(selected_item(record, fields), separators=(',', ':'))
+            yield item if index == 0 else "," + item
+        yield '],"next_cursor":' + json.dumps(next_cursor) + '}'
+
+
+def list_response(records, allowed_fields):
+    fields = selected_fields(allowed_fields)
+    limit = page_size()
+    cursor = request.args.get("cursor")
+    offset = decode_cursor(cursor) if cursor else 0
+    page = records[offset:offset + limit]
+    next_cursor = encode_cursor(offset + limit) if offset + limit < len(records) else None
+    as_msgpack = use_msgpack()
+    return Response(stream_page(page, fields, next_cursor, as_msgpack),
+                    mimetype=MSGPACK_MIMETYPES[0] if as_msgpack else JSON_MIMETYPE)
+
+
+def record_response(record, allowed_fields, not_found_message):
+    fields = selected_fields(allowed_fields)
+    as_msgpack = use_msgpack()
+    if record is None:
+        raise ApiError(404, not_found_message)
+    item = selected_item(record, fields)
+    if as_msgpack:
+        return Response(msgpack.packb(item), mimetype=MSGPACK_MIMETYPES[0])
+    return jsonify(item)
+
+
+def create_api_blueprint(get_repository):
+    """Create the blueprint of the API, reading the data from the repository given by `get_repository()`."""
+    api = Blueprint("api", __name__)
+
+    @api.errorhandler(ApiError)
+    def api_error(error):
+        return jsonify(error=error.message), error.status_code
+
+    @api.route("/clubs")
+    def list_clubs():
+        return list_response(get_repository().clubs, PUBLIC_CLUB_FIELDS)
+
+    @api.route("/clubs/<name>")
+    def get_club(name):
+        return record_response(get_repository().club_by_name(name), PUBLIC_CLUB_FIELDS, "Club not found.")
+
+    @api.route("/clubs/by-email/<email>")
+    def get_club_by_email(email):
+        # Checked first: without the token, a known email and an unknown one get the same response.
+        check_api_token()
+        return record_response(get_repository().club_by_email(email), CLUB_FIELDS, "Club not found.")
+
+    @api.route("/competitions")
+    def list_competitions():
+        return list_response(get_repository().competitions, COMPETITION_FIELDS)
+
+    @api.route("/competitions/<name>")
+    def get_competition(name):
+        return record_response(get_repository().competition_by_name(name), COMPETITION_FIELDS,
+                               "Competition not found.")
+
+    return api
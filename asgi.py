@@ -0,0 +1,197 @@
+"""The html pages of server.py as an ASGI application, for an async server: python -m uvicorn asgi:application
+
+The data is read and written, and the pages rendered, in a bounded pool of threads (ASYNC_IO_THREADS, 16 by
+default): meanwhile, the event loop serves the other connections. The pages are rendered with the templates of the
+Flask app and give the same responses as its routes `/`, `/showSummary`, `/book/<competition>/<club>`,
+`/purchasePlaces` and `/logout`. The other routes, the metrics, the profiling and the admission control are those of
+the Flask app only.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+from urllib.parse import parse_qsl
+
+from flask import render_template, flash, redirect, url_for, abort, request as flask_request
+from werkzeug.exceptions import HTTPException, NotFound
+
+import server
+from pagination import Page
+from server import app, BOOKING_COMPLETE_MESSAGE
+
+ASYNC_IO_THREADS = int(os.environ.get('ASYNC_IO_THREADS', 16))
+
+executor = ThreadPoolExecutor(max_workers=ASYNC_IO_THREADS, thread_name_prefix="data-io")
+
+
+async def in_executor(function, *args):
+    """Run the blocking function in the pool of threads of the data."""
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(function, *args))
+
+
+class Request:
+    """The request of an ASGI scope, with its body."""
+
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        self.form = dict(parse_qsl(body.decode())) if body else {}
+
+    def context(self):
+        """A request context of the Flask app for this request: url_for(), the flashed messages and the session
+        work as in the Flask app."""
+        host = self.headers.get("host", "localhost")
+        return app.test_request_context(
+            self.path, base_url=f'{self.scope.get("scheme", "http")}://{host}{self.scope.get("root_path", "")}',
+            method=self.method, query_string=self.scope.get("query_string", b"").decode(), data=self.body,
+            headers=self.headers)
+
+
+def respond(request, view):
+    """Give the status, the headers and the body of the response of `view()`, which is run as a Flask view."""
+    with request.context():
+        try:
+            response = app.make_response(view())
+        except HTTPException as exception:
+            response = exception.get_response()
+        response = app.process_response(response)
+        return response.status_code, response.get_wsgi_headers(flask_request.environ), response.get_data()
+
+
+async def render(request, view):
+    """Give the response of `view()` as respond() does, rendered in the pool of threads: a large page doesn't hold
+    the event loop."""
+    return await in_executor(respond, request, view)
+
+
+def raise_exception(exception):
+    raise exception
+
+
+async def index(request):
+    data = await in_executor(server.page_data)
+
+    def view():
+        number, limit = server.request_page()
+        return render_template('index.html', clubs=data.clubs, clubs_page=Page(data.clubs, number, limit))
+
+    return await render(request, view)
+
+
+async def show_summary(request):
+    email = request.form.get('email')
+    if email is None:
+        return respond(request, lambda: abort(400))
+    club = await in_executor(server.find_club_by_email, email)
+    if club is None:
+        return respond(request, lambda: abort(404, "Sorry, that email wasn't found."))
+    data = await in_executor(server.page_data)
+
+    def view():
+        number, limit = server.request_page()
+        upcoming = bool(flask_request.values.get('upcoming'))
+        return render_template('welcome.html', **server.welcome_context(club, data, number, limit, upcoming))
+
+    return await render(request, view)
+
+
+async def book(request, competition, club):
+    repository = await in_executor(server.page_data)
+    # With a record index, the club is read from the file.
+    found_club = await in_executor(repository.club_by_name, club)
+    found_competition = repository.competition_by_name(competition)
+
+    def view():
+        if found_club and found_competition:
+            return render_template('booking.html', club=found_club, competition=found_competition)
+        flash("Something went wrong - please try again")
+        return render_template('welcome.html',
+                               **server.welcome_context(club, repository, limit=app.config['PAGE_SIZE']))
+
+    return await render(request, view)
+
+
+async def purchase_places(request):
+    fields = [request.form.get(name) for name in ('club', 'competition', 'places')]
+    try:
+        booking = (fields[0], fields[1], int(fields[2]))
+    except (TypeError, ValueError):
+        return respond(request, lambda: abort(400))
+    if server.booking_queue is not None:
+        refusal, club, repository = await in_executor(server.booking_queue.submit, booking)
+    else:
+        # The same booking as the Flask app, as a group of one booking.
+        refusal, club, repository = (await in_executor(server.commit_bookings, [booking]))[0]
+
+    def view():
+        if refusal is not None:
+            abort(refusal.status_code, description=refusal.message)
+        flash(BOOKING_COMPLETE_MESSAGE)
+        return render_template('welcome.html', **server.welcome_context(club, repository,
+                                                                         limit=app.config['PAGE_SIZE']))
+
+    return await render(request, view)
+
+
+async def logout(request):
+    return respond(request, lambda: redirect(url_for('index')))
+
+
+VIEWS = {
+    'index': index,
+    'show_summary': show_summary,
+    'book': book,
+    'purchase_places': purchase_places,
+    'logout': logout,
+}
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await in_executor(server.load_templates)
+            if app.config['WARMUP']:
+                await in_executor(server.warmup)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported scope type: {scope['type']}")
+    request = Request(scope, await read_body(receive))
+    # The url rules of the Flask app: the same 404 and 405 errors, and the same arguments.
+    adapter = app.url_map.bind(request.headers.get("host", "localhost"))
+    try:
+        endpoint, arguments = adapter.match(request.path, request.method)
+        view = VIEWS.get(endpoint)
+        if view is None:
+            raise NotFound()
+    except HTTPException as exception:
+        status, headers, body = respond(request, functools.partial(raise_exception, exception))
+    else:
+        status, headers, body = await view(request, **arguments)
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,88 @@
+"""Compare the Flask app (threaded server) and asgi.py (under uvicorn) with many concurrent browsing connections.
+
+Run from the project root: python benchmarks/async_server.py [--connections 1000] [--duration 10] [--clubs 1000]
+
+Each connection asks the index page, then the welcome page of a club, again and again (one request per TCP
+connection, as the Flask development server closes them). uvicorn must be installed.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import free_port, generate, start_server  # noqa: E402
+
+PAGE_SIZE = 100
+
+
+def http_request(port, number):
+    if number % 2 == 0:
+        return f"GET / HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n\r\n".encode()
+    body = urlencode({"email": f"club{number % 1000}@gudlft.com"})
+    return (f"POST /showSummary HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nConnection: close\r\n"
+            f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n\r\n{body}").encode()
+
+
+async def connection(port, number, deadline, latencies, errors):
+    requests = 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(http_request(port, number + requests))
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            if not response.startswith(b"HTTP/1.1 200") and not response.startswith(b"HTTP/1.0 200"):
+                raise ValueError(response[:40])
+            latencies.append(time.perf_counter() - start)
+        except (OSError, ValueError):
+            errors.append(1)
+            await asyncio.sleep(0.1)
+        requests += 1
+
+
+async def load(port, connections, duration):
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(connection(port, number, deadline, latencies, errors) for number in range(connections)))
+    return sorted(latencies), len(errors)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def main(arguments):
+    print(f"{arguments.clubs} clubs, {arguments.connections} connections, {arguments.duration} s")
+    print(f"{'server':>8} {'requests/s':>11} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        dataset = os.path.join(directory, "dataset")
+        generate(dataset, arguments.clubs, 20)
+        for server_type in ("wsgi", "asgi"):
+            data_directory = os.path.join(directory, server_type)
+            shutil.copytree(dataset, data_directory)
+            port = free_port()
+            server = start_server(data_directory, port, PAGE_SIZE, server_type)
+            try:
+                latencies, errors = asyncio.run(load(port, arguments.connections, arguments.duration))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{server_type:>8} {len(latencies) / arguments.duration:>11.1f} "
+                  f"{percentile(latencies, 0.5) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--duration", type=int, default=10)
+    parser.add_argument("--clubs", type=int, default=1000)
+    main(parser.parse_args())
@@ -0,0 +1,123 @@
+"""Time the steps of the requests of server.py, on generated clubs and competitions of several sizes.
+
+Run from the project root: python benchmarks/hot_paths.py [--sizes 10 1000 ...] [--output hot_paths.json]
+
+The app runs in a temporary directory, on generated clubs.json and competitions.json of `size` records each.
+The results (best and mean duration of each step, for each size) are written in the output file (json), to compare
+the scaling curves of releases, and the step which takes the longest time is given for each size.
+"""
+import argparse
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import write_json  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+# Each step is run again until it took this time, in seconds (and at least once).
+MIN_DURATION = 0.5
+MAX_REPEAT = 1000
+
+
+def write_data(size):
+    write_json("clubs.json", {"clubs": [
+        {"name": f"Club {index}", "email": f"club{index}@gudlft.com", "points": str(index % 100)}
+        for index in range(size)
+    ]})
+    write_json("competitions.json", {"competitions": [
+        {"name": f"Competition {index}", "date": f"2099-{index % 12 + 1:02}-15 10:00:00", "number_of_places": "25"}
+        for index in range(size)
+    ]})
+
+
+def time_step(function):
+    """Give the best and the mean duration of function(), in seconds, and the number of runs.
+    A first run, not counted, fills the caches (e.g. the repository rebuilt after a load of the data)."""
+    function()
+    durations = []
+    while not durations or (sum(durations) < MIN_DURATION and len(durations) < MAX_REPEAT):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations), sum(durations) / len(durations), len(durations)
+
+
+def steps(server, size):
+    """Give the steps to time, by name."""
+    from flask import render_template
+
+    clubs = server.load_clubs()
+    competitions = server.load_competitions()
+    repository = server.get_repository()
+    club_name, competition_name = f"Club {size // 2}", f"Competition {size // 2}"
+    board = server.app.jinja_env.get_template("includes/clubs_board_snippet.html")
+
+    def load_clubs():
+        server.invalidate_data_cache()
+        return server.load_clubs()
+
+    def load_competitions():
+        server.invalidate_data_cache()
+        return server.load_competitions()
+
+    def booking_check():
+        # As purchase_places does it, with the repository of the cached data.
+        repository = server.get_repository()
+        club = repository.club_by_name(club_name)
+        competition = repository.competition_by_name(competition_name)
+        return server.check_booking(repository, club, competition, 1)
+
+    def render_welcome():
+        club = repository.club_by_name(club_name)
+        return render_template("welcome.html", **server.welcome_context(club, repository))
+
+    return {
+        "load_clubs": load_clubs,
+        "load_competitions": load_competitions,
+        "build_dict": lambda: server.build_dict(clubs, "name"),
+        "booking_check": booking_check,
+        "update_clubs_json": lambda: server.update_clubs_json({"clubs": clubs}),
+        "update_competitions_json": lambda: server.update_competitions_json({"competitions": competitions}),
+        "render_welcome": render_welcome,
+        "render_clubs_board": lambda: board.render(clubs=repository.clubs),
+    }
+
+
+def main(sizes, output):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        # The storage of the app reads and writes clubs.json and competitions.json of the working directory.
+        os.chdir(directory)
+        import server
+
+        print(f"{'size':>8} {'step':>25} {'best (ms)':>12} {'mean (ms)':>12} {'runs':>6}")
+        for size in sizes:
+            write_data(size)
+            server.invalidate_data_cache()
+            with server.app.test_request_context("/"):
+                size_results = []
+                for name, function in steps(server, size).items():
+                    best, mean, repeat = time_step(function)
+                    size_results.append({"step": name, "size": size, "best": best, "mean": mean, "runs": repeat})
+                    print(f"{size:>8} {name:>25} {best * 1000:>12.3f} {mean * 1000:>12.3f} {repeat:>6}")
+            slowest = max(size_results, key=lambda result: result["best"])
+            print(f"{size:>8} {'slowest: ' + slowest['step']:>25}")
+            results += size_results
+    write_json(output, {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "results": results,
+    })
+    print(f"Results written in {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--output", default="hot_paths.json")
+    arguments = parser.parse_args()
+    main(arguments.sizes, os.path.abspath(arguments.output))
@@ -0,0 +1,235 @@
+"""Load tests of the app with locust, on generated data, with results that can be compared from one run to another.
+
+Run from the project root:
+
+    python benchmarks/load_test.py generate --clubs 100000 --directory load_test_data
+    python benchmarks/load_test.py run --scenario mixed --directory load_test_data --results results.json
+    python benchmarks/load_test.py compare results.json --baseline baseline.json --threshold 0.1
+
+`run` starts the app on a copy of the dataset (the dataset itself and clubs.json and competitions.json of the
+project are never written), runs the users of locustfile.py headless for a fixed duration, then writes the number
+of requests per second and the 50th, 95th and 99th percentiles of the response times in the results file (json).
+`compare` (or `run --baseline`) exits with the status 1 when the results regress by more than the threshold.
+The environment variables of the app (STORAGE_BACKEND, BOOKING_JOURNAL, JSON_FORMAT...) are given to it.
+"""
+import argparse
+import csv
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import read_json, write_json  # noqa: E402
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = {
+    "browsing": "BrowsingUser",
+    "booking-storm": "BookingStormUser",
+    "mixed": "MixedUser",
+}
+# Measures compared with the baseline, and whether a greater value is a regression.
+MEASURES = {"rps": False, "p50": True, "p95": True, "p99": True}
+# Competition booked by all the users in the booking scenarios.
+HOT_COMPETITION = "Hot Competition"
+SERVER_START_TIMEOUT = 120
+
+
+def generate(directory, number_of_clubs, number_of_competitions):
+    """Write clubs.json, competitions.json and the manifest dataset.json of a dataset in the directory."""
+    os.makedirs(directory, exist_ok=True)
+    write_json(os.path.join(directory, "clubs.json"), {"clubs": [
+        {"name": f"Club {index}", "email": f"club{index}@gudlft.com", "points": "1000"}
+        for index in range(number_of_clubs)
+    ]})
+    # The competitions are in the future, and the hot one has enough places for the whole run.
+    competitions = [{"name": HOT_COMPETITION, "date": "2099-01-01 10:00:00", "number_of_places": str(10 ** 9)}]
+    competitions += [
+        {"name": f"Competition {index}", "date": f"2099-{index % 12 + 1:02}-15 10:00:00", "number_of_places": "100"}
+        for index in range(1, number_of_competitions)
+    ]
+    write_json(os.path.join(directory, "competitions.json"), {"competitions": competitions})
+    write_json(os.path.join(directory, "dataset.json"), {
+        "clubs": number_of_clubs,
+        "competitions": [competition["name"] for competition in competitions],
+    })
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port, server):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The app stopped with the status {server.returncode}.")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"The app didn't start in {SERVER_START_TIMEOUT} s.")
+
+
+def start_server(data_directory, port, page_size, server_type="wsgi"):
+    """Start the app on the data of the directory (its working directory): the Flask app ("wsgi"), without the
+    reloader, or the ASGI application of asgi.py under uvicorn ("asgi")."""
+    env = dict(os.environ, FLASK_APP=os.path.join(PROJECT_DIRECTORY, "server.py"), FLASK_ENV="production")
+    if page_size:
+        env["PAGE_SIZE"] = str(page_size)
+    if server_type == "asgi":
+        command = [sys.executable, "-m", "uvicorn", "asgi:application", "--app-dir", PROJECT_DIRECTORY,
+                   "--port", str(port), "--no-access-log"]
+    else:
+        command = [sys.executable, "-m", "flask", "run", "--port", str(port), "--no-reload", "--with-threads"]
+    server = subprocess.Popen(command, cwd=data_directory, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(port, server)
+    except Exception:
+        server.kill()
+        raise
+    return server
+
+
+def measures(row):
+    """Read the measures of one row of the stats file of locust."""
+    return {
+        "requests": int(row["Request Count"]),
+        "failures": int(row["Failure Count"]),
+        "rps": float(row["Requests/s"]),
+        "p50": float(row["50%"]),
+        "p95": float(row["95%"]),
+        "p99": float(row["99%"]),
+    }
+
+
+def read_locust_stats(path):
+    """Give the measures of all the requests, then of each endpoint, from the stats file of locust."""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    total = next(measures(row) for row in rows if row["Name"] == "Aggregated")
+    endpoints = {f'{row["Type"]} {row["Name"]}': measures(row) for row in rows if row["Name"] != "Aggregated"}
+    return total, endpoints
+
+
+def run(arguments):
+    manifest = read_json(os.path.join(arguments.directory, "dataset.json"))
+    with tempfile.TemporaryDirectory() as run_directory:
+        # Each run starts from the same data: the bookings of a run don't change the next one.
+        data_directory = os.path.join(run_directory, "data")
+        shutil.copytree(arguments.directory, data_directory)
+        port = free_port()
+        server = start_server(data_directory, port, arguments.page_size, arguments.server)
+        try:
+            stats_prefix = os.path.join(run_directory, "stats")
+            subprocess.run([
+                arguments.locust, "-f", os.path.join(PROJECT_DIRECTORY, "locustfile.py"), "--headless",
+                "--users", str(arguments.users), "--spawn-rate", str(arguments.spawn_rate),
+                "--run-time", f"{arguments.duration}s", "--host", f"http://127.0.0.1:{port}",
+                "--csv", stats_prefix, "--only-summary", "--exit-code-on-error", "0",
+                SCENARIOS[arguments.scenario],
+            ], check=True, env=dict(os.environ, LOAD_TEST_DATA=data_directory, LOAD_TEST_SEED=str(arguments.seed)))
+        finally:
+            server.terminate()
+            server.wait()
+        total, endpoints = read_locust_stats(stats_prefix + "_stats.csv")
+    results = {
+        "scenario": arguments.scenario,
+        "server": arguments.server,
+        "clubs": manifest["clubs"],
+        "competitions": len(manifest["competitions"]),
+        "users": arguments.users,
+        "duration": arguments.duration,
+        "seed": arguments.seed,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "total": total,
+        "endpoints": endpoints,
+    }
+    write_json(arguments.results, results)
+    print(f"{arguments.scenario}: {total['rps']:.1f} requests/s, p50 {total['p50']:.0f} ms, "
+          f"p95 {total['p95']:.0f} ms, p99 {total['p99']:.0f} ms, {total['failures']} failures "
+          f"-> {arguments.results}")
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """Give the messages of the measures of all the requests worse than the baseline by more than the threshold."""
+    keys = ("scenario", "server", "clubs", "users")
+    if [results[key] for key in keys] != [baseline[key] for key in keys]:
+        return ["The results and the baseline are not of the same scenario, server, number of clubs and users."]
+    messages = []
+    for measure, greater_is_worse in MEASURES.items():
+        value, reference = results["total"][measure], baseline["total"][measure]
+        change = (value - reference) / reference if reference else 0
+        if (change if greater_is_worse else -change) > threshold:
+            messages.append(f"{measure}: {value:.1f} instead of {reference:.1f} ({change:+.0%})")
+    return messages
+
+
+def compare(results, baseline_path, threshold):
+    messages = regressions(results, read_json(baseline_path), threshold)
+    for message in messages:
+        print(f"Regression of {results['scenario']}: {message}")
+    if not messages:
+        print(f"No regression of more than {threshold:.0%} against {baseline_path}.")
+    return not messages
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="Generate a dataset.")
+    generate_parser.add_argument("--clubs", type=int, default=1000, help="Number of clubs (1000 by default).")
+    generate_parser.add_argument("--competitions", type=int, default=100,
+                                 help="Number of competitions (100 by default).")
+    generate_parser.add_argument("--directory", default="load_test_data")
+
+    run_parser = commands.add_parser("run", help="Run a scenario on a dataset.")
+    run_parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    run_parser.add_argument("--directory", default="load_test_data", help="Directory of the dataset.")
+    run_parser.add_argument("--users", type=int, default=20)
+    run_parser.add_argument("--spawn-rate", type=float, default=20)
+    run_parser.add_argument("--duration", type=int, default=60, help="Duration in seconds (60 by default).")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--page-size", type=int, default=100,
+                            help="PAGE_SIZE of the app (100 by default, 0 to display all the records).")
+    run_parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi",
+                            help="The Flask app (wsgi, the default) or asgi.py under uvicorn (asgi).")
+    run_parser.add_argument("--locust", default="locust", help="Command of locust.")
+    run_parser.add_argument("--results", default="load_test_results.json")
+    run_parser.add_argument("--baseline", help="Results to compare with.")
+    run_parser.add_argument("--threshold", type=float, default=0.1)
+
+    compare_parser = commands.add_parser("compare", help="Compare results with a baseline.")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--baseline", required=True)
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="Tolerated regression, 0.1 (10%%) by default.")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    arguments = parse_arguments(argv)
+    if arguments.command == "generate":
+        generate(arguments.directory, arguments.clubs, arguments.competitions)
+        print(f"Wrote {arguments.clubs} clubs and {arguments.competitions} competitions in {arguments.directory}")
+        return 0
+    if arguments.command == "run":
+        results = run(arguments)
+        if arguments.baseline and not compare(results, arguments.baseline, arguments.threshold):
+            return 1
+        return 0
+    return 0 if compare(read_json(arguments.results), arguments.baseline, arguments.threshold) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
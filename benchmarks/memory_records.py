@@ -0,0 +1,49 @@
+"""Compare the memory used by clubs kept as json dicts and as Club records.
+
+Run from the project root: python benchmarks/memory_records.py [number of clubs]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Club  # noqa: E402
+
+DEFAULT_NUMBER_OF_CLUBS = 1_000_000
+
+
+def json_clubs(number_of_clubs):
+    return [
+        {"name": f"Club {index}", "email": f"club{index}@gudlft.com", "points": str(index % 100)}
+        for index in range(number_of_clubs)
+    ]
+
+
+def measure(build):
+    """Give the result of build() and the memory it allocated, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main(number_of_clubs):
+    clubs, dicts_size = measure(lambda: json_clubs(number_of_clubs))
+    # The names and the emails are shared by both lists: only the records and the points are counted.
+    records, records_size = measure(lambda: [Club.from_json(club) for club in clubs])
+    _, copies_size = measure(lambda: [dict(club) for club in clubs])
+
+    print(f"{number_of_clubs} clubs")
+    print(f"json dicts (name, email and points strings): {dicts_size / 2 ** 20:8.1f} MiB")
+    print(f"  of which the dicts themselves:              {copies_size / 2 ** 20:8.1f} MiB")
+    print(f"Club records (int points):                    {records_size / 2 ** 20:8.1f} MiB")
+    print(f"Record / dict: {records_size / copies_size:.2f}")
+    return records
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUMBER_OF_CLUBS)
@@ -0,0 +1,64 @@
+"""Compare a login (finding a club by email) with all the clubs loaded, and through the record index.
+
+Run from the project root: python benchmarks/record_index.py [number of clubs]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from record_index import RecordIndex  # noqa: E402
+from repository import Repository  # noqa: E402
+from storage import JsonStorage  # noqa: E402
+from serialization import write_json  # noqa: E402
+
+DEFAULT_NUMBER_OF_CLUBS = 1_000_000
+LOOKUPS = 1000
+
+
+def measure(function):
+    """Give the duration of function() and the peak of the memory it allocated."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak
+
+
+def main(number_of_clubs):
+    with tempfile.TemporaryDirectory() as directory:
+        clubs_path = os.path.join(directory, "clubs.json")
+        write_json(clubs_path, {"clubs": [
+            {"name": f"Club {index}", "email": f"club{index}@gudlft.com", "points": "13"}
+            for index in range(number_of_clubs)
+        ]})
+        emails = [f"club{index * number_of_clubs // LOOKUPS}@gudlft.com" for index in range(LOOKUPS)]
+        print(f"{number_of_clubs} clubs, {os.path.getsize(clubs_path) / 2 ** 20:.0f} MiB of json")
+
+        def load_all():
+            clubs = JsonStorage(clubs_path, journal_path=None).load_clubs()
+            return Repository(clubs, []).club_by_email(emails[0])
+
+        _, duration, peak = measure(load_all)
+        print(f"first login, all the clubs loaded:  {duration:8.3f} s, peak {peak / 2 ** 20:8.1f} MiB")
+
+        index = RecordIndex(clubs_path, "clubs", ("email", "name"))
+        _, duration, peak = measure(lambda: index.find("email", emails[0]))
+        print(f"first login, index built:           {duration:8.3f} s, peak {peak / 2 ** 20:8.1f} MiB")
+
+        index = RecordIndex(clubs_path, "clubs", ("email", "name"))
+        _, duration, peak = measure(lambda: index.find("email", emails[0]))
+        print(f"first login of a new process:       {duration:8.3f} s, peak {peak / 2 ** 20:8.1f} MiB")
+
+        _, duration, peak = measure(lambda: [index.find("email", email) for email in emails])
+        print(f"next logins, through the index:     {duration / LOOKUPS * 1e6:8.1f} us each, "
+              f"peak {peak / 2 ** 20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUMBER_OF_CLUBS)
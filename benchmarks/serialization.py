@@ -0,0 +1,51 @@
+"""Compare the write and read throughput of the json formats, on generated clubs files of several sizes.
+
+Run from the project root: python benchmarks/serialization.py [size ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialization  # noqa: E402
+from serialization import read_json, write_json, JSON_FORMATS  # noqa: E402
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def clubs_data(number_of_clubs):
+    return {"clubs": [
+        {"name": f"Club {index}", "email": f"club{index}@gudlft.com", "points": str(index % 100)}
+        for index in range(number_of_clubs)
+    ]}
+
+
+def best_time(function, repeat):
+    """Give the best duration of `repeat` calls, in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def main(sizes):
+    print(f"orjson: {'installed' if serialization.orjson is not None else 'not installed'}")
+    print(f"{'clubs':>8} {'format':>8} {'size (KiB)':>11} {'write (rec/s)':>14} {'read (rec/s)':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clubs.json")
+        for size in sizes:
+            data = clubs_data(size)
+            repeat = max(3, 100_000 // size)
+            for json_format in JSON_FORMATS:
+                write_time = best_time(lambda: write_json(path, data, json_format), repeat)
+                read_time = best_time(lambda: read_json(path), repeat)
+                print(f"{size:>8} {json_format:>8} {os.path.getsize(path) / 1024:>11.0f} "
+                      f"{size / write_time:>14.0f} {size / read_time:>13.0f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
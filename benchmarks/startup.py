@@ -0,0 +1,98 @@
+"""Time the start of a worker: the import of server.py, create_app(), and its first requests.
+
+Run from the project root: python benchmarks/startup.py [--clubs 1000 100000] [--runs 5]
+
+The ways to start are:
+    - lazy: the app of server.py, as with FLASK_APP=server.py: the first requests load the data and the templates,
+    - create_app: create_app() loads (and compiles) the templates,
+    - bytecode_cache: create_app() loads the templates compiled by `flask compile-templates` (TEMPLATE_CACHE_DIR),
+    - warmup: the same, with WARMUP: create_app() loads the data too.
+
+Each run is a new Python process, on generated clubs.json and competitions.json (in a temporary directory given by
+CLUBS_PATH and COMPETITIONS_PATH). The first requests are sent through the test client of Flask: their time is the
+time of the app only. The median of the runs is given, in milliseconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import generate  # noqa: E402
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = ("import", "create_app", "first_index", "first_summary", "second_summary")
+MODES = ("lazy", "create_app", "bytecode_cache", "warmup")
+
+
+def worker(mode):
+    """Start the app as a new worker does, and give the duration of each step, in seconds."""
+    durations = {}
+    start = time.perf_counter()
+    import server
+    durations["import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app = server.app if mode == "lazy" else server.create_app({"WARMUP": mode == "warmup"})
+    client = app.test_client()
+    durations["create_app"] = time.perf_counter() - start
+
+    for step, path, data in (("first_index", "/", None),
+                             ("first_summary", "/showSummary", {"email": "club1@gudlft.com"}),
+                             ("second_summary", "/showSummary", {"email": "club2@gudlft.com"})):
+        start = time.perf_counter()
+        response = client.open(path, method="POST" if data else "GET", data=data)
+        response.get_data()
+        durations[step] = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{path}: {response.status}")
+    return durations
+
+
+def worker_env(data_directory, mode):
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIRECTORY, PAGE_SIZE="100",
+               CLUBS_PATH=os.path.join(data_directory, "clubs.json"),
+               COMPETITIONS_PATH=os.path.join(data_directory, "competitions.json"),
+               LOCK_DIR=os.path.join(data_directory, ".locks"))
+    env.pop("TEMPLATE_CACHE_DIR", None)
+    if mode in ("bytecode_cache", "warmup"):
+        env["TEMPLATE_CACHE_DIR"] = os.path.join(data_directory, "template_cache")
+    return env
+
+
+def run_worker(data_directory, mode):
+    output = subprocess.run([sys.executable, __file__, "--worker", mode], cwd=data_directory,
+                            env=worker_env(data_directory, mode), check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main(arguments):
+    print(f"{'clubs':>8} {'mode':>15} " + " ".join(f"{step:>15}" for step in STEPS) + "   (ms, median)")
+    for number_of_clubs in arguments.clubs:
+        with tempfile.TemporaryDirectory() as data_directory:
+            generate(data_directory, number_of_clubs, 20)
+            # The build step of a deployment.
+            subprocess.run([sys.executable, "-m", "flask", "compile-templates"], cwd=data_directory, check=True,
+                           env=dict(worker_env(data_directory, "bytecode_cache"), FLASK_APP="server"),
+                           stdout=subprocess.DEVNULL)
+            for mode in MODES:
+                runs = [run_worker(data_directory, mode) for _ in range(arguments.runs)]
+                medians = {step: statistics.median(run[step] for run in runs) * 1000 for step in STEPS}
+                print(f"{number_of_clubs:>8} {mode:>15} " + " ".join(f"{medians[step]:>15.1f}" for step in STEPS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clubs", type=int, nargs="+", default=[1000, 100_000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    if parsed.worker:
+        print(json.dumps(worker(parsed.worker)))
+    else:
+        main(parsed)
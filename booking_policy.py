@@ -0,0 +1,90 @@
+"""The booking rules, configured once and used to check one booking or many bookings at once."""
+from collections import namedtuple
+
+Refusal = namedtuple("Refusal", ["status_code", "reason", "message"])
+
+
+class BookingPolicy:
+    """Check bookings against the rules: past competition, a third of the club's points, MAX_PLACES,
+    available places of the competition, and negative number of places.
+
+    The three limits (club's points / points per place, max places, available places) are compared, and only
+    the error of the smallest one is given. For limits with the same value, the order above is used.
+    The refusals are built once: checking a booking allocates nothing.
+    """
+
+    # Reason codes of check_many(), in the order of the refusals.
+    ALLOWED = 0
+    PAST_COMPETITION = 1
+    AVAILABLE_CLUB_ABILITY = 2
+    MAX_PLACES = 3
+    AVAILABLE_PLACES = 4
+    NEGATIVE_PLACES = 5
+
+    def __init__(self, max_places, points_per_place):
+        self.max_places = max_places
+        self.points_per_place = points_per_place
+        self.past_competition = Refusal(400, "past_competition", "You can't book this past competition!")
+        self.available_club_ability = Refusal(
+            403, "available_club_ability", "You can't book more than a third of your available points!")
+        self.max_places_refusal = Refusal(403, "max_places", f"You can't book more than {max_places} places!")
+        self.available_places = Refusal(
+            403, "available_places", "You can't book more than available places of this competition!")
+        self.negative_places = Refusal(403, "negative_places", "You can't book a negative number of places")
+        # Indexed by the reason codes.
+        self.refusals = (
+            None,
+            self.past_competition,
+            self.available_club_ability,
+            self.max_places_refusal,
+            self.available_places,
+            self.negative_places,
+        )
+
+    def check(self, points, available_places, places_required, is_past):
+        """Check one booking. Return the Refusal of the first broken rule, or None if the booking is allowed."""
+        if is_past:
+            return self.past_competition
+        # The smallest limit; with the same value, the first one of the order is kept.
+        limit = int(points / self.points_per_place)
+        refusal = self.available_club_ability
+        if self.max_places < limit:
+            limit = self.max_places
+            refusal = self.max_places_refusal
+        if available_places < limit:
+            limit = available_places
+            refusal = self.available_places
+        if places_required > limit:
+            return refusal
+        if places_required < 0:
+            return self.negative_places
+        return None
+
+    def check_many(self, points, available_places, places_required, is_past):
+        """Check many bookings in one pass, with numpy arrays (or sequences) of the same length.
+
+        Return an array of reason codes: ALLOWED, or the code of the refusal check() would give for each booking.
+        """
+        # numpy is imported on the first use only: it is slow to import, and one booking doesn't need it.
+        try:
+            import numpy
+        except ImportError:
+            raise RuntimeError("numpy is needed to check many bookings at once.") from None
+        points = numpy.asarray(points, dtype=numpy.int64)
+        available_places = numpy.asarray(available_places, dtype=numpy.int64)
+        places_required = numpy.asarray(places_required, dtype=numpy.int64)
+        is_past = numpy.asarray(is_past, dtype=bool)
+
+        limits = numpy.stack([
+            numpy.trunc(points / self.points_per_place).astype(numpy.int64),
+            numpy.full(points.shape, self.max_places, dtype=numpy.int64),
+            available_places,
+        ])
+        # argmin gives the first of the smallest limits, as check() does.
+        smallest = limits.argmin(axis=0)
+        limit = numpy.take_along_axis(limits, smallest[numpy.newaxis], axis=0)[0]
+
+        codes = numpy.where(places_required < 0, self.NEGATIVE_PLACES, self.ALLOWED).astype(numpy.int8)
+        codes = numpy.where(places_required > limit, self.AVAILABLE_CLUB_ABILITY + smallest, codes)
+        codes = numpy.where(is_past, self.PAST_COMPETITION, codes)
+        return codes.astype(numpy.int8)
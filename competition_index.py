@@ -0,0 +1,29 @@
+"""Competitions sorted by date."""
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+
+class CompetitionIndex:
+    """Answer the questions about the dates of the competitions by binary search on the sorted dates."""
+
+    def __init__(self, competitions):
+        # Competitions with the same date keep the order of the list.
+        entries = sorted(
+            ((competition.date, position, competition)
+             for position, competition in enumerate(competitions)),
+            key=lambda entry: entry[:2],
+        )
+        self._dates = [date for date, _, _ in entries]
+        self._competitions = [competition for _, _, competition in entries]
+
+    @staticmethod
+    def is_past(competition, now=None):
+        return competition.date <= (now or datetime.now())
+
+    def upcoming(self, now=None):
+        """Get the competitions after now, sorted by date."""
+        return self._competitions[bisect_right(self._dates, now or datetime.now()):]
+
+    def between(self, start, end):
+        """Get the competitions from start to end (both included), sorted by date."""
+        return self._competitions[bisect_left(self._dates, start):bisect_right(self._dates, end)]
@@ -0,0 +1,136 @@
+"""Keep the parsed JSON data files in memory and reload them only when they change on disk."""
+import os
+import threading
+
+from locking import FileLock
+from serialization import read_json
+
+_version_lock = threading.Lock()
+_data_version = 0
+
+
+def data_version():
+    """Get the current data version. It is bumped every time the cached data changes."""
+    return _data_version
+
+
+def bump_data_version():
+    """Mark the cached data as changed and return the new data version."""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        return _data_version
+
+
+def file_signature(path):
+    """Define what identifies the content of a file on disk: its mtime, size and inode."""
+    try:
+        return stat_signature(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+def stat_signature(stat):
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class DataCache:
+    """Cache the list stored under `key` in the JSON file `path`.
+
+    The file is parsed again only if its signature (mtime, size or inode) changed since the last load,
+    or if the cache was invalidated. With a booking journal, the journal is watched too and its bookings
+    are replayed over the data of the file. With a record type, the json objects are converted into its records.
+    """
+
+    def __init__(self, path, key, journal=None, record_type=None):
+        self.path = path
+        self.key = key
+        self.journal = journal
+        self.record_type = record_type
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._data = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read and parse the file, without using the cache."""
+        data = read_json(self.path)[self.key]
+        if self.record_type is not None:
+            data = [self.record_type.from_json(record) for record in data]
+        if self.journal is not None:
+            self.journal.replay(self.key, data)
+        return data
+
+    def signature(self):
+        """Get the signature of the watched file, and of the journal if there is one."""
+        if self.journal is None:
+            return file_signature(self.path)
+        return file_signature(self.path), file_signature(self.journal.path)
+
+    def get(self, journal_locked=False):
+        """Get the cached data, reloading it first if the file changed on disk.
+
+        With a journal, the file and the journal are read under the lock of the journal (shared): a compaction
+        can't empty the journal between the two reads. `journal_locked` tells that the caller already holds it.
+        The lock of the journal is always taken before the lock of the cache, as compact() does.
+        """
+        signature = self.signature()
+        with self._lock:
+            if self._data is not None and signature == self._signature:
+                self.hits += 1
+                return self._data
+        if self.journal is None or journal_locked:
+            return self._get_or_reload(signature)
+        with FileLock(self.journal.path + ".lock", shared=True):
+            return self._get_or_reload(signature)
+
+    def _get_or_reload(self, signature):
+        with self._lock:
+            # Another thread may have reloaded the data while this one was waiting for the locks.
+            if self._data is not None and signature == self._signature:
+                self.hits += 1
+                return self._data
+            self.misses += 1
+            if self.misses > 1:
+                self.reloads += 1
+            self._reload()
+            return self._data
+
+    def _reload(self):
+        # The signature is taken again before reading, since the files may have changed while waiting
+        # for the lock. If a file changes during the read, the next call sees a new signature and loads it again.
+        signature = self.signature()
+        self._data = self.load()
+        self._signature = signature
+        self.version = bump_data_version()
+
+    def put(self, data, previous_signature=None, signature=None):
+        """Store data that has just been written to the file, so it is not parsed again.
+
+        If `previous_signature` (the signature taken just before writing) is given, the data must be the cached
+        data changed in place. If the cached data was reloaded meanwhile, or if another process wrote to the files
+        too, the cache is invalidated instead. `signature` is the signature just after writing, when it is known:
+        taking it again could include the writes of another process.
+        """
+        with self._lock:
+            if previous_signature is not None and (previous_signature != self._signature or data is not self._data):
+                self._data = None
+                self._signature = None
+            else:
+                self._data = data
+                self._signature = signature if signature is not None else self.signature()
+            self.version = bump_data_version()
+
+    def invalidate(self):
+        """Drop the cached data: the next call to get() reloads the file."""
+        with self._lock:
+            self._data = None
+            self._signature = None
+            self.version = bump_data_version()
+
+    def stats(self):
+        """Get the hits, misses and reloads counters."""
+        return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads}
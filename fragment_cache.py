@@ -0,0 +1,60 @@
+"""Cache rendered html fragments until the data they show changes."""
+from collections import OrderedDict
+import threading
+
+DEFAULT_MAX_FRAGMENTS = 256
+
+
+class FragmentCache:
+    """Keep one rendered fragment per name, with the data version it was rendered for.
+
+    The fragments of older versions are dropped when a newer version is rendered, and at most `max_fragments`
+    are kept: the least recently used are dropped first.
+    """
+
+    def __init__(self, max_fragments=DEFAULT_MAX_FRAGMENTS):
+        self.hits = 0
+        self.misses = 0
+        self.max_fragments = max_fragments
+        self._fragments = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_or_render(self, name, version, render):
+        """Get the fragment rendered for this data version, calling `render()` only if there is none yet.
+
+        The version must be read before the data is read by `render()`: then a fragment is never kept
+        with a version newer than its data.
+        """
+        fragment = self._fragments.get(name)
+        if fragment is not None and fragment[0] == version:
+            with self._lock:
+                self.hits += 1
+                if name in self._fragments:
+                    self._fragments.move_to_end(name)
+            return fragment[1]
+        html = render()
+        with self._lock:
+            self.misses += 1
+            if self._version is None or version > self._version:
+                # The fragments of the older versions won't be used anymore.
+                self._fragments.clear()
+                self._version = version
+            elif version < self._version:
+                # Rendered for an older version: not kept.
+                return html
+            self._fragments[name] = (version, html)
+            self._fragments.move_to_end(name)
+            while len(self._fragments) > self.max_fragments:
+                self._fragments.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
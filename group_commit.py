@@ -0,0 +1,77 @@
+"""A queue served by one writer thread, which commits all the pending items together."""
+import os
+import queue
+import threading
+
+
+class _Pending:
+    __slots__ = ("item", "result", "error", "done")
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class GroupCommitQueue:
+    """Give the submitted items to `commit(items)` by groups: the writer thread takes all the items submitted
+    while it was committing the previous group (`max_group` at most), in their order.
+
+    `commit` gives the result of each item. submit() waits for the commit of its item: it returns its result, or
+    raises the exception of the commit.
+    """
+
+    def __init__(self, commit, max_group=1000):
+        self.commit = commit
+        self.max_group = max_group
+        self.groups = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _start(self):
+        with self._lock:
+            # After a fork, the writer thread of the parent process doesn't exist in the child.
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._write, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        if self._thread is None or self._pid != os.getpid():
+            self._start()
+        pending = _Pending(item)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _write(self):
+        pending_queue = self._queue
+        while True:
+            group = [pending_queue.get()]
+            while len(group) < self.max_group:
+                try:
+                    group.append(pending_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                results = self.commit([pending.item for pending in group])
+            except Exception as error:
+                for pending in group:
+                    pending.error = error
+            else:
+                for pending, result in zip(group, results):
+                    pending.result = result
+            self.groups += 1
+            self.items += len(group)
+            for pending in group:
+                pending.done.set()
+
+    def stats(self):
+        return {"groups": self.groups, "items": self.items}
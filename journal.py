@@ -0,0 +1,94 @@
+"""Append-only journal of the bookings, replayed over the last json snapshot of clubs and competitions."""
+import json
+import os
+
+from data_cache import stat_signature
+
+# The fields changed by a booking, for each list of records.
+JOURNAL_FIELDS = {
+    "clubs": ("club", "points"),
+    "competitions": ("competition", "number_of_places"),
+}
+
+
+class BookingJournal:
+    """Record each booking as one small json line, written with fsync.
+
+    A record keeps the new values (not the difference) of the club's points and the competition's places,
+    so replaying a record twice gives the same result.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, club_name, points, competition_name, number_of_places):
+        """Write one booking at the end of the journal and make sure it is on disk."""
+        self.append_many([(club_name, points, competition_name, number_of_places)])
+
+    def append_many(self, bookings):
+        """Write (club name, points, competition name, number of places) bookings with one write and one fsync.
+
+        Return the signatures of the journal just before and just after this write. The signature before is None
+        if another process appended at the same time.
+        """
+        lines = b"".join(
+            (json.dumps({
+                "club": club_name,
+                "points": points,
+                "competition": competition_name,
+                "number_of_places": number_of_places,
+            }, separators=(',', ':')) + "\n").encode()
+            for club_name, points, competition_name, number_of_places in bookings
+        )
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            stat = os.fstat(fd)
+            before = stat_signature(stat)
+            if stat.st_size and os.pread(fd, 1, stat.st_size - 1) != b"\n":
+                # An incomplete last line, left by a crash during a write, or the write of another process
+                # still in progress. It is not truncated, since it may be the latter: a new line is started instead,
+                # and an incomplete line is skipped when the journal is read.
+                lines = b"\n" + lines
+            os.write(fd, lines)
+            after = os.fstat(fd)
+            if after.st_size != stat.st_size + len(lines):
+                before = None
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return before, stat_signature(after)
+
+    def records(self):
+        """Get the bookings of the journal, in the order they were written."""
+        try:
+            with open(self.path, "rb") as f:
+                lines = f.read().split(b"\n")
+        except FileNotFoundError:
+            return []
+        # The last element is empty, or it is a line being written which is ignored.
+        records = []
+        for line in lines[:-1]:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # An incomplete line, left by a crash during a write.
+                continue
+        return records
+
+    def replay(self, key, records):
+        """Apply the bookings of the journal on the records of clubs or competitions stored under `key`."""
+        name_field, value_field = JOURNAL_FIELDS[key]
+        by_name = None
+        for booking in self.records():
+            if by_name is None:
+                by_name = {record.name: record for record in records}
+            record = by_name.get(booking[name_field])
+            if record is not None:
+                # The journals written before the typed records keep the numbers as strings.
+                setattr(record, value_field, int(booking[value_field]))
+        return records
+
+    def truncate(self):
+        """Empty the journal, once its bookings are saved in the json snapshots."""
+        with open(self.path, "wb") as f:
+            os.fsync(f.fileno())
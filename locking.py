@@ -0,0 +1,79 @@
+"""Locks for the bookings: one lock per key, held by a thread of this process and across worker processes."""
+from contextlib import contextmanager, ExitStack
+import fcntl
+import hashlib
+import os
+import threading
+
+
+class FileLock:
+    """Lock a file with flock, so that other processes (e.g. gunicorn workers) wait for it.
+
+    Each acquire opens its own file descriptor: threads of the same process also wait for each other.
+    A shared lock can be held by many holders at once, but not together with an exclusive lock.
+    """
+
+    def __init__(self, path, shared=False):
+        self.path = path
+        self.shared = shared
+        self._fd = None
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class KeyLocks:
+    """Give one lock per key, e.g. "competition:Spring Festival" or "club:Simply Lift".
+
+    Holding a key takes a thread lock of this process first, then a file lock in `directory`: only the
+    threads and the processes using the same keys wait for each other.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # Created on first use: importing the app doesn't write anything.
+        self._directory_created = False
+
+    def path(self, key):
+        """Get the lock file of a key. The key is hashed since it can contain any character."""
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".lock")
+
+    def thread_lock(self, key):
+        with self._locks_lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def hold(self, *keys):
+        """Hold the locks of all keys. They are always taken in the same (sorted) order to avoid deadlocks."""
+        if not self._directory_created:
+            os.makedirs(self.directory, exist_ok=True)
+            self._directory_created = True
+        with ExitStack() as stack:
+            for key in sorted(set(keys)):
+                stack.enter_context(self.thread_lock(key))
+                stack.enter_context(FileLock(self.path(key)))
+            yield
@@ -1,109 +1,97 @@
-from datetime import timedelta, datetime
-from locust import HttpUser, task, between
-from server import (
-    load_clubs,
-    load_competitions,
-    update_clubs_json,
-    update_competitions_json,
-)
+"""Users of the load tests, for the scenarios of benchmarks/load_test.py.
 
-# The original data
-CLUBS = load_clubs()
+The clubs and the competitions come from the dataset in the directory LOAD_TEST_DATA (the current directory by
+default): see `python benchmarks/load_test.py generate`. The data files are never written here: the load tests
+should run on a copy of the dataset, as benchmarks/load_test.py does.
+"""
+import itertools
+import os
+import random
 
-COMPETITIONS = load_competitions()
+from locust import HttpUser, task, constant
 
-# The data to test
-clubs = load_clubs()  # Not doing: clubs = CLUBS because copy of list will make changing CLUBS if clubs change
-competitions = load_competitions()  # the same reason for competitions
+from serialization import read_json
 
+DATA_DIRECTORY = os.environ.get("LOAD_TEST_DATA", ".")
+# The users choose the competitions they browse in the same order in every run.
+SEED = int(os.environ.get("LOAD_TEST_SEED", 0))
 
-def future_time():
-    """Define one date in the future."""
-    ten_days_after = datetime.now() + timedelta(days=10)
-    time_format = '%Y-%m-%d %H:%M:%S'
-    return ten_days_after.strftime(time_format)
 
+def load_dataset(directory):
+    """Give the number of clubs and the names of the competitions, the first one being the hot one."""
+    manifest_path = os.path.join(directory, "dataset.json")
+    if os.path.exists(manifest_path):
+        manifest = read_json(manifest_path)
+        return manifest["clubs"], manifest["competitions"]
+    # Without a generated dataset, e.g. the clubs.json and competitions.json of the repository.
+    clubs = read_json(os.path.join(directory, "clubs.json"))["clubs"]
+    competitions = read_json(os.path.join(directory, "competitions.json"))["competitions"]
+    return clubs, [competition["name"] for competition in competitions]
 
-def get_new_club(club_index):
-    """Test only with new club created by this method."""
-    new_club = {
-        "name": 'club' + str(club_index),
-        "email": 'club' + str(club_index) + "@gmail.com",
-        "points": "10"
-    }
-    return new_club
 
+CLUBS, COMPETITIONS = load_dataset(DATA_DIRECTORY)
+user_numbers = itertools.count()
 
-def get_new_competition(competition_index):
-    """Test only with new competition created by this method."""
-    competition_date = future_time()
-    new_competition = {
-        "name": 'competition' + str(competition_index),
-        "date": competition_date,
-        "number_of_places": "100"
-    }
-    return new_competition
 
+def club_of_user(number):
+    """Give the name and the email of the club of a user: a generated club, or one of the clubs of the files."""
+    if isinstance(CLUBS, int):
+        index = number % CLUBS
+        return f"Club {index}", f"club{index}@gudlft.com"
+    club = CLUBS[number % len(CLUBS)]
+    return club["name"], club["email"]
 
-# To create different clubs and competitions for tests.
-index = 0
 
-
-class WebUser(HttpUser):
-    wait_time = between(1, 10)
-    competition = {}
-    club = {}
+class ClubUser(HttpUser):
+    abstract = True
+    wait_time = constant(0)
 
     def on_start(self):
-        """Setup: each test, create and use one couple of club and competition"""
-        global index
-        self.competition = get_new_competition(index)  # competition used for tests
-        self.club = get_new_club(index)  # club used for tests
-        clubs.append(self.club)
-        competitions.append(self.competition)
-        update_clubs_json({"clubs": clubs})
-        update_competitions_json({"competitions": competitions})
-        index = index + 1
+        number = next(user_numbers)
+        self.random = random.Random(SEED * 1_000_003 + number)
+        self.club_name, self.club_email = club_of_user(number)
+        self.client.post("/showSummary", data=dict(email=self.club_email), name="/showSummary")
 
-    @task
-    def index_page(self):
+    def browse(self):
+        competition = self.random.choice(COMPETITIONS)
         self.client.get("/")
+        self.client.post("/showSummary", data=dict(email=self.club_email), name="/showSummary")
+        self.client.get(f"/book/{competition}/{self.club_name}", name="/book/[competition]/[club]")
 
-    @task
-    def login(self):
-        self.client.post(
-            "/showSummary", data=dict(
-                email=self.club["email"],
-            ), allow_redirects=True)
-
-    @task
-    def logout(self):
-        self.client.get("/logout")
-
-    @task
-    def purchase_places(self):
-        club_name = self.club["name"]
-        competition_name = self.competition["name"]
-        places_required = 1
-
-        # See: https://docs.locust.io/en/stable/writing-a-locustfile.html:
-        # You can also mark a request as successful, even if the response code was bad.
-        # Here, some errors are captured (booking more than 12 places, more than competitions' places, etc.)
+    def book_hot_competition(self):
         with self.client.post(
                 "/purchasePlaces",
-                data=dict(
-                    places=places_required,
-                    club=club_name,
-                    competition=competition_name
-                ),
-                allow_redirects=True,
+                data=dict(places=1, club=self.club_name, competition=COMPETITIONS[0]),
                 catch_response=True) as response:
+            # A refused booking (no more points or places, or the maximum of places of a club) is an answer of
+            # the app, not a failure.
             if response.status_code == 403:
                 response.success()
 
-    def on_stop(self):
-        """Teardown: after all tests, come back to the original data."""
-        clubs.pop()
-        competitions.pop()
-        update_competitions_json({"competitions": COMPETITIONS})
-        update_clubs_json({"clubs": CLUBS})
+
+class BrowsingUser(ClubUser):
+    """Read-heavy browsing: the clubs board, the welcome page and the booking page."""
+
+    @task
+    def browsing(self):
+        self.browse()
+
+
+class BookingStormUser(ClubUser):
+    """All the users book places of the same (hot) competition."""
+
+    @task
+    def booking(self):
+        self.book_hot_competition()
+
+
+class MixedUser(ClubUser):
+    """Mostly browsing, with one booking of the hot competition for four browsings."""
+
+    @task(4)
+    def browsing(self):
+        self.browse()
+
+    @task(1)
+    def booking(self):
+        self.book_hot_competition()
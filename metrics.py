@@ -0,0 +1,123 @@
+"""Latency histograms and counters of the app, given in the Prometheus text format."""
+import bisect
+from contextlib import contextmanager
+import threading
+import time
+
+# Upper bounds of the latency buckets, in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+class Histogram:
+    """Counts of the observed values per bucket (not cumulative), with their sum."""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, number_of_buckets):
+        # The last count is of the values greater than the last bucket.
+        self.counts = [0] * (number_of_buckets + 1)
+        self.sum = 0.0
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Keep the counters and the latency histograms of the app, by name and labels.
+
+    The metrics are declared first, with their type and help text. One lock guards the updates: an update is a few
+    additions, so that the threads of the server hardly wait for each other. The gauges are read when the metrics
+    are rendered, from a function giving [(labels, value), ...].
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._descriptions = {}
+        # {name: {labels (sorted tuple of (label, value)): value or Histogram}}
+        self._values = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def declare(self, name, metric_type, help_text, collect=None):
+        self._descriptions[name] = (metric_type, help_text)
+        self._values[name] = {}
+        if collect is not None:
+            self._collectors[name] = collect
+
+    def increment(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        values = self._values[name]
+        with self._lock:
+            values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        bucket = bisect.bisect_left(self.buckets, value)
+        values = self._values[name]
+        with self._lock:
+            histogram = values.get(key)
+            if histogram is None:
+                histogram = values[key] = Histogram(len(self.buckets))
+            histogram.counts[bucket] += 1
+            histogram.sum += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the block, in seconds, even if it raises an exception (e.g. abort())."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name, **labels):
+        """Give the value of a counter, or the number of values observed by a histogram."""
+        value = self._values[name].get(tuple(sorted(labels.items())), 0)
+        return sum(value.counts) if isinstance(value, Histogram) else value
+
+    def render(self):
+        """Give all the metrics in the Prometheus text format."""
+        with self._lock:
+            snapshot = {
+                name: {
+                    key: (list(value.counts), value.sum) if isinstance(value, Histogram) else value
+                    for key, value in values.items()
+                }
+                for name, values in self._values.items()
+            }
+        for name, collect in self._collectors.items():
+            snapshot[name] = {tuple(sorted(labels.items())): value for labels, value in collect()}
+        lines = []
+        for name, values in snapshot.items():
+            metric_type, help_text = self._descriptions[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in sorted(values.items()):
+                if metric_type in (COUNTER, GAUGE):
+                    lines.append(f"{name}{label_text(labels)} {format_value(value)}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else format_value(bound)
+                    lines.append(f"{name}_bucket{label_text(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{label_text(labels)} {format_value(total)}")
+                lines.append(f"{name}_count{label_text(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
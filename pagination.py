@@ -0,0 +1,42 @@
+"""Pages of the lists of clubs and competitions displayed in the html pages."""
+import math
+
+MAX_PAGE_SIZE = 1000
+
+
+class Page:
+    """One page of a list of records. Without limit, the page is the whole list (no copy).
+    A number after the last page gives the last page."""
+
+    def __init__(self, records, number=1, limit=None):
+        self.limit = limit
+        self.total = len(records)
+        if limit is None:
+            self.items = records
+            self.pages = 1
+            self.number = 1
+        else:
+            self.pages = max(1, math.ceil(self.total / limit))
+            self.number = min(number, self.pages)
+            start = (self.number - 1) * limit
+            self.items = records[start:start + limit]
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    @property
+    def has_next(self):
+        return self.number < self.pages
+
+
+def page_arguments(values, default_limit=None):
+    """Get the page number and the page size from the request values `page` and `limit`.
+    Raise ValueError if they are not valid.
+    """
+    number = int(values.get('page') or 1)
+    limit = values.get('limit') or default_limit
+    limit = int(limit) if limit is not None else None
+    if number < 1 or (limit is not None and not 1 <= limit <= MAX_PAGE_SIZE):
+        raise ValueError("Invalid page")
+    return number, limit
@@ -0,0 +1,117 @@
+"""Profile some requests with cProfile, and report the functions which take the most time, by route.
+
+Each profiled request is written in a `.prof` file of the directory, named with the time, the route and the
+duration of the request. The oldest files are removed when the files take more than `max_bytes`.
+"""
+import cProfile
+import os
+import pstats
+import random
+import threading
+import time
+from urllib.parse import quote, unquote
+
+PROFILE_SUFFIX = ".prof"
+
+
+def profile_file_name(route, duration):
+    # The route is quoted: "/book/<competition>/<club>" gives a valid file name, which can be read back.
+    return f"{time.time_ns()}-{os.getpid()}-{quote(route, safe='')}-{duration * 1000:.0f}ms{PROFILE_SUFFIX}"
+
+
+def parse_profile_file_name(name):
+    """Give the route and the duration (in seconds) of a profile file."""
+    _, _, rest = name[:-len(PROFILE_SUFFIX)].split("-", 2)
+    route, duration = rest.rsplit("-", 1)
+    return unquote(route), int(duration[:-len("ms")]) / 1000
+
+
+class RequestProfiler:
+    """Decide which requests are profiled, and write their profiles.
+
+    A request is profiled with the probability `sample_rate`, or when it has the `header` (if any).
+    """
+
+    def __init__(self, directory, sample_rate=0.0, header=None, max_bytes=50 * 2 ** 20):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.header = header
+        self.max_bytes = max_bytes
+        self._rotation_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.header)
+
+    def wanted(self, headers):
+        if self.header and headers.get(self.header):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """Start profiling the current thread. Give the profile, or None if another profiler is running."""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: only one profiler at a time in the process.
+            return None
+        return profile
+
+    def stop(self, profile, route, duration):
+        """Stop profiling and write the profile. Give the path of its file."""
+        profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, profile_file_name(route, duration))
+        # Written under another name first: a report never reads a file being written.
+        profile.dump_stats(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self.rotate()
+        return path
+
+    def rotate(self):
+        """Remove the oldest profiles while they take more than max_bytes."""
+        with self._rotation_lock:
+            files = []
+            for name in os.listdir(self.directory):
+                if name.endswith(PROFILE_SUFFIX):
+                    try:
+                        files.append((name, os.path.getsize(os.path.join(self.directory, name))))
+                    except FileNotFoundError:
+                        # Removed by another process.
+                        continue
+            # The names begin with the time: the oldest first.
+            files.sort(key=lambda file: int(file[0].split("-", 1)[0]))
+            total = sum(size for _, size in files)
+            for name, size in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+def hotspots(directory, top=20, sort="cumulative"):
+    """Aggregate the profiles of the directory by route.
+
+    Give {route: (number of profiles, total duration, [(function, number of calls, own time, cumulative time)])},
+    with the `top` functions sorted by "cumulative" or own ("tottime") time.
+    """
+    by_route = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(PROFILE_SUFFIX):
+            route, duration = parse_profile_file_name(name)
+            by_route.setdefault(route, []).append((os.path.join(directory, name), duration))
+    report = {}
+    for route, profiles in sorted(by_route.items()):
+        stats = pstats.Stats(*(path for path, _ in profiles))
+        rows = [
+            (pstats.func_std_string(function), calls, own_time, cumulative_time)
+            for function, (_, calls, own_time, cumulative_time, _) in stats.stats.items()
+        ]
+        column = 3 if sort == "cumulative" else 2
+        rows.sort(key=lambda row: row[column], reverse=True)
+        report[route] = (len(profiles), sum(duration for _, duration in profiles), rows[:top])
+    return report
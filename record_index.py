@@ -0,0 +1,164 @@
+"""Sidecar index of a json data file, to read one record (or one page of records) without loading the file.
+
+The index file `<path>.idx` keeps:
+    - a header: the signature of the data file it was built from and the number of records,
+    - the offset and the length of each record in the data file, in the order of the list,
+    - the hash of each indexed field value (e.g. the email and the name of a club), sorted, with its record.
+
+Both files are read with mmap: a lookup reads a few pages of the index and the matching record only, and the
+memory used doesn't depend on the number of records.
+"""
+from collections.abc import Sequence
+import hashlib
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+
+from data_cache import stat_signature
+from serialization import loads
+
+MAGIC = b"GUDIDX1\0"
+HEADER = struct.Struct("<8sqqqq")
+POSITION = struct.Struct("<QI")
+KEY = struct.Struct("<QI")
+
+# A json object without nested object, e.g. {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}.
+# The loops are unrolled, so that the regular expression doesn't backtrack.
+RECORD_PATTERN = re.compile(rb'\{[^{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}"]*)*\}')
+
+
+def key_hash(field, value):
+    digest = hashlib.blake2b(f"{field}\0{value}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def build_index(data, key, fields):
+    """Build the content of the index of the json data (bytes or mmap) whose list of records is under `key`."""
+    start = data.find(b"[", data.find(b'"' + key.encode() + b'"'))
+    positions = []
+    keys = []
+    for number, match in enumerate(RECORD_PATTERN.finditer(data, start)):
+        record = loads(match.group())
+        positions.append(POSITION.pack(match.start(), match.end() - match.start()))
+        keys.extend((key_hash(field, record[field]), number) for field in fields)
+    keys.sort()
+    return len(positions), b"".join(positions) + b"".join(KEY.pack(*entry) for entry in keys)
+
+
+class RecordIndex:
+    """Find the records of the json file `path` by the value of one of `fields`, through the sidecar index.
+
+    The index is built again when the data file changes (a new mtime, size or inode).
+    """
+
+    def __init__(self, path, key, fields):
+        self.path = path
+        self.key = key
+        self.fields = fields
+        self.index_path = path + ".idx"
+        self.builds = 0
+        self._signature = None
+        self._data = None
+        self._index = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Map the data file and its index, building the index first if it was built for another data file."""
+        with open(self.path, "rb") as f:
+            signature = stat_signature(os.fstat(f.fileno()))
+            if signature == self._signature:
+                return
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index = self._map_index(signature)
+        if index is None:
+            count, content = build_index(data, self.key, self.fields)
+            self._write_index(HEADER.pack(MAGIC, *signature, count) + content)
+            self.builds += 1
+            index = self._map_index(signature)
+        self._data, self._index, self._signature = data, index, signature
+        self._count = HEADER.unpack_from(index)[-1]
+
+    def _map_index(self, signature):
+        try:
+            with open(self.index_path, "rb") as f:
+                index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: an empty file can't be mapped.
+            return None
+        if len(index) < HEADER.size or HEADER.unpack_from(index)[:4] != (MAGIC,) + signature:
+            index.close()
+            return None
+        return index
+
+    def _write_index(self, content):
+        # Many processes may build the index at the same time: each one writes its own temporary file.
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.index_path)))
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temporary_path, self.index_path)
+
+    def _record(self, number):
+        offset, length = POSITION.unpack_from(self._index, HEADER.size + number * POSITION.size)
+        return loads(self._data[offset:offset + length])
+
+    def __len__(self):
+        with self._lock:
+            self._open()
+            return self._count
+
+    def find(self, field, value):
+        """Get the record (as json) whose field has this value, or None."""
+        target = key_hash(field, value)
+        with self._lock:
+            self._open()
+            keys_start = HEADER.size + self._count * POSITION.size
+            low, high = 0, self._count * len(self.fields)
+            while low < high:
+                middle = (low + high) // 2
+                if KEY.unpack_from(self._index, keys_start + middle * KEY.size)[0] < target:
+                    low = middle + 1
+                else:
+                    high = middle
+            # Different values can have the same hash: the records are checked.
+            while low < self._count * len(self.fields):
+                hash_value, number = KEY.unpack_from(self._index, keys_start + low * KEY.size)
+                if hash_value != target:
+                    break
+                record = self._record(number)
+                if record.get(field) == value:
+                    return record
+                low += 1
+            return None
+
+    def records(self, start=0, stop=None):
+        """Get the records (as json) from `start` to `stop`, in the order of the data file."""
+        with self._lock:
+            self._open()
+            start, stop, _ = slice(start, stop).indices(self._count)
+            return [self._record(number) for number in range(start, stop)]
+
+
+class IndexedRecords(Sequence):
+    """The records of an indexed data file, as a list read on demand: a slice reads only its records."""
+
+    def __init__(self, index, record_type):
+        self.index = index
+        self.record_type = record_type
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            if item.step not in (None, 1):
+                raise ValueError("Only contiguous slices are supported.")
+            return [self.record_type.from_json(record) for record in self.index.records(item.start, item.stop)]
+        number = range(len(self))[item]
+        return self.record_type.from_json(self.index.records(number, number + 1)[0])
+
+    def __iter__(self):
+        return iter(self[:])
@@ -0,0 +1,96 @@
+"""Typed records of clubs and competitions.
+
+The json files keep the numbers as strings ("points": "13") and the dates as text. The records keep ints and
+datetimes: the conversion is only done when the data is loaded or saved.
+"""
+from datetime import datetime
+
+
+class Record:
+    """A record with fixed fields in __slots__, so it uses much less memory than a dict.
+
+    `record["name"]` reads a field as with a dict. A record is equal to a record with the same fields and values,
+    or to its json form.
+    """
+
+    __slots__ = ()
+    fields = ()
+
+    @classmethod
+    def from_json(cls, data):
+        raise NotImplementedError
+
+    def to_json(self):
+        raise NotImplementedError
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field)
+
+    def update(self, fields):
+        """Change some fields, given with their types (e.g. points as an int)."""
+        for field, value in fields.items():
+            setattr(self, field, value)
+
+    def values(self):
+        return tuple(getattr(self, field) for field in self.fields)
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            try:
+                other = type(self).from_json(other)
+            except (KeyError, TypeError, ValueError):
+                return False
+        if not isinstance(other, Record) or other.fields != self.fields:
+            return NotImplemented
+        return self.values() == other.values()
+
+    # Records are changed in place: they can't be hashed.
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.fields)
+        return f"{type(self).__name__}({fields})"
+
+
+class Club(Record):
+    __slots__ = fields = ("name", "email", "points")
+
+    def __init__(self, name, email, points):
+        self.name = name
+        self.email = email
+        self.points = points
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["name"], data["email"], int(data["points"]))
+
+    def to_json(self):
+        return {"name": self.name, "email": self.email, "points": str(self.points)}
+
+
+class Competition(Record):
+    __slots__ = fields = ("name", "date", "number_of_places")
+
+    def __init__(self, name, date, number_of_places):
+        self.name = name
+        self.date = date
+        self.number_of_places = number_of_places
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["name"], parse_date(data["date"]), int(data["number_of_places"]))
+
+    def to_json(self):
+        return {"name": self.name, "date": format_date(self.date), "number_of_places": str(self.number_of_places)}
+
+
+def parse_date(text):
+    return datetime.fromisoformat(text)
+
+
+def format_date(date):
+    """Format a date as in the json files, e.g. "2020-03-27 10:00:00"."""
+    return date.isoformat(" ")
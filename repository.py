@@ -0,0 +1,57 @@
+"""Index clubs and competitions, so that a record is found without scanning or copying the lists."""
+from competition_index import CompetitionIndex
+
+
+class Repository:
+    """Keep the lists of clubs and competitions together with indexes by email and by name.
+
+    The indexes point to the records of the lists themselves: a record updated through the repository
+    is updated in place, in the lists and in the indexes.
+    """
+
+    def __init__(self, clubs, competitions):
+        self.clubs = clubs
+        self.competitions = competitions
+        self._clubs_by_email = {club.email: club for club in clubs}
+        self._clubs_by_name = {club.name: club for club in clubs}
+        self._competitions_by_name = {competition.name: competition for competition in competitions}
+        self._competition_index = None
+
+    @property
+    def competition_index(self):
+        """The competitions sorted by date, built on first use and kept until a date changes."""
+        if self._competition_index is None:
+            self._competition_index = CompetitionIndex(self.competitions)
+        return self._competition_index
+
+    def club_by_email(self, email):
+        return self._clubs_by_email.get(email)
+
+    def club_by_name(self, name):
+        return self._clubs_by_name.get(name)
+
+    def competition_by_name(self, name):
+        return self._competitions_by_name.get(name)
+
+    def update_club(self, club_name, **fields):
+        """Change some fields of a club in place and keep the indexes up to date."""
+        club = self._clubs_by_name[club_name]
+        if "email" in fields and fields["email"] != club.email:
+            del self._clubs_by_email[club.email]
+            self._clubs_by_email[fields["email"]] = club
+        if "name" in fields and fields["name"] != club_name:
+            del self._clubs_by_name[club_name]
+            self._clubs_by_name[fields["name"]] = club
+        club.update(fields)
+        return club
+
+    def update_competition(self, competition_name, **fields):
+        """Change some fields of a competition in place and keep the index up to date."""
+        competition = self._competitions_by_name[competition_name]
+        if "name" in fields and fields["name"] != competition_name:
+            del self._competitions_by_name[competition_name]
+            self._competitions_by_name[fields["name"]] = competition
+        if "name" in fields or "date" in fields:
+            self._competition_index = None
+        competition.update(fields)
+        return competition
@@ -0,0 +1,64 @@
+"""Read and write the json data files, in one of three formats:
+
+    - "pretty": indented with sorted keys, easy to read and to diff (the default),
+    - "compact": sorted keys without any whitespace,
+    - "fast": written by orjson if it is installed, otherwise as "compact".
+"""
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson is optional: without it, the standard json module is used.
+    orjson = None
+
+PRETTY = "pretty"
+COMPACT = "compact"
+FAST = "fast"
+JSON_FORMATS = (PRETTY, COMPACT, FAST)
+
+
+def dumps(data, json_format=PRETTY):
+    """Encode data in a json format, as bytes."""
+    if json_format == PRETTY:
+        return json.dumps(data, sort_keys=True, indent=4, separators=(',', ': ')).encode()
+    if json_format == FAST and orjson is not None:
+        return orjson.dumps(data)
+    if json_format in (COMPACT, FAST):
+        return json.dumps(data, sort_keys=True, separators=(',', ':')).encode()
+    raise ValueError(f"Unknown json format: {json_format}")
+
+
+def loads(content):
+    """Decode json bytes, whatever the format they were written in."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def read_json(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def fsync_directory(path):
+    """Make the renames in the directory of `path` durable."""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_json(path, data, json_format=PRETTY, durable=False):
+    """Write a temporary file then rename it: a reader never sees a partly written file.
+    With `durable`, the file and the rename are on disk when it returns, even if the system crashes."""
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(dumps(data, json_format))
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+    if durable:
+        fsync_directory(path)
@@ -1,151 +1,799 @@
-from datetime import datetime
-
-from collections import OrderedDict
+from collections import Counter
+from contextlib import contextmanager, ExitStack
+import functools
 import json
-from flask import Flask, render_template, request, redirect, flash, url_for, abort
+import os
+import time
+
+import click
+from flask import (
+    Flask, render_template, request, redirect, flash, url_for, abort, jsonify, Response, stream_with_context,
+    template_rendered, g
+)
+from markupsafe import Markup
+from werkzeug.exceptions import ServiceUnavailable
+
+from admission import AdmissionGate, Overloaded
+from api import create_api_blueprint
+from booking_policy import BookingPolicy, Refusal
+from competition_index import CompetitionIndex
+from data_cache import data_version
+from fragment_cache import FragmentCache
+from group_commit import GroupCommitQueue
+from locking import KeyLocks
+from metrics import Metrics, COUNTER, GAUGE, HISTOGRAM
+from pagination import Page, page_arguments
+from profiling import RequestProfiler, hotspots
+from record_index import IndexedRecords
+from records import Club, Competition
+from repository import Repository
+from storage import create_storage, SqliteStorage, ShardedStorage, SnapshotStorage, DATA_LOCK_KEY
+from template_cache import SharedBytecodeCache
 
 MAX_PLACES = 12
 NUMBER_OF_POINTS_PER_PLACE = 3
 
+app = Flask(__name__)
+app.secret_key = 'something_special'
+app.config.from_mapping(
+    # "json" (clubs.json and competitions.json), "sqlite", "sharded" (one file per competition and club shard) or
+    # "snapshot" (a binary file mapped by all the processes).
+    STORAGE_BACKEND=os.environ.get('STORAGE_BACKEND', 'json'),
+    # The json files, relative to the working directory unless they are absolute paths.
+    CLUBS_PATH=os.environ.get('CLUBS_PATH', 'clubs.json'),
+    COMPETITIONS_PATH=os.environ.get('COMPETITIONS_PATH', 'competitions.json'),
+    # With the json files: append the bookings to this journal instead of rewriting the files.
+    BOOKING_JOURNAL=os.environ.get('BOOKING_JOURNAL'),
+    SQLITE_DATABASE=os.environ.get('SQLITE_DATABASE', 'gudlft.db'),
+    SHARDED_DIRECTORY=os.environ.get('SHARDED_DIRECTORY', 'data'),
+    # The snapshot file, e.g. on /dev/shm to keep it in memory.
+    SNAPSHOT_PATH=os.environ.get('SNAPSHOT_PATH', 'gudlft.snapshot'),
+    # Format of the json files written: "pretty" (indented), "compact" or "fast" (with orjson if installed).
+    JSON_FORMAT=os.environ.get('JSON_FORMAT', 'pretty'),
+    # With the json files and no journal: find the clubs through an index file (clubs.json.idx) instead of loading
+    # all of them to log in or to display a page of them.
+    RECORD_INDEX=os.environ.get('RECORD_INDEX', '') not in ('', '0'),
+    LOCK_DIR=os.environ.get('LOCK_DIR', '.locks'),
+    # "locks": each booking locks its data and saves it. "queue": the bookings are queued to one writer thread (per
+    # process), which saves all the pending bookings together.
+    BOOKING_MODE=os.environ.get('BOOKING_MODE', 'locks'),
+    # Number of clubs or competitions per page in the html pages. All of them are displayed by default.
+    PAGE_SIZE=int(os.environ['PAGE_SIZE']) if os.environ.get('PAGE_SIZE') else None,
+    # The html pages showing at least this number of clubs and competitions are sent while they are rendered.
+    STREAM_MIN_RECORDS=int(os.environ.get('STREAM_MIN_RECORDS', 500)),
+    # Profile this part of the requests (0.01 for 1%), and the requests with the header PROFILE_HEADER if it is set
+    # (e.g. "X-Profile"). The profiles are written in PROFILE_DIRECTORY, which keeps PROFILE_MAX_BYTES at most.
+    PROFILE_SAMPLE_RATE=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    PROFILE_HEADER=os.environ.get('PROFILE_HEADER'),
+    PROFILE_DIRECTORY=os.environ.get('PROFILE_DIRECTORY', 'profiles'),
+    PROFILE_MAX_BYTES=int(os.environ.get('PROFILE_MAX_BYTES', 50 * 2 ** 20)),
+    # Admission control, in each process: at most BOOKING_CONCURRENCY bookings (and PAGE_CONCURRENCY html pages) are
+    # handled at the same time, BOOKING_QUEUE_SIZE more wait for BOOKING_QUEUE_TIMEOUT seconds at most, and the
+    # others are refused at once with a 503 (and a Retry-After of RETRY_AFTER seconds). 0: no limit (the default).
+    BOOKING_CONCURRENCY=int(os.environ.get('BOOKING_CONCURRENCY', 0)),
+    BOOKING_QUEUE_SIZE=int(os.environ.get('BOOKING_QUEUE_SIZE', 20)),
+    BOOKING_QUEUE_TIMEOUT=float(os.environ.get('BOOKING_QUEUE_TIMEOUT', 2)),
+    PAGE_CONCURRENCY=int(os.environ.get('PAGE_CONCURRENCY', 0)),
+    PAGE_QUEUE_SIZE=int(os.environ.get('PAGE_QUEUE_SIZE', 50)),
+    PAGE_QUEUE_TIMEOUT=float(os.environ.get('PAGE_QUEUE_TIMEOUT', 2)),
+    RETRY_AFTER=int(os.environ.get('RETRY_AFTER', 1)),
+    # Token of the API routes giving the emails of the clubs (header `Authorization: Bearer <API_TOKEN>`). Without
+    # it, these routes are closed.
+    API_TOKEN=os.environ.get('API_TOKEN'),
+    # create_app() loads the data before the first request.
+    WARMUP=os.environ.get('WARMUP', '') not in ('', '0'),
+    # Keep the compiled templates in this directory, shared by the worker processes (see template_cache.py).
+    TEMPLATE_CACHE_DIR=os.environ.get('TEMPLATE_CACHE_DIR'),
+)
+# Number of template output items sent together when a page is streamed.
+TEMPLATE_STREAM_BUFFER = 100
+
+storage = None
+booking_locks = None
+booking_queue = None
+profiler = None
+# The gates of the routes writing the data ("bookings") and of the html pages reading it ("pages"): the bookings
+# waiting for their turn don't take the places of the pages.
+admission_gates = {}
+
+
+def configure_data(config):
+    """Set up the storage of clubs and competitions, and the locks (or the queue) of the bookings."""
+    global storage, booking_locks, booking_queue
+    if config["BOOKING_MODE"] not in ("locks", "queue"):
+        raise ValueError(f"Unknown booking mode: {config['BOOKING_MODE']}")
+    storage = create_storage(config)
+    booking_locks = KeyLocks(config["LOCK_DIR"])
+    # commit_bookings is defined with the booking routes, below.
+    booking_queue = GroupCommitQueue(lambda bookings: commit_bookings(bookings)) \
+        if config["BOOKING_MODE"] == "queue" else None
+
+
+def configure_profiling(config):
+    global profiler
+    profiler = RequestProfiler(config["PROFILE_DIRECTORY"], config["PROFILE_SAMPLE_RATE"], config["PROFILE_HEADER"],
+                               config["PROFILE_MAX_BYTES"])
+
+
+def configure_admission(config):
+    admission_gates["bookings"] = AdmissionGate(
+        config["BOOKING_CONCURRENCY"], config["BOOKING_QUEUE_SIZE"], config["BOOKING_QUEUE_TIMEOUT"])
+    admission_gates["pages"] = AdmissionGate(
+        config["PAGE_CONCURRENCY"], config["PAGE_QUEUE_SIZE"], config["PAGE_QUEUE_TIMEOUT"])
+
+
+def configure_templates(config):
+    directory = config["TEMPLATE_CACHE_DIR"]
+    app.jinja_env.bytecode_cache = SharedBytecodeCache(directory) if directory else None
+
+
+def configure_app(config):
+    configure_data(config)
+    configure_profiling(config)
+    configure_admission(config)
+    configure_templates(config)
+
+
+# Nothing is read or written here: the data is loaded on first use.
+configure_app(app.config)
+
 
 def load_clubs():
-    with open('clubs.json') as c:
-        list_of_clubs = json.load(c)['clubs']
-        return list_of_clubs
+    # Give the clubs in the json schema, as copies which the caller can modify without changing the cached data.
+    return [club.to_json() for club in storage.load_clubs()]
 
 
 def load_competitions():
-    with open('competitions.json') as comps:
-        list_of_competitions = json.load(comps)['competitions']
-        return list_of_competitions
+    return [competition.to_json() for competition in storage.load_competitions()]
 
 
 def update_clubs_json(updated_clubs):
-    with open("clubs.json", "w") as c:
-        c.write(json.dumps(updated_clubs, sort_keys=True, indent=4, separators=(',', ': ')))
+    with booking_locks.hold(DATA_LOCK_KEY):
+        storage.save_clubs([Club.from_json(club) for club in updated_clubs["clubs"]])
 
 
 def update_competitions_json(updated_competitions):
-    with open("competitions.json", "w") as comps:
-        comps.write(json.dumps(updated_competitions, sort_keys=True, indent=4, separators=(',', ': ')))
+    with booking_locks.hold(DATA_LOCK_KEY):
+        storage.save_competitions(
+            [Competition.from_json(competition) for competition in updated_competitions["competitions"]])
 
 
-app = Flask(__name__)
-app.secret_key = 'something_special'
+def invalidate_data_cache():
+    """Force the next load of clubs and competitions to read the storage again."""
+    storage.invalidate()
+
+
+_repository = None
+
+
+def get_repository():
+    """Get the indexed clubs and competitions, rebuilt only when the cached data was reloaded."""
+    global _repository
+    clubs = storage.load_clubs()
+    competitions = storage.load_competitions()
+    repository = _repository
+    if repository is None or repository.clubs is not clubs or repository.competitions is not competitions:
+        make_repository = getattr(storage, "make_repository", Repository)
+        repository = _repository = make_repository(clubs, competitions)
+    return repository
+
+
+class IndexedData:
+    """The data displayed by the html pages, with the clubs read through the record index: a club is read from the
+    file when it is used. The competitions are indexed as in a Repository."""
+
+    def __init__(self, clubs_index, competitions):
+        self.clubs_index = clubs_index
+        self.clubs = IndexedRecords(clubs_index, Club)
+        self.competitions = competitions
+        self.competition_index = CompetitionIndex(competitions)
+        self._competitions_by_name = {competition.name: competition for competition in competitions}
+
+    def club_by_email(self, email):
+        record = self.clubs_index.find("email", email)
+        return Club.from_json(record) if record is not None else None
+
+    def club_by_name(self, name):
+        record = self.clubs_index.find("name", name)
+        return Club.from_json(record) if record is not None else None
+
+    def competition_by_name(self, name):
+        return self._competitions_by_name.get(name)
+
+
+_page_data = None
+
+
+def page_data():
+    """Get the clubs and competitions displayed by the html pages. With a record index, the clubs are not loaded:
+    only the displayed ones are read from the file. The data is rebuilt only when the competitions were reloaded."""
+    global _page_data
+    clubs_index = getattr(storage, "clubs_index", None)
+    if clubs_index is None:
+        return get_repository()
+    competitions = storage.load_competitions()
+    data = _page_data
+    if data is None or data.clubs_index is not clubs_index or data.competitions is not competitions:
+        data = _page_data = IndexedData(clubs_index, competitions)
+    return data
+
+
+def find_club_by_email(email):
+    """Find a club by email, reading only its record when there is a record index."""
+    return page_data().club_by_email(email)
+
 
-competitions = load_competitions()
-clubs = load_clubs()
+# Latency of the requests and of their phases, and bookings by outcome, given by /metrics.
+REQUEST_DURATION = "gudlft_request_duration_seconds"
+PHASE_DURATION = "gudlft_request_phase_duration_seconds"
+BOOKINGS = "gudlft_bookings_total"
+metrics = Metrics()
+metrics.declare(REQUEST_DURATION, HISTOGRAM, "Duration of the requests, by route, method and status.")
+metrics.declare(PHASE_DURATION, HISTOGRAM,
+                "Duration of the phases of the requests (lock_wait, data_load, lookup, validation, render, persist).")
+metrics.declare(BOOKINGS, COUNTER, "Bookings accepted, and rejected by reason.")
+metrics.declare("gudlft_admission_in_flight", GAUGE, "Requests handled, by admission gate.", collect=lambda: [
+    ({"gate": name}, gate.in_flight) for name, gate in admission_gates.items()])
+metrics.declare("gudlft_admission_queue_depth", GAUGE, "Requests waiting for their turn, by admission gate.",
+                collect=lambda: [({"gate": name}, gate.waiting) for name, gate in admission_gates.items()])
+metrics.declare("gudlft_admission_shed_total", COUNTER, "Requests refused with a 503, by admission gate and reason.",
+                collect=lambda: [
+                    ({"gate": name, "reason": reason}, number)
+                    for name, gate in admission_gates.items() for reason, number in gate.shed.items()])
+
+
+def request_route():
+    # The rule, not the path: /book/<competition>/<club> is one route.
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def timed_phase(phase):
+    """Time a phase of the current request in the metrics."""
+    return metrics.timer(PHASE_DURATION, route=request_route(), phase=phase)
+
+
+def count_booking(refusal, number=1):
+    """Count bookings in the metrics: accepted if `refusal` is None."""
+    if refusal is None:
+        metrics.increment(BOOKINGS, number, outcome="accepted", reason="")
+    else:
+        metrics.increment(BOOKINGS, number, outcome="rejected", reason=refusal.reason)
+
+
+@app.before_request
+def start_request_timer():
+    if profiler.enabled and profiler.wanted(request.headers):
+        g.profile = profiler.start()
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def observe_request_duration(response):
+    # A streamed page is still being rendered: only the time to its first bytes is observed.
+    start = g.pop("request_start", None)
+    if start is not None:
+        duration = time.perf_counter() - start
+        metrics.observe(REQUEST_DURATION, duration, route=request_route(), method=request.method,
+                        status=response.status_code)
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profiler.stop(profile, request_route(), duration)
+    return response
+
+
+@app.teardown_request
+def stop_profile(exception):
+    # after_request is not called when the request raised an exception.
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profile.disable()
+
+
+def admitted(gate_name):
+    """Decorate a view: it is handled only when the admission gate lets it in, else the answer is a 503.
+    A streamed response holds its place until it is closed, after its body is rendered."""
+    def decorator(view):
+        @functools.wraps(view)
+        def admitted_view(*args, **kwargs):
+            try:
+                with ExitStack() as stack:
+                    stack.enter_context(admission_gates[gate_name].admit())
+                    response = view(*args, **kwargs)
+                    if isinstance(response, Response) and response.is_streamed:
+                        response.call_on_close(stack.pop_all().close)
+                    return response
+            except Overloaded:
+                raise ServiceUnavailable("Too many requests, please try again.", retry_after=app.config['RETRY_AFTER'])
+        return admitted_view
+    return decorator
+
+
+@contextmanager
+def booking_transaction(club_name, competition_name):
+    """Lock the club and the competition of a booking, then give the up-to-date repository."""
+    with ExitStack() as stack:
+        with timed_phase("lock_wait"):
+            stack.enter_context(booking_locks.hold(*storage.booking_lock_keys(club_name, competition_name)))
+        # The repository is reloaded if another process changed the data.
+        with timed_phase("data_load"):
+            repository = get_repository()
+        yield repository
+
+
+app.register_blueprint(create_api_blueprint(get_repository), url_prefix='/api')
+
+# The clubs' points board changes only after a booking: it is rendered once per data version.
+fragment_cache = FragmentCache()
+
+
+def render_clubs_board(clubs, page=None):
+    """Render includes/clubs_board_snippet.html for a page of the clubs, reusing the html rendered for
+    the same page and data version."""
+    version = data_version()
+    page = page or Page(clubs)
+    board = app.jinja_env.get_template('includes/clubs_board_snippet.html')
+    if _repository is None or clubs is not _repository.clubs:
+        # Not the clubs of the storage: nothing to reuse.
+        return Markup(board.render(clubs=page.items))
+    name = f'clubs_board:{page.number}:{page.limit}'
+    return Markup(fragment_cache.get_or_render(name, version, lambda: board.render(clubs=page.items)))
+
+
+@app.context_processor
+def clubs_board_processor():
+    return dict(clubs_board=render_clubs_board)
+
+
+def stream_template(template_name, records=0, **context):
+    """Render a template by chunks while the response is sent, instead of building the whole page first.
+    Small pages (less `records` than STREAM_MIN_RECORDS) are rendered at once, which is faster.
+    Don't use it with flash(): the session is saved before the template is rendered."""
+    if records < app.config['STREAM_MIN_RECORDS']:
+        return render_template(template_name, **context)
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    template_rendered.send(app, template=template, context=context)
+    stream = template.stream(context)
+    stream.enable_buffering(TEMPLATE_STREAM_BUFFER)
+    return Response(stream_with_context(stream))
+
+
+def request_page():
+    """Get the page number and the page size asked by the request."""
+    try:
+        return page_arguments(request.values, app.config['PAGE_SIZE'])
+    except ValueError:
+        abort(400, "Sorry, that page doesn't exist.")
+
+
+def welcome_context(club, repository, number=1, limit=None, upcoming=False):
+    """Get what welcome.html displays: a page of competitions (or of upcoming competitions) and of clubs.
+    `repository` is a Repository, or the IndexedData of page_data()."""
+    competitions = repository.competition_index.upcoming() if upcoming else repository.competitions
+    return dict(
+        club=club,
+        competitions=repository.competitions,
+        clubs=repository.clubs,
+        competitions_page=Page(competitions, number, limit),
+        # The points board shows the first clubs only, the index page shows all of them.
+        clubs_page=Page(repository.clubs, 1, limit),
+        upcoming=upcoming,
+    )
 
 
 @app.route('/')
+@admitted('pages')
 def index():
-    clubs_updated = load_clubs()
-    return render_template('index.html', clubs=clubs_updated)
+    with timed_phase("data_load"):
+        data = page_data()
+    number, limit = request_page()
+    clubs_page = Page(data.clubs, number, limit)
+    with timed_phase("render"):
+        return stream_template('index.html', records=len(clubs_page.items), clubs=data.clubs, clubs_page=clubs_page)
 
 
 @app.route('/showSummary', methods=['POST'])
+@admitted('pages')
 def show_summary():
-    competitions = load_competitions()
-    clubs = load_clubs()
-    try:
-        club = [club for club in clubs if club['email'] == request.form['email']][0]
-    except IndexError:
+    with timed_phase("lookup"):
+        club = find_club_by_email(request.form['email'])
+    if club is None:
         abort(404, "Sorry, that email wasn't found.")
-    return render_template('welcome.html', club=club, competitions=competitions, clubs=clubs)
+    number, limit = request_page()
+    upcoming = bool(request.values.get('upcoming'))
+    with timed_phase("data_load"):
+        data = page_data()
+    context = welcome_context(club, data, number, limit, upcoming)
+    records = len(context['competitions_page'].items) + len(context['clubs_page'].items)
+    with timed_phase("render"):
+        return stream_template('welcome.html', records=records, **context)
 
 
 @app.route('/book/<competition>/<club>')
+@admitted('pages')
 def book(competition, club):
-    # Reload clubs and competitions in order to have updated information.
-    competitions_updated = load_competitions()
-    clubs_updated = load_clubs()
-
-    found_club = [c for c in clubs_updated if c['name'] == club][0]
-    found_competition = [c for c in competitions_updated if c['name'] == competition][0]
-    if found_club and found_competition:
-        return render_template('booking.html', club=found_club, competition=found_competition)
-    else:
-        flash("Something went wrong - please try again")
-        return render_template('welcome.html', club=club, competitions=competitions)
+    # The data is reloaded if the json files changed, in order to have updated information. With a record index,
+    # only the club is read.
+    with timed_phase("data_load"):
+        repository = page_data()
+
+    with timed_phase("lookup"):
+        found_club = repository.club_by_name(club)
+        found_competition = repository.competition_by_name(competition)
+    with timed_phase("render"):
+        if found_club and found_competition:
+            return render_template('booking.html', club=found_club, competition=found_competition)
+        else:
+            flash("Something went wrong - please try again")
+            return render_template('welcome.html', **welcome_context(club, repository, limit=app.config['PAGE_SIZE']))
 
 
 def build_dict(seq, key):
     return dict((d[key], dict(d, index=index)) for (index, d) in enumerate(seq))
 
 
+BOOKING_COMPLETE_MESSAGE = 'Great - booking complete!'
+NOT_FOUND_REFUSAL = Refusal(404, "not_found", "Sorry, that club or competition wasn't found.")
+
+booking_policy = BookingPolicy(MAX_PLACES, NUMBER_OF_POINTS_PER_PLACE)
+
+
+def check_booking(repository, club, competition, places_required):
+    """Check a booking against the booking rules.
+    Return the Refusal of the first broken rule, or None if the booking is allowed.
+    """
+    if competition is None or club is None:
+        return NOT_FOUND_REFUSAL
+    return booking_policy.check(
+        club.points,
+        competition.number_of_places,
+        places_required,
+        repository.competition_index.is_past(competition),
+    )
+
+
+def precheck_bookings(repository, bookings):
+    """Check many (club name, competition name, places) bookings at once, each one against the current data,
+    without booking anything. Return the Refusal (or None) of each booking."""
+    clubs = [repository.club_by_name(club_name) for club_name, _, _ in bookings]
+    competitions = [repository.competition_by_name(competition_name) for _, competition_name, _ in bookings]
+    found = [club is not None and competition is not None for club, competition in zip(clubs, competitions)]
+    competition_index = repository.competition_index
+    codes = booking_policy.check_many(
+        [club.points if club is not None else 0 for club in clubs],
+        [competition.number_of_places if competition is not None else 0 for competition in competitions],
+        [places for _, _, places in bookings],
+        [competition is not None and competition_index.is_past(competition) for competition in competitions],
+    )
+    return [
+        booking_policy.refusals[code] if is_found else NOT_FOUND_REFUSAL
+        for code, is_found in zip(codes.tolist(), found)
+    ]
+
+
+def apply_booking(repository, club, competition, places_required):
+    """Update club's point and competition's places after purchase, in the repository."""
+    new_available_point = club.points - places_required * NUMBER_OF_POINTS_PER_PLACE
+    new_number_of_places = competition.number_of_places - places_required
+    repository.update_club(club.name, points=new_available_point)
+    repository.update_competition(competition.name, number_of_places=new_number_of_places)
+
+
 @app.route('/purchasePlaces', methods=['POST'])
+@admitted('bookings')
 def purchase_places():
-    # Reload clubs and competitions in order to have updated information.
-    competitions_updated = load_competitions()
-    clubs_updated = load_clubs()
-
-    competitions_dict = build_dict(competitions_updated, key="name")
     competition_name = request.form['competition']
-    competition = competitions_dict.get(competition_name)  # index key is added in information of competition
-    competition_index = competition["index"]  # index of the competition in the list from json file
-
-    clubs_dict = build_dict(clubs_updated, key="name")
     club_name = request.form['club']
-    club_with_index = clubs_dict.get(club_name)  # index key is added in information of club
-    club_index = club_with_index["index"]  # index of the competition in the list from json file
-    club = clubs_updated[club_index]
-
-    places_required = int(request.form['places'])
-    available_point = int(club['points'])
-    available_places = int(competition['number_of_places'])
-
-    booking_conditions = {
-        "available_club_ability": int(available_point / NUMBER_OF_POINTS_PER_PLACE),
-        "max_places": MAX_PLACES,
-        "available_places": available_places
-    }
-
-    error_messages = {
-        # "available_point": "You can't book more than your available points!",
-        "available_club_ability": "You can't book more than a third of your available points!",
-        "max_places": "You can't book more than 12 places!",
-        "available_places": "You can't book more than available places of this competition!"
-    }
-
-    # sorted the dictionary by value using OrderedDict
-    booking_conditions_sorted = OrderedDict(sorted(booking_conditions.items(), key=lambda item: item[1]))
-    sorted_keys = list(booking_conditions_sorted.keys())
-    key_condition = sorted_keys[0]
-
-    value_condition = booking_conditions[key_condition]
-    error_message = error_messages[key_condition]
-
-    # Checking if the competition is in the past.
-    if datetime.fromisoformat(competition["date"]) <= datetime.now():
-        abort(400, description="You can't book this past competition!")
-
-    # Display only the error message associated with the smallest value for different conditions
-    # Here, there are 3 conditions to check: available_point, available_places and MAX_PLACES
-    # Sorting conditions allows to avoid the depend on the order of if conditions and display correctly error.
-    if places_required > value_condition:
-        abort(403, description=error_message)
-    elif places_required < 0:
-        abort(403, description="You can't book a negative number of places")
-    else:
-        # competition['number_of_places'] = available_places - places_required
-        flash('Great - booking complete!')
-
-        new_available_point = available_point - places_required * NUMBER_OF_POINTS_PER_PLACE
-        new_number_of_places = available_places - places_required
-
-        # Update club's point after purchase
-        club['points'] = str(new_available_point)
-
-        clubs_updated[club_index]['points'] = str(new_available_point)
-        competitions_updated[competition_index]['number_of_places'] = str(new_number_of_places)
-
-        # Save the change into json files
-        update_clubs_json({"clubs": clubs_updated})
-        update_competitions_json({"competitions": competitions_updated})
-
-        return render_template('welcome.html', club=club, competitions=competitions_updated, clubs=clubs_updated)
+    places_required = request.form.get('places', type=int)
+    if places_required is None:
+        abort(400)
+
+    if booking_queue is not None:
+        with timed_phase("queue_wait"):
+            refusal, club, repository = booking_queue.submit((club_name, competition_name, places_required))
+        if refusal is not None:
+            abort(refusal.status_code, description=refusal.message)
+        flash(BOOKING_COMPLETE_MESSAGE)
+        with timed_phase("render"):
+            return render_template('welcome.html', **welcome_context(club, repository, limit=app.config['PAGE_SIZE']))
+
+    # Only the bookings using the same data wait for each other; the repository is up to date inside.
+    with booking_transaction(club_name, competition_name) as repository:
+        with timed_phase("lookup"):
+            competition = repository.competition_by_name(competition_name)
+            club = repository.club_by_name(club_name)
+        with timed_phase("validation"):
+            refusal = check_booking(repository, club, competition, places_required)
+        if refusal is not None:
+            count_booking(refusal)
+            abort(refusal.status_code, description=refusal.message)
+
+        flash(BOOKING_COMPLETE_MESSAGE)
+        apply_booking(repository, club, competition, places_required)
+        # Save the change into the storage
+        with timed_phase("persist"):
+            storage.save_booking(repository, club, competition)
+        count_booking(None)
+
+    with timed_phase("render"):
+        return render_template('welcome.html', **welcome_context(club, repository, limit=app.config['PAGE_SIZE']))
+
+
+def commit_bookings(bookings):
+    """Book the (club name, competition name, places) bookings of the queue in their order, each one checked with
+    the previous ones applied, then save them together.
+    Give the (Refusal or None, club, repository) of each booking."""
+    lock_keys = set()
+    for club_name, competition_name, _ in bookings:
+        lock_keys.update(storage.booking_lock_keys(club_name, competition_name))
+    results = []
+    applied = []
+    # The locks keep out the other processes, and the other booking modes.
+    with booking_locks.hold(*lock_keys):
+        repository = get_repository()
+        for club_name, competition_name, places_required in bookings:
+            club = repository.club_by_name(club_name)
+            competition = repository.competition_by_name(competition_name)
+            refusal = check_booking(repository, club, competition, places_required)
+            if refusal is None:
+                apply_booking(repository, club, competition, places_required)
+                applied.append((club, competition))
+            results.append((refusal, club, repository))
+        if applied:
+            storage.save_bookings(repository, applied)
+    for refusal, _, _ in results:
+        count_booking(refusal)
+    return results
+
+
+BATCH_ALL_OR_NOTHING = "all_or_nothing"
+BATCH_BEST_EFFORT = "best_effort"
+# Bookings of a batch refused before checking the booking rules, or cancelled after.
+INVALID_BOOKING_REFUSAL = Refusal(400, "invalid", "Expected a club, a competition and a number of places.")
+CANCELLED_BOOKING_REFUSAL = Refusal(409, "batch_cancelled", "Not booked: another booking of the batch was refused.")
+
+
+def batch_booking(item):
+    """Get the (club name, competition name, places) of a booking of a batch, or None if it is invalid: the names
+    must be strings and the places an integer (not a float nor a boolean)."""
+    if not isinstance(item, dict):
+        return None
+    club_name, competition_name, places = item.get("club"), item.get("competition"), item.get("places")
+    if not (isinstance(club_name, str) and isinstance(competition_name, str)):
+        return None
+    if not isinstance(places, int) or isinstance(places, bool):
+        return None
+    return club_name, competition_name, places
+
+
+@app.route('/purchasePlaces/batch', methods=['POST'])
+@admitted('bookings')
+def purchase_places_batch():
+    """Book places for many (club, competition) couples, with one load and one save of the data.
+
+    The request is a json object: {"mode": "all_or_nothing" or "best_effort", "bookings": [{"club": ...,
+    "competition": ..., "places": ...}, ...]}. Each booking is checked with the rules of purchase_places,
+    in the order of the list. With "all_or_nothing" (the default), nothing is booked if a booking is refused.
+    With "best_effort", the allowed bookings are saved. The response gives the result of each booking.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("bookings"), list):
+        abort(400, description="Expected a json object with a list of bookings.")
+    mode = payload.get("mode", BATCH_ALL_OR_NOTHING)
+    if mode not in (BATCH_ALL_OR_NOTHING, BATCH_BEST_EFFORT):
+        abort(400, description=f"Unknown mode: {mode}.")
+
+    bookings = [batch_booking(item) for item in payload["bookings"]]
+
+    lock_keys = set()
+    for booking in bookings:
+        if booking is not None:
+            lock_keys.update(storage.booking_lock_keys(booking[0], booking[1]))
+
+    results = []
+    accepted = []
+    with booking_locks.hold(*lock_keys):
+        with timed_phase("data_load"):
+            repository = get_repository()
+        # The points and places left after the accepted bookings of the batch, by name: the records themselves,
+        # shared with the other requests, are only changed once the batch is saved.
+        pending_points = {}
+        pending_places = {}
+        for booking in bookings:
+            if booking is None:
+                refusal = INVALID_BOOKING_REFUSAL
+                results.append({"status": refusal.status_code, "message": refusal.message})
+                count_booking(refusal)
+                continue
+            club_name, competition_name, places_required = booking
+            club = repository.club_by_name(club_name)
+            competition = repository.competition_by_name(competition_name)
+            if club is None or competition is None:
+                refusal = NOT_FOUND_REFUSAL
+            else:
+                # The booking is checked with the previous bookings of the batch already counted.
+                points = pending_points.get(club.name, club.points)
+                places = pending_places.get(competition.name, competition.number_of_places)
+                refusal = booking_policy.check(points, places, places_required,
+                                               repository.competition_index.is_past(competition))
+            if refusal is not None:
+                results.append({"status": refusal.status_code, "message": refusal.message})
+                count_booking(refusal)
+                continue
+            pending_points[club.name] = points - places_required * NUMBER_OF_POINTS_PER_PLACE
+            pending_places[competition.name] = places - places_required
+            accepted.append((club, competition, places_required))
+            results.append({"status": 200, "message": BOOKING_COMPLETE_MESSAGE})
+
+        refused = len(accepted) < len(bookings)
+        if mode == BATCH_ALL_OR_NOTHING and refused:
+            # Nothing was changed: the bookings are only cancelled in the response.
+            for result in results:
+                if result["status"] == 200:
+                    result.update(status=CANCELLED_BOOKING_REFUSAL.status_code,
+                                  message=CANCELLED_BOOKING_REFUSAL.message)
+            count_booking(CANCELLED_BOOKING_REFUSAL, len(accepted))
+            accepted = []
+        elif accepted:
+            for club, competition, places_required in accepted:
+                apply_booking(repository, club, competition, places_required)
+            with timed_phase("persist"):
+                storage.save_bookings(repository, [(club, competition) for club, competition, _ in accepted])
+            count_booking(None, len(accepted))
+
+    status_code = 409 if mode == BATCH_ALL_OR_NOTHING and refused else 200
+    return jsonify(mode=mode, booked=len(accepted), results=results), status_code
 
 
 @app.route('/logout')
 def logout():
     return redirect(url_for('index'))
+
+
+@app.route('/metrics')
+def metrics_page():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/cacheStats')
+def cache_stats():
+    return jsonify(data=storage.stats(), fragments=fragment_cache.stats())
+
+
+@app.cli.command('check-bookings')
+@click.argument('bookings_file', type=click.File())
+def check_bookings_command(bookings_file):
+    """Check the bookings of a json file ([{"club": ..., "competition": ..., "places": ...}, ...])
+    against the current data, without booking anything."""
+    bookings = [(item["club"], item["competition"], int(item["places"])) for item in json.load(bookings_file)]
+    refusals = precheck_bookings(get_repository(), bookings)
+    reasons = Counter(refusal.reason if refusal is not None else "allowed" for refusal in refusals)
+    for reason, count in sorted(reasons.items()):
+        click.echo(f"{reason}: {count}")
+
+
+@app.cli.command('compact-journal')
+def compact_journal_command():
+    """Save the bookings of the journal into clubs.json and competitions.json, then empty the journal."""
+    if getattr(storage, "journal", None) is None:
+        raise click.UsageError("No booking journal: set BOOKING_JOURNAL to its path.")
+    with booking_locks.hold(DATA_LOCK_KEY):
+        storage.compact()
+    click.echo("Journal compacted.")
+
+
+def json_paths_options(command):
+    """Add the --clubs and --competitions options of the json files to a command."""
+    command = click.option('--competitions', 'competitions_path', default='competitions.json',
+                           help="The json file of the competitions.")(command)
+    return click.option('--clubs', 'clubs_path', default='clubs.json', help="The json file of the clubs.")(command)
+
+
+@app.cli.command('import-json')
+@json_paths_options
+def import_json_command(clubs_path, competitions_path):
+    """Import the clubs and competitions of the json files into the SQLite database."""
+    database = SqliteStorage(app.config["SQLITE_DATABASE"])
+    with booking_locks.hold(DATA_LOCK_KEY):
+        number_of_clubs, number_of_competitions = database.import_json(clubs_path, competitions_path)
+    click.echo(f"Imported {number_of_clubs} clubs and {number_of_competitions} competitions "
+               f"into {app.config['SQLITE_DATABASE']}.")
+
+
+@app.cli.command('shard-json')
+@json_paths_options
+@click.option('--club-shards', default=ShardedStorage.DEFAULT_CLUB_SHARDS, type=click.IntRange(min=1),
+              help="The number of files of the clubs.")
+def shard_json_command(clubs_path, competitions_path, club_shards):
+    """Convert the json files into the sharded layout, in SHARDED_DIRECTORY."""
+    sharded = ShardedStorage(app.config["SHARDED_DIRECTORY"], json_format=app.config["JSON_FORMAT"])
+    with booking_locks.hold(DATA_LOCK_KEY):
+        number_of_clubs, number_of_competitions = sharded.import_json(clubs_path, competitions_path, club_shards)
+    click.echo(f"Wrote {number_of_clubs} clubs in {club_shards} shards and {number_of_competitions} competitions "
+               f"into {app.config['SHARDED_DIRECTORY']}.")
+
+
+@app.cli.command('unshard-json')
+@json_paths_options
+def unshard_json_command(clubs_path, competitions_path):
+    """Convert the sharded layout of SHARDED_DIRECTORY into single json files."""
+    sharded = ShardedStorage(app.config["SHARDED_DIRECTORY"], json_format=app.config["JSON_FORMAT"])
+    with booking_locks.hold(DATA_LOCK_KEY):
+        number_of_clubs, number_of_competitions = sharded.export_json(clubs_path, competitions_path)
+    click.echo(f"Wrote {number_of_clubs} clubs into {clubs_path} "
+               f"and {number_of_competitions} competitions into {competitions_path}.")
+
+
+@app.cli.command('publish-snapshot')
+@json_paths_options
+def publish_snapshot_command(clubs_path, competitions_path):
+    """Publish the clubs and competitions of the json files as the next snapshot of SNAPSHOT_PATH."""
+    snapshot_storage = SnapshotStorage(app.config["SNAPSHOT_PATH"])
+    with booking_locks.hold(DATA_LOCK_KEY):
+        number_of_clubs, number_of_competitions = snapshot_storage.import_json(clubs_path, competitions_path)
+    click.echo(f"Published {number_of_clubs} clubs and {number_of_competitions} competitions "
+               f"into {app.config['SNAPSHOT_PATH']}.")
+
+
+@app.cli.command('profile-report')
+@click.option('--directory', help="Directory of the profiles (PROFILE_DIRECTORY by default).")
+@click.option('--top', default=20, show_default=True, help="Number of functions per route.")
+@click.option('--sort', type=click.Choice(["cumulative", "tottime"]), default="cumulative", show_default=True)
+def profile_report_command(directory, top, sort):
+    """Give the functions which take the most time in the profiled requests, by route."""
+    directory = directory or app.config["PROFILE_DIRECTORY"]
+    if not os.path.isdir(directory):
+        raise click.UsageError(f"No profiles in {directory}.")
+    for route, (number, duration, rows) in hotspots(directory, top, sort).items():
+        click.echo(f"{route}: {number} profiles, {duration / number * 1000:.1f} ms per request on average")
+        click.echo(f"{'calls':>10} {'own (s)':>10} {'cumulative (s)':>15}  function")
+        for function, calls, own_time, cumulative_time in rows:
+            click.echo(f"{calls:>10} {own_time:>10.4f} {cumulative_time:>15.4f}  {function}")
+        click.echo()
+
+
+@app.cli.command('compile-templates')
+@click.option('--directory', help="Directory of the compiled templates (TEMPLATE_CACHE_DIR by default).")
+def compile_templates_command(directory):
+    """Compile all the templates into the bytecode cache, before the workers start."""
+    directory = directory or app.config["TEMPLATE_CACHE_DIR"]
+    if not directory:
+        raise click.UsageError("No template cache: set TEMPLATE_CACHE_DIR to its directory.")
+    # A new environment: the templates already loaded by this one would not be compiled again.
+    environment = app.create_jinja_environment()
+    environment.bytecode_cache = SharedBytecodeCache(directory)
+    template_names = environment.list_templates(extensions=["html"])
+    for template_name in template_names:
+        environment.get_template(template_name)
+    click.echo(f"Compiled {len(template_names)} templates into {directory}.")
+
+
+# The templates of the html pages, loaded by create_app().
+PAGE_TEMPLATES = ('index.html', 'welcome.html', 'booking.html', 'includes/clubs_board_snippet.html')
+
+
+def load_templates():
+    """Load the templates of the html pages (from the bytecode cache if they are in it), so that the first requests
+    don't compile them."""
+    for template_name in PAGE_TEMPLATES:
+        app.jinja_env.get_template(template_name)
+
+
+def warmup():
+    """Load the data and its indexes, so that the first requests don't wait for them."""
+    page_data().competition_index
+
+
+def create_app(config=None):
+    """Configure the app and give it, e.g. FLASK_APP="server:create_app()" or gunicorn "server:create_app()".
+
+    `config` overrides the settings read from the environment (e.g. CLUBS_PATH). The templates are loaded before
+    the app is given and, with WARMUP, the data too, instead of by the first requests.
+    """
+    if config:
+        app.config.from_mapping(config)
+    configure_app(app.config)
+    load_templates()
+    if app.config['WARMUP']:
+        warmup()
+    return app
@@ -0,0 +1,276 @@
+"""Immutable, versioned binary snapshots of the clubs and competitions, shared by the processes through mmap.
+
+A snapshot file keeps:
+    - a header: the magic, the version, the number of clubs and of competitions, and the table of the sections,
+    - the points and the numbers of places, as arrays of int64,
+    - the names, emails and dates, as utf-8 in one section, with the offsets of each value,
+    - the hashes of the emails and of the names (sorted, with their record), to find a record by binary search.
+
+Every process maps the same file: the records are read from the pages of the file, which the processes share,
+instead of being copied into each of them. A snapshot is never changed: the next version is written into another
+file, then renamed over the snapshot. The processes switch to it on their next load, all at once.
+"""
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+import mmap
+import os
+import struct
+import tempfile
+
+from competition_index import CompetitionIndex
+from data_cache import stat_signature
+from record_index import key_hash
+from records import Club, Competition, format_date, parse_date
+
+MAGIC = b"GUDSNAP1"
+# The sections, in the order of the file. The arrays of int64 are signed ("q"), the offsets and hashes are not.
+SECTIONS = (
+    ("club_points", "q"), ("club_names", "Q"), ("club_emails", "Q"),
+    ("club_emails_hashes", "Q"), ("club_emails_positions", "Q"),
+    ("club_names_hashes", "Q"), ("club_names_positions", "Q"),
+    ("competition_places", "q"), ("competition_names", "Q"), ("competition_dates", "Q"),
+    ("competition_names_hashes", "Q"), ("competition_names_positions", "Q"),
+    ("strings", None),
+)
+HEADER = struct.Struct("<8sqqq" + "qq" * len(SECTIONS))
+INT = struct.Struct("<q")
+# The int fields a booking changes, with their section.
+INT_FIELDS = {"points": "club_points", "number_of_places": "competition_places"}
+
+
+def build_snapshot(version, clubs, competitions):
+    """Build the content of a snapshot of the clubs and competitions (records)."""
+    strings = bytearray()
+
+    def text_offsets(values):
+        # The value i is strings[offsets[i]:offsets[i + 1]].
+        offsets = array("Q", [len(strings)])
+        for value in values:
+            strings.extend(value.encode())
+            offsets.append(len(strings))
+        return offsets
+
+    def hashes(column, values):
+        entries = sorted((key_hash(column, value), position) for position, value in enumerate(values))
+        return array("Q", [entry[0] for entry in entries]), array("Q", [entry[1] for entry in entries])
+
+    club_names = [club.name for club in clubs]
+    club_emails = [club.email for club in clubs]
+    competition_names = [competition.name for competition in competitions]
+    sections = {
+        "club_points": array("q", [int(club.points) for club in clubs]),
+        "club_names": text_offsets(club_names),
+        "club_emails": text_offsets(club_emails),
+        "competition_places": array("q", [int(competition.number_of_places) for competition in competitions]),
+        "competition_names": text_offsets(competition_names),
+        "competition_dates": text_offsets([format_date(competition.date) for competition in competitions]),
+    }
+    for column, values in (("club_emails", club_emails), ("club_names", club_names),
+                           ("competition_names", competition_names)):
+        sections[column + "_hashes"], sections[column + "_positions"] = hashes(column, values)
+    sections["strings"] = strings
+
+    content = bytearray(HEADER.size)
+    table = []
+    for name, _ in SECTIONS:
+        data = bytes(sections[name])
+        # The arrays start on a multiple of 8 bytes.
+        content.extend(bytes(-len(content) % 8))
+        table.extend((len(content), len(data)))
+        content.extend(data)
+    HEADER.pack_into(content, 0, MAGIC, version, len(clubs), len(competitions), *table)
+    return content
+
+
+def write_snapshot(path, content):
+    """Write a snapshot into a new file, then rename it over `path`: the readers see the old or the new one."""
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+class Snapshot:
+    """A snapshot file, mapped in memory. Its sections are read in place, through memoryviews."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.signature = stat_signature(os.fstat(f.fileno()))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.number_of_clubs, self.number_of_competitions, *table = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a snapshot.")
+        view = memoryview(self._map)
+        self.offsets = {}
+        self.sections = {}
+        for (name, item_format), offset, length in zip(SECTIONS, table[0::2], table[1::2]):
+            self.offsets[name] = offset
+            section = view[offset:offset + length]
+            self.sections[name] = section.cast(item_format) if item_format else section
+
+    def text(self, column, position):
+        offsets = self.sections[column]
+        return str(self.sections["strings"][offsets[position]:offsets[position + 1]], "utf-8")
+
+    def find(self, column, value):
+        """Get the position of the record whose `column` is `value`, or None."""
+        hashes = self.sections[column + "_hashes"]
+        positions = self.sections[column + "_positions"]
+        target = key_hash(column, value)
+        number = bisect_left(hashes, target)
+        # Different values can have the same hash: the value itself is checked.
+        while number < len(hashes) and hashes[number] == target:
+            if self.text(column, positions[number]) == value:
+                return positions[number]
+            number += 1
+        return None
+
+    def patched(self, changes):
+        """Build the content of the next version of the snapshot, with the changed int values
+        {(section, position): value}."""
+        content = bytearray(self._map)
+        INT.pack_into(content, len(MAGIC), self.version + 1)
+        for (section, position), value in changes.items():
+            INT.pack_into(content, self.offsets[section] + INT.size * position, value)
+        return content
+
+
+class SnapshotRecords(Sequence):
+    """The clubs or the competitions of a snapshot, as a list of records read from the snapshot when they are used.
+
+    The int fields changed by a booking are kept in `changes` until the next version of the snapshot is written.
+    """
+
+    def __init__(self, snapshot, record_type, length, changes):
+        self.snapshot = snapshot
+        self.record_type = record_type
+        self.length = length
+        self.changes = changes
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.record_type(self, position) for position in range(*item.indices(self.length))]
+        if item < 0:
+            item += self.length
+        if not 0 <= item < self.length:
+            raise IndexError("record index out of range")
+        return self.record_type(self, item)
+
+    def __iter__(self):
+        return (self.record_type(self, position) for position in range(self.length))
+
+    def int_value(self, section, position):
+        value = self.changes.get((section, position))
+        return self.snapshot.sections[section][position] if value is None else value
+
+    def find(self, column, value):
+        position = self.snapshot.find(column, value)
+        return None if position is None else self.record_type(self, position)
+
+
+class SnapshotClub(Club):
+    """A club of a snapshot. Only its points can be changed."""
+
+    __slots__ = ("_records", "_position")
+    from_json = staticmethod(Club.from_json)
+
+    def __init__(self, records, position):
+        self._records = records
+        self._position = position
+
+    @property
+    def name(self):
+        return self._records.snapshot.text("club_names", self._position)
+
+    @property
+    def email(self):
+        return self._records.snapshot.text("club_emails", self._position)
+
+    @property
+    def points(self):
+        return self._records.int_value("club_points", self._position)
+
+    @points.setter
+    def points(self, value):
+        self._records.changes[("club_points", self._position)] = int(value)
+
+
+class SnapshotCompetition(Competition):
+    """A competition of a snapshot. Only its number of places can be changed."""
+
+    __slots__ = ("_records", "_position")
+    from_json = staticmethod(Competition.from_json)
+
+    def __init__(self, records, position):
+        self._records = records
+        self._position = position
+
+    @property
+    def name(self):
+        return self._records.snapshot.text("competition_names", self._position)
+
+    @property
+    def date(self):
+        return parse_date(self._records.snapshot.text("competition_dates", self._position))
+
+    @property
+    def number_of_places(self):
+        return self._records.int_value("competition_places", self._position)
+
+    @number_of_places.setter
+    def number_of_places(self, value):
+        self._records.changes[("competition_places", self._position)] = int(value)
+
+
+class SnapshotRepository:
+    """The Repository of a snapshot: the records are found through the hashes of the snapshot, so no process
+    builds its own indexes. Only the points and the numbers of places can be updated."""
+
+    def __init__(self, clubs, competitions):
+        self.clubs = clubs
+        self.competitions = competitions
+        self._competition_index = None
+
+    @property
+    def competition_index(self):
+        if self._competition_index is None:
+            self._competition_index = CompetitionIndex(self.competitions)
+        return self._competition_index
+
+    def club_by_email(self, email):
+        return self.clubs.find("club_emails", email)
+
+    def club_by_name(self, name):
+        return self.clubs.find("club_names", name)
+
+    def competition_by_name(self, name):
+        return self.competitions.find("competition_names", name)
+
+    @staticmethod
+    def _update(record, name, fields):
+        if record is None:
+            raise KeyError(name)
+        unknown = set(fields) - set(INT_FIELDS)
+        if unknown:
+            raise ValueError(f"Only the points and the number of places of a snapshot can change, not: "
+                             f"{', '.join(sorted(unknown))}")
+        record.update(fields)
+        return record
+
+    def update_club(self, club_name, **fields):
+        return self._update(self.club_by_name(club_name), club_name, fields)
+
+    def update_competition(self, competition_name, **fields):
+        return self._update(self.competition_by_name(competition_name), competition_name, fields)
@@ -0,0 +1,694 @@
+"""Storage backends for clubs and competitions: json files (the default), a SQLite database, sharded json files, or
+a snapshot file shared by the processes.
+
+All backends give the same interface, with Club and Competition records:
+    - load_clubs() / load_competitions(): the cached lists of records, shared by all callers,
+    - save_clubs(clubs) / save_competitions(competitions): replace all the records,
+    - booking_lock_keys(club_name, competition_name): the locks a booking must hold,
+    - save_booking(repository, club, competition): save a booking already applied on the repository,
+    - save_bookings(repository, bookings): save many (club, competition) bookings at once,
+    - invalidate() and stats().
+A backend whose records are not plain lists gives make_repository(clubs, competitions) too.
+"""
+from collections import namedtuple
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+
+from data_cache import DataCache, bump_data_version, file_signature
+from journal import BookingJournal
+from locking import FileLock
+from record_index import RecordIndex
+from records import Club, Competition, format_date, parse_date
+from repository import Repository
+from serialization import read_json, write_json, JSON_FORMATS, PRETTY
+from snapshot import build_snapshot, write_snapshot, Snapshot, SnapshotRecords, SnapshotClub, SnapshotCompetition, \
+    SnapshotRepository
+
+# Lock held by the writers of the whole data.
+DATA_LOCK_KEY = "data"
+
+
+def write_records(path, key, records, json_format=PRETTY, durable=False):
+    """Write records in the json schema of the data files."""
+    write_json(path, {key: [record.to_json() for record in records]}, json_format, durable)
+
+
+def read_json_records(clubs_path, competitions_path):
+    """Read the clubs and the competitions of the json data files, as records."""
+    clubs = [Club.from_json(club) for club in read_json(clubs_path)['clubs']]
+    competitions = [Competition.from_json(competition) for competition in read_json(competitions_path)['competitions']]
+    return clubs, competitions
+
+
+def booking_record_keys(club_name, competition_name):
+    """Get the locks of a booking which changes only the records of its club and its competition."""
+    return ["club:" + club_name, "competition:" + competition_name]
+
+
+class JsonStorage:
+    """Keep the clubs and the competitions in json files.
+
+    With a journal path, bookings are appended to the journal instead of rewriting the json files.
+    The files are written in `json_format` (see serialization.py), and read whatever their format.
+    With `record_index` (and no journal, whose bookings are not in the files), a club can be found by email or
+    by name in `clubs_index` without loading all the clubs.
+    """
+
+    def __init__(self, clubs_path='clubs.json', competitions_path='competitions.json', journal_path=None,
+                 json_format=PRETTY, record_index=False):
+        self.clubs_path = clubs_path
+        self.competitions_path = competitions_path
+        self.json_format = json_format
+        self.journal = BookingJournal(journal_path) if journal_path else None
+        self.clubs_index = RecordIndex(clubs_path, "clubs", ("email", "name")) \
+            if record_index and self.journal is None else None
+        # The parsed json files are kept in memory and reloaded only when the files change on disk.
+        self.clubs_cache = DataCache(clubs_path, 'clubs', journal=self.journal, record_type=Club)
+        self.competitions_cache = DataCache(
+            competitions_path, 'competitions', journal=self.journal, record_type=Competition)
+        # Appending a booking and checking whether other processes wrote to the journal go together.
+        self._journal_write_lock = threading.Lock()
+
+    def load_clubs(self):
+        return self.clubs_cache.get()
+
+    def load_competitions(self):
+        return self.competitions_cache.get()
+
+    def save_clubs(self, clubs):
+        self._replace(self.clubs_cache, "clubs", clubs)
+
+    def save_competitions(self, competitions):
+        self._replace(self.competitions_cache, "competitions", competitions)
+
+    def _replace(self, cache, key, records):
+        """Replace the records of one json file."""
+        if self.journal is None:
+            write_records(cache.path, key, records, self.json_format)
+            cache.put(records)
+            return
+        # The bookings of the journal must not be replayed over this new data: the journal is compacted, and the
+        # new file written, before a booking can be appended again.
+        with FileLock(self.journal.path + ".lock"):
+            self._compact()
+            write_records(cache.path, key, records, self.json_format)
+            cache.put(records)
+
+    def booking_lock_keys(self, club_name, competition_name):
+        if self.journal is None:
+            # Each booking rewrites the whole json files, from the data it read: bookings can't overlap.
+            return [DATA_LOCK_KEY]
+        # A journal record only holds the club and the competition of the booking:
+        # only the bookings of the same club or of the same competition wait for each other.
+        return booking_record_keys(club_name, competition_name)
+
+    def save_booking(self, repository, club, competition):
+        """Save a booking: one record in the journal if there is one, otherwise the whole json files."""
+        self.save_bookings(repository, [(club, competition)])
+
+    def save_bookings(self, repository, bookings):
+        if self.journal is None:
+            try:
+                write_records(self.clubs_path, "clubs", repository.clubs, self.json_format)
+                write_records(self.competitions_path, "competitions", repository.competitions, self.json_format)
+            except OSError:
+                # The bookings are in memory but not on disk.
+                self.invalidate()
+                raise
+            self.clubs_cache.put(repository.clubs)
+            self.competitions_cache.put(repository.competitions)
+            return
+        # The compaction of the journal waits for the bookings being written, and the reverse.
+        with FileLock(self.journal.path + ".lock", shared=True), self._journal_write_lock:
+            clubs_signature = self.clubs_cache.signature()
+            competitions_signature = self.competitions_cache.signature()
+            try:
+                journal_before, journal_after = self.journal.append_many([
+                    (club.name, club.points, competition.name, competition.number_of_places)
+                    for club, competition in bookings
+                ])
+            except OSError:
+                # The bookings are in memory but not on disk.
+                self.invalidate()
+                raise
+            for cache, data, (data_signature, journal_signature) in (
+                (self.clubs_cache, repository.clubs, clubs_signature),
+                (self.competitions_cache, repository.competitions, competitions_signature),
+            ):
+                if journal_before is None or journal_signature != journal_before:
+                    # Another process appended bookings which are not in the cached data.
+                    cache.invalidate()
+                else:
+                    cache.put(data, (data_signature, journal_signature), (data_signature, journal_after))
+
+    def compact(self):
+        """Save the bookings of the journal into new json snapshots, then empty the journal."""
+        with FileLock(self.journal.path + ".lock"):
+            self._compact()
+
+    def _compact(self):
+        # The caller holds the lock of the journal (exclusive).
+        clubs = self.clubs_cache.get(journal_locked=True)
+        competitions = self.competitions_cache.get(journal_locked=True)
+        # The snapshots must be on disk before the journal is emptied: their bookings are only in the journal.
+        write_records(self.clubs_path, "clubs", clubs, self.json_format, durable=True)
+        write_records(self.competitions_path, "competitions", competitions, self.json_format, durable=True)
+        # The journal keeps the new values of each booking, so a crash before this point is harmless:
+        # replaying the journal over the new (or the old) snapshots gives the same data.
+        self.journal.truncate()
+        self.clubs_cache.put(clubs)
+        self.competitions_cache.put(competitions)
+
+    def invalidate(self):
+        self.clubs_cache.invalidate()
+        self.competitions_cache.invalidate()
+
+    def stats(self):
+        return {"clubs": self.clubs_cache.stats(), "competitions": self.competitions_cache.stats()}
+
+
+class SqliteStorage:
+    """Keep the clubs and the competitions in a SQLite database, in WAL mode.
+
+    A booking updates one row of each table in one transaction. The tables are kept in memory too, and
+    reloaded only when another connection (e.g. another worker process) commits a change: this is
+    what `PRAGMA data_version` tells.
+    """
+
+    # points and number_of_places have no type: the databases imported before the typed records keep strings.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS clubs (name TEXT PRIMARY KEY, email TEXT NOT NULL, points NOT NULL);
+        CREATE INDEX IF NOT EXISTS clubs_email ON clubs (email);
+        CREATE TABLE IF NOT EXISTS competitions (name TEXT PRIMARY KEY, date TEXT NOT NULL, number_of_places NOT NULL);
+    """
+
+    def __init__(self, path='gudlft.db'):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._clubs = None
+        self._competitions = None
+        self._data_version = None
+        # One connection per process, used by one thread at a time: so `PRAGMA data_version` only changes
+        # for the commits of the other processes.
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+            self._clubs = self._competitions = self._data_version = None
+        return self._connection
+
+    def _get(self):
+        """Get the cached clubs and competitions, reloading them if the database was changed by another process."""
+        with self._lock:
+            connection = self.connect()
+            data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+            if self._clubs is not None and self._competitions is not None and data_version == self._data_version:
+                self.hits += 1
+                return self._clubs, self._competitions
+            self.misses += 1
+            if self.misses > 1:
+                self.reloads += 1
+            self._clubs = [
+                Club(name, email, int(points))
+                for name, email, points in connection.execute("SELECT name, email, points FROM clubs ORDER BY rowid")
+            ]
+            self._competitions = [
+                Competition(name, parse_date(date), int(number_of_places))
+                for name, date, number_of_places in connection.execute(
+                    "SELECT name, date, number_of_places FROM competitions ORDER BY rowid")
+            ]
+            self._data_version = data_version
+            bump_data_version()
+            return self._clubs, self._competitions
+
+    def load_clubs(self):
+        return self._get()[0]
+
+    def load_competitions(self):
+        return self._get()[1]
+
+    def _write(self, statements, clubs=None, competitions=None, in_place=False):
+        """Run the statements in one transaction, then keep the given lists as cached data.
+
+        With `in_place`, the lists are the cached lists changed in place. If they are not cached anymore, or if
+        another process committed before this transaction, the cached data is reloaded on the next load.
+        """
+        with self._lock:
+            connection = self.connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # No other connection can commit until this transaction ends.
+                data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+                for sql, parameters in statements:
+                    connection.executemany(sql, parameters)
+                connection.execute("COMMIT")
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                self._clubs = self._competitions = None
+                raise
+            outdated = data_version != self._data_version
+            if in_place:
+                outdated = outdated or clubs is not self._clubs or competitions is not self._competitions
+            if outdated:
+                self._clubs = self._competitions = None
+            else:
+                if clubs is not None:
+                    self._clubs = clubs
+                if competitions is not None:
+                    self._competitions = competitions
+            bump_data_version()
+
+    def save_clubs(self, clubs):
+        self._write([
+            ("DELETE FROM clubs", [()]),
+            ("INSERT INTO clubs (name, email, points) VALUES (?, ?, ?)",
+             [(club.name, club.email, club.points) for club in clubs]),
+        ], clubs=clubs)
+
+    def save_competitions(self, competitions):
+        self._write([
+            ("DELETE FROM competitions", [()]),
+            ("INSERT INTO competitions (name, date, number_of_places) VALUES (?, ?, ?)",
+             [(competition.name, format_date(competition.date), competition.number_of_places)
+              for competition in competitions]),
+        ], competitions=competitions)
+
+    def booking_lock_keys(self, club_name, competition_name):
+        return booking_record_keys(club_name, competition_name)
+
+    def save_booking(self, repository, club, competition):
+        """Save a booking: one UPDATE of the club and one UPDATE of the competition, in one transaction."""
+        self.save_bookings(repository, [(club, competition)])
+
+    def save_bookings(self, repository, bookings):
+        self._write([
+            ("UPDATE clubs SET points = ? WHERE name = ?", [(club.points, club.name) for club, _ in bookings]),
+            ("UPDATE competitions SET number_of_places = ? WHERE name = ?",
+             [(competition.number_of_places, competition.name) for _, competition in bookings]),
+        ], clubs=repository.clubs, competitions=repository.competitions, in_place=True)
+
+    def import_json(self, clubs_path='clubs.json', competitions_path='competitions.json'):
+        """Replace the content of the database by the clubs and competitions of the json files."""
+        clubs, competitions = read_json_records(clubs_path, competitions_path)
+        self.save_clubs(clubs)
+        self.save_competitions(competitions)
+        return len(clubs), len(competitions)
+
+    def invalidate(self):
+        with self._lock:
+            self._clubs = self._competitions = None
+        bump_data_version()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+
+ClubShardFile = namedtuple("ClubShardFile", ["records", "positions", "signature"])
+CompetitionFile = namedtuple("CompetitionFile", ["record", "signature"])
+
+
+def club_shard(club_name, club_shards):
+    """Get the shard of a club. crc32 gives the same shard in every process, unlike hash()."""
+    return zlib.crc32(club_name.encode()) % club_shards
+
+
+def competition_file_name(competition_name):
+    """Get the file of a competition. The name is hashed since it can contain any character."""
+    return hashlib.sha1(competition_name.encode()).hexdigest() + ".json"
+
+
+class ShardedStorage:
+    """Keep each competition in its own json file, and the clubs in `club_shards` json files by hash of their name.
+
+    A booking rewrites only the file of its competition and the shard of its club: only the bookings using the
+    same files wait for each other. The manifest gives the number of club shards and the order of the
+    competitions; each club shard keeps the positions of its clubs in the list of all the clubs. Each write appends
+    one byte to the generation file: a load only checks its size, and when another process changed some files, only
+    these files are read again.
+
+    Replacing all the records takes the lock of the manifest, which the bookings and the reads share.
+    """
+
+    DEFAULT_CLUB_SHARDS = 16
+
+    def __init__(self, directory='data', json_format=PRETTY):
+        self.directory = directory
+        self.json_format = json_format
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.lock_path = os.path.join(directory, "manifest.lock")
+        self.generation_path = os.path.join(directory, "generation")
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._manifest_signature = None
+        # The generation of the files read: the inode and the size of the generation file.
+        self._generation = None
+        self._club_shards = None
+        self._competition_files = None
+        # Position of each competition in the manifest, by file name.
+        self._competition_positions = None
+        self._clubs = None
+        self._competitions = None
+        self._lock = threading.Lock()
+
+    def club_shard_path(self, shard):
+        return os.path.join(self.directory, "clubs", f"{shard:04d}.json")
+
+    def competition_path(self, file_name):
+        return os.path.join(self.directory, "competitions", file_name)
+
+    def current_generation(self):
+        try:
+            stat = os.stat(self.generation_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def _bump_generation(self):
+        """Tell the other processes that some files changed, once they are written."""
+        fd = os.open(self.generation_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b".")
+            size = os.lseek(fd, 0, os.SEEK_CUR)
+            inode = os.fstat(fd).st_ino
+        finally:
+            os.close(fd)
+        # Still fresh if no other process wrote since the files were read: the byte before is the last one seen.
+        if self._generation == (inode, size - 1):
+            self._generation = (inode, size)
+
+    def _read_changed_files(self):
+        """Read the manifest and the files whose signature changed, then rebuild the lists which changed."""
+        # Taken before reading: the files written meanwhile are read again by the next load.
+        generation = self.current_generation()
+        signature = file_signature(self.manifest_path)
+        if self._club_shards is None or signature != self._manifest_signature:
+            manifest = read_json(self.manifest_path)
+            self._manifest_signature = signature
+            self._club_shards = [None] * manifest["club_shards"]
+            self._competition_files = [None] * len(manifest["competitions"])
+            self._competition_positions = {
+                file_name: position for position, file_name in enumerate(manifest["competitions"])}
+            self._clubs = self._competitions = None
+
+        clubs_changed = self._clubs is None
+        for shard, shard_file in enumerate(self._club_shards):
+            path = self.club_shard_path(shard)
+            signature = file_signature(path)
+            if shard_file is None or signature != shard_file.signature:
+                data = read_json(path)
+                records = [Club.from_json(club) for club in data["clubs"]]
+                self._club_shards[shard] = ClubShardFile(records, data["positions"], signature)
+                clubs_changed = True
+        if clubs_changed:
+            clubs = [None] * sum(len(shard_file.records) for shard_file in self._club_shards)
+            for shard_file in self._club_shards:
+                for position, club in zip(shard_file.positions, shard_file.records):
+                    clubs[position] = club
+            self._clubs = clubs
+
+        competitions_changed = self._competitions is None
+        for file_name, position in self._competition_positions.items():
+            path = self.competition_path(file_name)
+            signature = file_signature(path)
+            competition_file = self._competition_files[position]
+            if competition_file is None or signature != competition_file.signature:
+                record = Competition.from_json(read_json(path)["competition"])
+                self._competition_files[position] = CompetitionFile(record, signature)
+                competitions_changed = True
+        if competitions_changed:
+            self._competitions = [competition_file.record for competition_file in self._competition_files]
+        self._generation = generation
+
+    def _get(self):
+        """Get the cached clubs and competitions, reading again the files changed by another process."""
+        # Without the lock: the lists are set before the generation, and replaced (not changed) by a reload.
+        clubs, competitions, generation = self._clubs, self._competitions, self._generation
+        if clubs is not None and competitions is not None and self.current_generation() == generation:
+            self.hits += 1
+            return clubs, competitions
+        # The files are not read while all of them are being replaced.
+        with FileLock(self.lock_path, shared=True), self._lock:
+            self.misses += 1
+            if self.misses > 1:
+                self.reloads += 1
+            self._read_changed_files()
+            bump_data_version()
+            return self._clubs, self._competitions
+
+    def load_clubs(self):
+        return self._get()[0]
+
+    def load_competitions(self):
+        return self._get()[1]
+
+    def create(self, clubs, competitions, club_shards=DEFAULT_CLUB_SHARDS):
+        """Write all the files of the sharded layout, replacing the ones of the directory."""
+        for subdirectory in ("clubs", "competitions"):
+            os.makedirs(os.path.join(self.directory, subdirectory), exist_ok=True)
+        with FileLock(self.lock_path), self._lock:
+            self._write_all(clubs, competitions, club_shards)
+
+    def _write_all(self, clubs, competitions, club_shards):
+        shards = [([], []) for _ in range(club_shards)]
+        for position, club in enumerate(clubs):
+            records, positions = shards[club_shard(club.name, club_shards)]
+            records.append(club.to_json())
+            positions.append(position)
+        for shard, (records, positions) in enumerate(shards):
+            write_json(self.club_shard_path(shard), {"clubs": records, "positions": positions}, self.json_format)
+
+        file_names = [competition_file_name(competition.name) for competition in competitions]
+        for file_name, competition in zip(file_names, competitions):
+            write_json(self.competition_path(file_name), {"competition": competition.to_json()}, self.json_format)
+        for file_name in set(os.listdir(os.path.join(self.directory, "competitions"))) - set(file_names):
+            os.remove(self.competition_path(file_name))
+
+        # The manifest is written last: its new signature makes the other processes read all the files again.
+        write_json(self.manifest_path, {"club_shards": club_shards, "competitions": file_names}, self.json_format)
+        # A new generation file (a new inode): no booking appends to it while all the files are replaced.
+        with open(self.generation_path + ".tmp", "wb"):
+            pass
+        os.replace(self.generation_path + ".tmp", self.generation_path)
+        self._club_shards = None
+        self._read_changed_files()
+        bump_data_version()
+
+    def save_clubs(self, clubs):
+        with FileLock(self.lock_path), self._lock:
+            self._read_changed_files()
+            self._write_all(clubs, self._competitions, len(self._club_shards))
+
+    def save_competitions(self, competitions):
+        with FileLock(self.lock_path), self._lock:
+            self._read_changed_files()
+            self._write_all(self._clubs, competitions, len(self._club_shards))
+
+    def booking_lock_keys(self, club_name, competition_name):
+        """A booking locks the shard of its club and the file of its competition."""
+        self._get()
+        return ["club-shard:" + str(club_shard(club_name, len(self._club_shards))), "competition:" + competition_name]
+
+    def save_booking(self, repository, club, competition):
+        """Save a booking: rewrite the shard of the club and the file of the competition."""
+        self.save_bookings(repository, [(club, competition)])
+
+    def save_bookings(self, repository, bookings):
+        try:
+            self._save_bookings(repository, bookings)
+        except OSError:
+            # The bookings are in memory, but not (or not all of them) on disk: the files are read again.
+            self.invalidate()
+            raise
+
+    def _save_bookings(self, repository, bookings):
+        with FileLock(self.lock_path, shared=True), self._lock:
+            if self._club_shards is None or repository.clubs is not self._clubs \
+                    or repository.competitions is not self._competitions:
+                # The files were read again since the bookings were applied. The booked files can't have changed,
+                # since the bookings hold their locks: their values are copied into the records read again.
+                self._read_changed_files()
+                current = Repository(self._clubs, self._competitions)
+                for club, competition in bookings:
+                    current.update_club(club.name, points=club.points)
+                    current.update_competition(competition.name, number_of_places=competition.number_of_places)
+
+            shards = {club_shard(club.name, len(self._club_shards)) for club, _ in bookings}
+            for shard in sorted(shards):
+                shard_file = self._club_shards[shard]
+                path = self.club_shard_path(shard)
+                write_json(path, {"clubs": [club.to_json() for club in shard_file.records],
+                                  "positions": shard_file.positions}, self.json_format)
+                self._club_shards[shard] = shard_file._replace(signature=file_signature(path))
+
+            for file_name in {competition_file_name(competition.name) for _, competition in bookings}:
+                position = self._competition_positions[file_name]
+                competition_file = self._competition_files[position]
+                path = self.competition_path(file_name)
+                write_json(path, {"competition": competition_file.record.to_json()}, self.json_format)
+                self._competition_files[position] = competition_file._replace(signature=file_signature(path))
+            self._bump_generation()
+            bump_data_version()
+
+    def import_json(self, clubs_path='clubs.json', competitions_path='competitions.json',
+                    club_shards=DEFAULT_CLUB_SHARDS):
+        """Write the sharded layout of the clubs and competitions of the json files."""
+        clubs, competitions = read_json_records(clubs_path, competitions_path)
+        self.create(clubs, competitions, club_shards)
+        return len(clubs), len(competitions)
+
+    def export_json(self, clubs_path='clubs.json', competitions_path='competitions.json'):
+        """Write the clubs and competitions into single json files."""
+        clubs, competitions = self._get()
+        write_records(clubs_path, "clubs", clubs, self.json_format)
+        write_records(competitions_path, "competitions", competitions, self.json_format)
+        return len(clubs), len(competitions)
+
+    def invalidate(self):
+        with self._lock:
+            self._club_shards = None
+            self._clubs = self._competitions = None
+            self._generation = None
+        bump_data_version()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+
+SnapshotData = namedtuple("SnapshotData", ["snapshot", "clubs", "competitions"])
+
+
+class SnapshotStorage:
+    """Keep the clubs and the competitions in a snapshot file (e.g. on /dev/shm), mapped by all the processes.
+
+    A load only checks the signature of the file, and maps the new snapshot when it was replaced. A booking writes
+    the next version of the snapshot (a copy with its new int values): the whole data is written, so the
+    bookings hold the lock of the whole data.
+    """
+
+    def __init__(self, path='gudlft.snapshot'):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        data = self._data
+        signature = file_signature(self.path)
+        if data is not None and data.snapshot.signature == signature:
+            self.hits += 1
+            return data
+        with self._lock:
+            data = self._data
+            if data is None or data.snapshot.signature != file_signature(self.path):
+                self.misses += 1
+                if self.misses > 1:
+                    self.reloads += 1
+                snapshot = Snapshot(self.path)
+                # The changes of the clubs and of the competitions are saved together.
+                changes = {}
+                data = self._data = SnapshotData(
+                    snapshot,
+                    SnapshotRecords(snapshot, SnapshotClub, snapshot.number_of_clubs, changes),
+                    SnapshotRecords(snapshot, SnapshotCompetition, snapshot.number_of_competitions, changes),
+                )
+                bump_data_version()
+            return data
+
+    def load_clubs(self):
+        return self._get().clubs
+
+    def load_competitions(self):
+        return self._get().competitions
+
+    def make_repository(self, clubs, competitions):
+        return SnapshotRepository(clubs, competitions)
+
+    def _publish(self, content):
+        with self._lock:
+            write_snapshot(self.path, content)
+            self._data = None
+        bump_data_version()
+
+    def _replace(self, clubs=None, competitions=None):
+        """Write a new snapshot with these clubs or competitions, and the others of the current snapshot."""
+        data = self._get() if os.path.exists(self.path) else SnapshotData(None, [], [])
+        version = data.snapshot.version + 1 if data.snapshot is not None else 1
+        self._publish(build_snapshot(version, data.clubs if clubs is None else clubs,
+                                     data.competitions if competitions is None else competitions))
+
+    def save_clubs(self, clubs):
+        self._replace(clubs=clubs)
+
+    def save_competitions(self, competitions):
+        self._replace(competitions=competitions)
+
+    def booking_lock_keys(self, club_name, competition_name):
+        return [DATA_LOCK_KEY]
+
+    def save_booking(self, repository, club, competition):
+        self.save_bookings(repository, [(club, competition)])
+
+    def save_bookings(self, repository, bookings):
+        """Write the next version of the snapshot of the repository, with the changes of its records."""
+        clubs = repository.clubs
+        try:
+            self._publish(clubs.snapshot.patched(clubs.changes))
+        except OSError:
+            # The bookings are not in the snapshot: the records are read from it again, without them.
+            clubs.changes.clear()
+            self.invalidate()
+            raise
+
+    def import_json(self, clubs_path='clubs.json', competitions_path='competitions.json'):
+        """Write a snapshot of the clubs and competitions of the json files."""
+        clubs, competitions = read_json_records(clubs_path, competitions_path)
+        self._replace(clubs, competitions)
+        return len(clubs), len(competitions)
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+        bump_data_version()
+
+    def stats(self):
+        data = self._data
+        return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads,
+                "version": data.snapshot.version if data is not None else None}
+
+
+def create_storage(config):
+    """Create the storage chosen by the config: STORAGE_BACKEND is "json" (the default), "sqlite", "sharded" or
+    "snapshot"."""
+    backend = config.get("STORAGE_BACKEND") or "json"
+    json_format = config.get("JSON_FORMAT") or PRETTY
+    if json_format not in JSON_FORMATS:
+        raise ValueError(f"Unknown json format: {json_format}")
+    if backend == "json":
+        return JsonStorage(config.get("CLUBS_PATH") or "clubs.json",
+                           config.get("COMPETITIONS_PATH") or "competitions.json",
+                           journal_path=config.get("BOOKING_JOURNAL"), json_format=json_format,
+                           record_index=bool(config.get("RECORD_INDEX")))
+    if backend == "sqlite":
+        return SqliteStorage(config.get("SQLITE_DATABASE") or "gudlft.db")
+    if backend == "sharded":
+        return ShardedStorage(config.get("SHARDED_DIRECTORY") or "data", json_format=json_format)
+    if backend == "snapshot":
+        return SnapshotStorage(config.get("SNAPSHOT_PATH") or "gudlft.snapshot")
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,31 @@
+"""A bytecode cache of the Jinja templates, in a directory shared by the worker processes.
+
+A template is compiled once for all the workers (or by `flask compile-templates` before they start): the others
+load its bytecode instead of parsing and compiling its source. Each cache file keeps the checksum of the source it
+was compiled from, so a changed template is compiled again.
+"""
+import os
+import tempfile
+
+from jinja2 import FileSystemBytecodeCache
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache whose files are written under another name first, then renamed: a worker never
+    reads the file another one is writing."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory)
+
+    def dump_bytecode(self, bucket):
+        path = self._get_cache_filename(bucket)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path) + ".")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                bucket.write_bytecode(f)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
@@ -0,0 +1,116 @@
+import json
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, datetime
+
+import pytest
+
+import server
+from server import app, load_clubs, load_competitions, NUMBER_OF_POINTS_PER_PLACE
+
+NUMBER_OF_CLUBS = 8
+NUMBER_OF_COMPETITIONS = 4
+PLACES_PER_COMPETITION = 100
+POINTS_PER_CLUB = 3000
+# Many more bookings than places: the competitions end up full, and the last bookings are refused.
+NUMBER_OF_BOOKINGS = 2000
+
+
+def book_one_place(booking):
+    """Book one place with a new client, and give the booking with the status code of the response."""
+    club_name, competition_name = booking
+    response = app.test_client().post("/purchasePlaces", data=dict(
+        places=1,
+        club=club_name,
+        competition=competition_name,
+    ))
+    return booking, response.status_code
+
+
+def book_in_threads(bookings):
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        return list(executor.map(book_one_place, bookings))
+
+
+def all_bookings():
+    return [
+        ("club" + str(index % NUMBER_OF_CLUBS), "competition" + str(index % NUMBER_OF_COMPETITIONS))
+        for index in range(NUMBER_OF_BOOKINGS)
+    ]
+
+
+@pytest.fixture(params=[
+    dict(STORAGE_BACKEND="json"),
+    dict(STORAGE_BACKEND="json", BOOKING_JOURNAL="bookings.journal"),
+    dict(STORAGE_BACKEND="sqlite", SQLITE_DATABASE="gudlft.db"),
+    dict(STORAGE_BACKEND="sharded", SHARDED_DIRECTORY="data"),
+    dict(STORAGE_BACKEND="snapshot", SNAPSHOT_PATH="gudlft.snapshot"),
+    dict(STORAGE_BACKEND="json", BOOKING_MODE="queue"),
+    dict(STORAGE_BACKEND="json", BOOKING_JOURNAL="bookings.journal", BOOKING_MODE="queue"),
+], ids=["json_files", "journal", "sqlite", "sharded", "snapshot", "queue", "queue_journal"])
+def data_dir(request, tmp_path, monkeypatch):
+    """Run the app on generated clubs and competitions, in a temporary directory."""
+    future_time = (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d %H:%M:%S')
+    clubs = [
+        {"name": "club" + str(index), "email": f"club{index}@gmail.com", "points": str(POINTS_PER_CLUB)}
+        for index in range(NUMBER_OF_CLUBS)
+    ]
+    competitions = [
+        {"name": "competition" + str(index), "date": future_time, "number_of_places": str(PLACES_PER_COMPETITION)}
+        for index in range(NUMBER_OF_COMPETITIONS)
+    ]
+    (tmp_path / "clubs.json").write_text(json.dumps({"clubs": clubs}))
+    (tmp_path / "competitions.json").write_text(json.dumps({"competitions": competitions}))
+    monkeypatch.chdir(tmp_path)
+    server.configure_data(dict(app.config, LOCK_DIR=str(tmp_path / ".locks"), **request.param))
+    if request.param["STORAGE_BACKEND"] in ("sqlite", "sharded", "snapshot"):
+        server.storage.import_json()
+    app.config["TESTING"] = True
+    yield tmp_path
+
+    monkeypatch.undo()
+    server.configure_data(app.config)
+
+
+def check_final_data(results):
+    """Check that the data on disk is exactly what the accepted bookings give."""
+    assert {status for _, status in results} == {200, 403}
+    accepted = Counter(booking for booking, status in results if status == 200)
+    accepted_per_club = Counter()
+    accepted_per_competition = Counter()
+    for (club_name, competition_name), count in accepted.items():
+        accepted_per_club[club_name] += count
+        accepted_per_competition[competition_name] += count
+
+    # Read the files again, as a new worker would do.
+    server.invalidate_data_cache()
+    for competition in load_competitions():
+        assert accepted_per_competition[competition["name"]] == PLACES_PER_COMPETITION
+        assert competition["number_of_places"] == "0"
+    for club in load_clubs():
+        expected_points = POINTS_PER_CLUB - accepted_per_club[club["name"]] * NUMBER_OF_POINTS_PER_PLACE
+        assert club["points"] == str(expected_points)
+
+
+def test_parallel_bookings_in_threads(data_dir):
+    """
+    GIVEN clubs booking the same competitions at the same time, from many threads
+    WHEN there are more bookings than places
+    THEN no booking is lost and the competitions are never overbooked
+    """
+    results = book_in_threads(all_bookings())
+    check_final_data(results)
+
+
+def test_parallel_bookings_in_processes(data_dir):
+    """
+    GIVEN clubs booking the same competitions at the same time, from many worker processes
+    WHEN there are more bookings than places
+    THEN no booking is lost and the competitions are never overbooked
+    """
+    bookings = all_bookings()
+    chunks = [bookings[index::4] for index in range(4)]
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = [result for chunk_results in pool.map(book_in_threads, chunks) for result in chunk_results]
+    check_final_data(results)
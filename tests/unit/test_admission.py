@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+import server
+from admission import AdmissionGate, Overloaded
+from server import app
+
+
+def test_gate_refuses_past_the_queue():
+    """
+    GIVEN a gate of 1 request in flight and 1 waiting
+    WHEN a request is in, another one waits and a third one comes
+    THEN the third one is refused at once, and the waiting one gets in when the first one leaves
+    """
+    gate = AdmissionGate(1, queue_size=1, timeout=5)
+    entered = threading.Event()
+
+    def wait_for_turn():
+        with gate.admit():
+            entered.set()
+
+    with gate.admit():
+        waiting = threading.Thread(target=wait_for_turn)
+        waiting.start()
+        while gate.waiting == 0:
+            time.sleep(0.001)
+        with pytest.raises(Overloaded) as refusal:
+            with gate.admit():
+                pass
+        assert refusal.value.reason == "queue_full"
+        assert not entered.is_set()
+    waiting.join()
+
+    assert entered.is_set()
+    assert (gate.in_flight, gate.waiting) == (0, 0)
+    assert gate.shed == {"queue_full": 1, "timeout": 0}
+
+
+def test_gate_refuses_after_the_timeout():
+    """
+    GIVEN a gate of 1 request in flight, with a queue
+    WHEN a request waits longer than the timeout
+    THEN it is refused
+    """
+    gate = AdmissionGate(1, queue_size=5, timeout=0.01)
+
+    with gate.admit():
+        with pytest.raises(Overloaded) as refusal:
+            with gate.admit():
+                pass
+
+    assert refusal.value.reason == "timeout"
+    assert gate.shed["timeout"] == 1
+
+
+def test_gate_without_limit():
+    """
+    GIVEN a gate without limit
+    WHEN many requests are in
+    THEN none is refused
+    """
+    gate = AdmissionGate(0)
+
+    with gate.admit(), gate.admit(), gate.admit():
+        pass
+
+
+def test_bookings_shed_with_retry_after(monkeypatch):
+    """
+    GIVEN the app with 1 booking at most and no queue
+    WHEN a booking comes while another one is handled
+    THEN it is refused at once with a 503 and a Retry-After, the pages are still displayed, and it is in the metrics
+    """
+    gate = AdmissionGate(1)
+    monkeypatch.setitem(server.admission_gates, "bookings", gate)
+    client = app.test_client()
+    club = server.load_clubs()[0]
+    competition = server.load_competitions()[0]
+
+    with gate.admit():
+        response = client.post("/purchasePlaces", data=dict(
+            places=1, club=club["name"], competition=competition["name"]))
+        assert client.get("/").status_code == 200
+        metrics_text = client.get("/metrics").get_data(as_text=True)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(app.config["RETRY_AFTER"])
+    assert 'gudlft_admission_shed_total{gate="bookings",reason="queue_full"} 1' in metrics_text
+    assert 'gudlft_admission_in_flight{gate="bookings"} 1' in metrics_text
+
+
+def test_streamed_page_holds_its_place(monkeypatch):
+    """
+    GIVEN the app with 1 page at most, streaming its pages
+    WHEN the index page is sent
+    THEN its place is held until the response is closed, after its body is rendered
+    """
+    gate = AdmissionGate(1)
+    monkeypatch.setitem(server.admission_gates, "pages", gate)
+    monkeypatch.setitem(app.config, "STREAM_MIN_RECORDS", 0)
+    client = app.test_client()
+
+    response = client.get("/")
+    assert response.is_streamed
+    assert gate.in_flight == 1
+    assert client.get("/").status_code == 503
+    response.get_data()
+    response.close()
+    assert gate.in_flight == 0
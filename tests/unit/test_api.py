@@ -0,0 +1,93 @@
+import msgpack
+import pytest
+
+from server import app, load_clubs, load_competitions
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def test_list_clubs_in_pages(client):
+    """
+    GIVEN the clubs
+    WHEN they are read 2 by 2 with the cursor of each page
+    THEN all the clubs are given once, in order
+    """
+    names = []
+    response = client.get("/api/clubs?limit=2")
+    while True:
+        assert response.status_code == 200
+        names.extend(club["name"] for club in response.json["items"])
+        cursor = response.json["next_cursor"]
+        if cursor is None:
+            break
+        response = client.get(f"/api/clubs?limit=2&cursor={cursor}")
+
+    assert names == [club["name"] for club in load_clubs()]
+
+
+def test_field_selection(client):
+    """
+    GIVEN the competitions
+    WHEN only some fields are asked
+    THEN only these fields are given
+    """
+    response = client.get("/api/competitions?fields=name,number_of_places")
+    assert response.json["items"] == [
+        {"name": competition["name"], "number_of_places": competition["number_of_places"]}
+        for competition in load_competitions()
+    ]
+    assert client.get("/api/competitions?fields=name,secret").status_code == 400
+
+
+@pytest.fixture
+def api_token():
+    app.config["API_TOKEN"] = "secret-token"
+    yield {"Authorization": "Bearer secret-token"}
+    app.config["API_TOKEN"] = None
+
+
+def test_get_club_in_msgpack(client, api_token):
+    """
+    GIVEN a club
+    WHEN it is asked by email with the API token, with msgpack in the Accept header
+    THEN the club is given in msgpack
+    """
+    club = load_clubs()[0]
+    response = client.get(f"/api/clubs/by-email/{club['email']}",
+                          headers=dict(api_token, Accept="application/msgpack"))
+    assert response.status_code == 200
+    assert response.mimetype == "application/msgpack"
+    assert msgpack.unpackb(response.data) == club
+
+
+def test_list_competitions_in_msgpack(client):
+    response = client.get("/api/competitions?format=msgpack")
+    assert msgpack.unpackb(response.data) == {"items": load_competitions(), "next_cursor": None}
+
+
+def test_get_unknown_records(client):
+    assert client.get("/api/clubs/Unknown").status_code == 404
+    assert client.get("/api/competitions/Unknown").json == {"error": "Competition not found."}
+    assert client.get("/api/clubs?cursor=xyz").status_code == 400
+
+
+def test_emails_are_not_public(client, api_token):
+    """
+    GIVEN the clubs, whose emails are their logins
+    WHEN they are read without the API token
+    THEN no email is given, and a known email can't be told from an unknown one
+    """
+    club = load_clubs()[0]
+
+    assert "email" not in client.get("/api/clubs").json["items"][0]
+    assert "email" not in client.get(f"/api/clubs/{club['name']}").json
+    assert client.get("/api/clubs?fields=name,email").status_code == 400
+    known = client.get(f"/api/clubs/by-email/{club['email']}")
+    unknown = client.get("/api/clubs/by-email/unknown@gudlft.com")
+    wrong_token = client.get(f"/api/clubs/by-email/{club['email']}", headers={"Authorization": "Bearer wrong"})
+    assert known.status_code == unknown.status_code == wrong_token.status_code == 401
+    assert known.data == unknown.data
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from serialization import write_json
+from server import app, create_app
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FUTURE_DATE = (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+@pytest.fixture
+def data_paths(tmp_path, monkeypatch):
+    """Clubs and competitions in a data directory, with another working directory."""
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    clubs_path = str(data_directory / "clubs.json")
+    competitions_path = str(data_directory / "competitions.json")
+    write_json(clubs_path, {"clubs": [{"name": "Club 1", "email": "club1@gudlft.com", "points": "13"}]})
+    write_json(competitions_path, {"competitions": [
+        {"name": "Spring Festival", "date": FUTURE_DATE, "number_of_places": "25"}]})
+    monkeypatch.chdir(tmp_path)
+    config = dict(app.config)
+    yield dict(CLUBS_PATH=clubs_path, COMPETITIONS_PATH=competitions_path, LOCK_DIR=str(tmp_path / ".locks"))
+    monkeypatch.undo()
+    app.config.clear()
+    app.config.update(config)
+    server.configure_app(app.config)
+
+
+def test_data_paths(data_paths):
+    """
+    GIVEN json files which are not in the working directory
+    WHEN the app is created with their paths
+    THEN it serves their clubs and competitions
+    """
+    client = create_app(data_paths).test_client()
+
+    response = client.post("/showSummary", data={"email": "club1@gudlft.com"})
+
+    assert response.status_code == 200
+    assert b"Spring Festival" in response.data
+
+
+@pytest.mark.parametrize("warmup", [False, True])
+def test_warmup(data_paths, warmup):
+    """
+    GIVEN the config of the app, with or without WARMUP
+    WHEN the app is created
+    THEN the data is loaded before the first request with WARMUP only
+    """
+    server._repository = None
+
+    create_app(dict(data_paths, WARMUP=warmup))
+
+    assert (server._repository is not None) == warmup
+    if warmup:
+        assert server._repository.clubs is server.storage.load_clubs()
+
+
+def test_import_writes_nothing(tmp_path):
+    """
+    GIVEN an empty working directory
+    WHEN server.py is imported
+    THEN it doesn't read or write any file there
+    """
+    subprocess.run([sys.executable, "-c", "import server"], cwd=tmp_path, check=True,
+                   env=dict(os.environ, PYTHONPATH=PROJECT_DIRECTORY, PYTHONDONTWRITEBYTECODE="1"))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_import_without_numpy(tmp_path):
+    """
+    GIVEN an empty working directory
+    WHEN server.py is imported
+    THEN numpy, needed only by BookingPolicy.check_many() (precheck_bookings, flask check-bookings), is not imported
+    """
+    subprocess.run([sys.executable, "-c", "import sys, server; assert 'numpy' not in sys.modules"], cwd=tmp_path,
+                   check=True, env=dict(os.environ, PYTHONPATH=PROJECT_DIRECTORY, PYTHONDONTWRITEBYTECODE="1"))
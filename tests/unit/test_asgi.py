@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+import pytest
+
+import asgi
+import server
+from serialization import write_json
+from server import app
+
+FUTURE_DATE = (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d %H:%M:%S')
+CLUBS = [{"name": f"Club {index}", "email": f"club{index}@gudlft.com", "points": "13"} for index in range(3)]
+COMPETITIONS = [{"name": "Spring Festival", "date": FUTURE_DATE, "number_of_places": "25"}]
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Run the app on its own clubs and competitions, in a temporary directory."""
+    write_json(str(tmp_path / "clubs.json"), {"clubs": CLUBS})
+    write_json(str(tmp_path / "competitions.json"), {"competitions": COMPETITIONS})
+    monkeypatch.chdir(tmp_path)
+    server.configure_data(dict(app.config, LOCK_DIR=str(tmp_path / ".locks")))
+    yield tmp_path
+    monkeypatch.undo()
+    server.configure_data(app.config)
+
+
+def asgi_request(method, path, form=None):
+    """Send a request to the ASGI application. Give its status, headers and body."""
+    body = urlencode(form).encode() if form else b""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": b"", "scheme": "http", "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"content-type", b"application/x-www-form-urlencoded")],
+    }
+    asyncio.run(asgi.application(scope, receive, send))
+    headers = {name.decode(): value.decode() for name, value in sent[0]["headers"]}
+    return sent[0]["status"], headers, sent[1]["body"]
+
+
+@pytest.mark.parametrize("method, path, form", [
+    ("GET", "/", None),
+    ("POST", "/showSummary", {"email": "club1@gudlft.com"}),
+    ("POST", "/showSummary", {"email": "unknown@gudlft.com"}),
+    ("GET", "/book/Spring Festival/Club 1", None),
+    ("GET", "/book/Unknown/Club 1", None),
+    ("POST", "/purchasePlaces", {"club": "Club 1", "competition": "Spring Festival", "places": "-1"}),
+    ("POST", "/purchasePlaces", {"club": "Club 1", "competition": "Spring Festival", "places": "two"}),
+    ("GET", "/logout", None),
+    ("GET", "/unknown", None),
+    ("GET", "/purchasePlaces", None),
+])
+def test_same_responses_as_the_flask_app(data_dir, method, path, form):
+    """
+    GIVEN the ASGI application and the Flask app on the same data
+    WHEN they get the same request
+    THEN they give the same response
+    """
+    status, headers, body = asgi_request(method, path, form)
+    response = app.test_client().open(path, method=method, data=form)
+
+    assert status == response.status_code
+    assert body == response.data
+    assert headers.get("Location") == response.headers.get("Location")
+    assert headers["Content-Type"] == response.headers["Content-Type"]
+
+
+@pytest.mark.parametrize("booking_mode", ["locks", "queue"])
+def test_booking(data_dir, booking_mode):
+    """
+    GIVEN the ASGI application
+    WHEN a club books places
+    THEN the booking is saved, and the welcome page gives the confirmation and the new points
+    """
+    server.configure_data(dict(app.config, LOCK_DIR=str(data_dir / ".locks"), BOOKING_MODE=booking_mode))
+
+    status, _, body = asgi_request("POST", "/purchasePlaces", {
+        "club": "Club 2", "competition": "Spring Festival", "places": "2"})
+
+    assert status == 200
+    assert b"Great - booking complete!" in body
+    assert b"Points available: 7" in body
+    server.invalidate_data_cache()
+    assert server.load_competitions()[0]["number_of_places"] == "23"
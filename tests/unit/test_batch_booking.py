@@ -0,0 +1,146 @@
+from datetime import timedelta, datetime
+
+import pytest
+
+from repository import Repository
+from server import (
+    app,
+    load_clubs,
+    load_competitions,
+    update_clubs_json,
+    update_competitions_json,
+    INVALID_BOOKING_REFUSAL,
+    MAX_PLACES,
+    NUMBER_OF_POINTS_PER_PLACE
+)
+
+# The original data
+CLUBS = load_clubs()
+COMPETITIONS = load_competitions()
+
+
+@pytest.fixture
+def client():
+    """Use a club with 12 points and two future competitions with 24 places."""
+    clubs = load_clubs()
+    clubs[0]["points"] = str(MAX_PLACES)
+    update_clubs_json({"clubs": clubs})
+
+    competitions = load_competitions()
+    for competition in competitions:
+        competition["date"] = (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d %H:%M:%S')
+        competition["number_of_places"] = str(MAX_PLACES * 2)
+    update_competitions_json({"competitions": competitions})
+
+    app.config["TESTING"] = True
+    yield app.test_client()
+
+    update_clubs_json({"clubs": CLUBS})
+    update_competitions_json({"competitions": COMPETITIONS})
+
+
+def batch(client, bookings, mode=None):
+    payload = {"bookings": bookings}
+    if mode is not None:
+        payload["mode"] = mode
+    return client.post("/purchasePlaces/batch", json=payload)
+
+
+def test_batch_best_effort(client):
+    """
+    GIVEN a club with 12 points
+    WHEN it books 2 places in each competition, then 1 more place, in one best effort batch
+    THEN the first two bookings are saved and the third one is refused, as a third of the points is used
+    """
+    club = CLUBS[0]["name"]
+    bookings = [
+        {"club": club, "competition": COMPETITIONS[0]["name"], "places": 2},
+        {"club": club, "competition": COMPETITIONS[1]["name"], "places": 2},
+        {"club": club, "competition": COMPETITIONS[0]["name"], "places": 1},
+    ]
+    response = batch(client, bookings, mode="best_effort")
+
+    assert response.status_code == 200
+    assert response.json["booked"] == 2
+    assert [result["status"] for result in response.json["results"]] == [200, 200, 403]
+    assert response.json["results"][2]["message"] == "You can't book more than a third of your available points!"
+    assert load_clubs()[0]["points"] == str(MAX_PLACES - 4 * NUMBER_OF_POINTS_PER_PLACE)
+    assert [competition["number_of_places"] for competition in load_competitions()] == [str(MAX_PLACES * 2 - 2)] * 2
+
+
+def test_batch_all_or_nothing(client):
+    """
+    GIVEN a club with 12 points
+    WHEN one of the bookings of an all or nothing batch is refused
+    THEN no booking is saved
+    """
+    club = CLUBS[0]["name"]
+    bookings = [
+        {"club": club, "competition": COMPETITIONS[0]["name"], "places": 2},
+        {"club": club, "competition": "Unknown competition", "places": 1},
+    ]
+    response = batch(client, bookings)
+
+    assert response.status_code == 409
+    assert response.json["booked"] == 0
+    assert [result["status"] for result in response.json["results"]] == [409, 404]
+    assert load_clubs()[0]["points"] == str(MAX_PLACES)
+    assert load_competitions()[0]["number_of_places"] == str(MAX_PLACES * 2)
+
+
+def test_batch_invalid_request(client):
+    """
+    GIVEN a batch request
+    WHEN it is not a list of bookings, or one of its bookings is incomplete
+    THEN the request or the booking is refused
+    """
+    assert client.post("/purchasePlaces/batch", json=[]).status_code == 400
+    assert batch(client, [], mode="unknown").status_code == 400
+
+    response = batch(client, [{"club": CLUBS[0]["name"], "places": "x"}], mode="best_effort")
+    assert response.status_code == 200
+    assert response.json["results"][0]["status"] == 400
+
+
+@pytest.mark.parametrize("booking", [
+    {"places": 2.9},
+    {"places": True},
+    {"places": "1"},
+    {"club": None},
+    {"competition": 1},
+])
+def test_batch_booking_of_the_wrong_types(client, booking):
+    """
+    GIVEN a batch booking whose places are not an integer, or whose names are not strings
+    WHEN it is sent
+    THEN it is refused as invalid, and nothing is booked
+    """
+    booking = dict({"club": CLUBS[0]["name"], "competition": COMPETITIONS[0]["name"], "places": 1}, **booking)
+    response = batch(client, [booking], mode="best_effort")
+
+    assert response.json["results"][0] == {"status": 400, "message": INVALID_BOOKING_REFUSAL.message}
+    assert load_clubs()[0]["points"] == str(MAX_PLACES)
+
+
+def test_cancelled_batch_never_changes_the_records(client, monkeypatch):
+    """
+    GIVEN the records shared by all the requests
+    WHEN an all or nothing batch is refused after some of its bookings were accepted
+    THEN the records are never changed, even for a while: the other requests never see the cancelled bookings
+    """
+    def refuse_update(self, name, **fields):
+        raise AssertionError(f"{name} was changed: {fields}")
+
+    monkeypatch.setattr(Repository, "update_club", refuse_update)
+    monkeypatch.setattr(Repository, "update_competition", refuse_update)
+    club = CLUBS[0]["name"]
+    bookings = [
+        {"club": club, "competition": COMPETITIONS[0]["name"], "places": 2},
+        {"club": club, "competition": COMPETITIONS[1]["name"], "places": 2},
+        {"club": club, "competition": COMPETITIONS[0]["name"], "places": 1},
+    ]
+
+    response = batch(client, bookings)
+
+    assert response.status_code == 409
+    assert [result["status"] for result in response.json["results"]] == [409, 409, 403]
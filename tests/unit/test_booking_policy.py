@@ -0,0 +1,79 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from booking_policy import BookingPolicy
+from records import Club, Competition
+from repository import Repository
+from server import precheck_bookings
+
+policy = BookingPolicy(max_places=12, points_per_place=3)
+
+
+@pytest.mark.parametrize("points, available_places, places_required, is_past, reason", [
+    (30, 20, 2, True, "past_competition"),
+    (30, 20, 11, False, "available_club_ability"),
+    (60, 20, 13, False, "max_places"),
+    (60, 5, 6, False, "available_places"),
+    (60, 20, -1, False, "negative_places"),
+    # With the same limits, the club's points come first, then MAX_PLACES.
+    (36, 12, 13, False, "available_club_ability"),
+    (60, 12, 13, False, "max_places"),
+])
+def test_check_gives_the_first_broken_rule(points, available_places, places_required, is_past, reason):
+    """
+    GIVEN a booking which breaks one or many rules
+    WHEN it is checked
+    THEN the refusal of the smallest limit is given, in the order of the rules
+    """
+    assert policy.check(points, available_places, places_required, is_past).reason == reason
+
+
+def test_check_allows_a_valid_booking():
+    """
+    GIVEN a booking within all the limits
+    WHEN it is checked
+    THEN it is allowed
+    """
+    assert policy.check(30, 20, 10, False) is None
+    assert policy.check(30, 20, 0, False) is None
+
+
+def test_check_many_gives_the_same_refusals_as_check():
+    """
+    GIVEN many random bookings
+    WHEN they are checked at once
+    THEN each one gets the same refusal as when it is checked alone
+    """
+    rng = random.Random(42)
+    bookings = [
+        (rng.randint(0, 60), rng.randint(0, 20), rng.randint(-2, 22), rng.random() < 0.1)
+        for _ in range(5000)
+    ]
+
+    codes = policy.check_many(*zip(*bookings))
+
+    assert [policy.refusals[code] for code in codes] == [policy.check(*booking) for booking in bookings]
+
+
+def test_precheck_bookings():
+    """
+    GIVEN bookings of existing and unknown clubs and competitions
+    WHEN they are checked against the current data
+    THEN each one gets its refusal, and nothing is booked
+    """
+    club = Club("Simply Lift", "john@simplylift.co", 13)
+    competition = Competition("Future Cup", datetime(2100, 1, 1, 10), 25)
+    repository = Repository([club], [competition])
+
+    refusals = precheck_bookings(repository, [
+        (club.name, competition.name, 1),
+        (club.name, competition.name, -1),
+        ("Unknown club", competition.name, 1),
+    ])
+
+    assert refusals[0] is None
+    assert refusals[1].reason == "negative_places"
+    assert refusals[2].status_code == 404
+    assert club.points == 13
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from competition_index import CompetitionIndex
+from records import Competition
+from repository import Repository
+
+COMPETITIONS = [
+    Competition("Spring Festival", datetime(2020, 3, 27, 10), 25),
+    Competition("Winter Cup", datetime(2021, 1, 10, 9), 10),
+    Competition("Fall Classic", datetime(2020, 10, 22, 13, 30), 13),
+]
+
+
+def names(competitions):
+    return [competition.name for competition in competitions]
+
+
+def test_competitions_sorted_by_date():
+    """
+    GIVEN competitions which are not sorted by date
+    WHEN the upcoming competitions, or the competitions between two dates, are asked
+    THEN they are given sorted by date
+    """
+    index = CompetitionIndex(COMPETITIONS)
+
+    assert names(index.upcoming(datetime(2020, 1, 1))) == ["Spring Festival", "Fall Classic", "Winter Cup"]
+    assert names(index.upcoming(datetime(2020, 10, 22, 13, 30))) == ["Winter Cup"]
+    assert names(index.between(datetime(2020, 3, 27, 10), datetime(2020, 12, 31))) == [
+        "Spring Festival", "Fall Classic"]
+
+
+def test_is_past():
+    index = CompetitionIndex(COMPETITIONS)
+    assert index.is_past(COMPETITIONS[0], datetime(2020, 3, 27, 10))
+    assert not index.is_past(COMPETITIONS[1], datetime(2020, 3, 27, 10))
+
+
+def test_index_rebuilt_when_a_date_changes():
+    """
+    GIVEN the competition index of a repository
+    WHEN the date of a competition changes
+    THEN the index is built again
+    """
+    repository = Repository([], [Competition.from_json(competition.to_json()) for competition in COMPETITIONS])
+    index = repository.competition_index
+    assert repository.competition_index is index
+
+    repository.update_competition("Spring Festival", number_of_places=20)
+    assert repository.competition_index is index
+
+    repository.update_competition("Spring Festival", date=datetime(2022, 1, 1, 10))
+    assert names(repository.competition_index.upcoming(datetime(2021, 6, 1))) == ["Spring Festival"]
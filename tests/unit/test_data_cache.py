@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from data_cache import DataCache, data_version
+
+
+@pytest.fixture
+def clubs_file(tmp_path):
+    """Write a small clubs json file for the tests."""
+    path = tmp_path / "clubs.json"
+    path.write_text(json.dumps({"clubs": [{"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}]}))
+    return str(path)
+
+
+def test_cache_hit_when_file_unchanged(clubs_file):
+    """
+    GIVEN a cache on a json file
+    WHEN the data is read twice without changing the file
+    THEN the file is parsed only once
+    """
+    cache = DataCache(clubs_file, "clubs")
+    first = cache.get()
+    second = cache.get()
+    assert first is second
+    assert first[0]["name"] == "Simply Lift"
+    assert cache.stats() == {"hits": 1, "misses": 1, "reloads": 0}
+
+
+def test_cache_reload_when_file_changed(clubs_file):
+    """
+    GIVEN a cache on a json file
+    WHEN the file is rewritten
+    THEN the next read reloads the file and bumps the data version
+    """
+    cache = DataCache(clubs_file, "clubs")
+    cache.get()
+    version = data_version()
+
+    with open(clubs_file, "w") as f:
+        json.dump({"clubs": [{"name": "Iron Temple", "email": "admin@irontemple.com", "points": "4"}]}, f)
+    # Make sure the signature changes even on file systems with a coarse mtime.
+    os.utime(clubs_file, ns=(0, 0))
+
+    assert cache.get()[0]["name"] == "Iron Temple"
+    assert cache.stats()["reloads"] == 1
+    assert data_version() > version
+
+
+def test_cache_put_does_not_reload(clubs_file):
+    """
+    GIVEN a cache on a json file
+    WHEN the data written to the file is given to the cache
+    THEN the next read uses it without parsing the file
+    """
+    cache = DataCache(clubs_file, "clubs")
+    cache.get()
+    data = [{"name": "She Lifts", "email": "kate@shelifts.co.uk", "points": "12"}]
+    with open(clubs_file, "w") as f:
+        json.dump({"clubs": data}, f)
+    cache.put(data)
+
+    assert cache.get() is data
+    assert cache.stats() == {"hits": 1, "misses": 1, "reloads": 0}
+
+
+def test_cache_invalidate(clubs_file):
+    """
+    GIVEN a cache on a json file
+    WHEN the cache is invalidated
+    THEN the next read parses the file again
+    """
+    cache = DataCache(clubs_file, "clubs")
+    first = cache.get()
+    version = cache.version
+    cache.invalidate()
+    assert cache.version > version
+    assert cache.get() is not first
+    assert cache.stats()["reloads"] == 1
@@ -0,0 +1,67 @@
+from fragment_cache import FragmentCache
+from server import app, fragment_cache, load_clubs, update_clubs_json
+
+
+def test_fragment_rendered_once_per_version():
+    """
+    GIVEN a fragment cache
+    WHEN a fragment is asked twice for a version, then for a new version
+    THEN it is rendered once for each version
+    """
+    cache = FragmentCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        return "<ul>" + str(len(renders)) + "</ul>"
+
+    assert cache.get_or_render("board", 1, render) == "<ul>1</ul>"
+    assert cache.get_or_render("board", 1, render) == "<ul>1</ul>"
+    assert cache.get_or_render("board", 2, render) == "<ul>2</ul>"
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+
+def test_fragments_are_bounded():
+    """
+    GIVEN a fragment cache of 2 fragments
+    WHEN 3 fragments are rendered, then one for a newer version
+    THEN the least recently used is dropped, then the fragments of the older version
+    """
+    cache = FragmentCache(max_fragments=2)
+    cache.get_or_render("page:1", 1, lambda: "1")
+    cache.get_or_render("page:2", 1, lambda: "2")
+    cache.get_or_render("page:1", 1, lambda: "not used")
+    cache.get_or_render("page:3", 1, lambda: "3")
+    assert len(cache) == 2
+    assert cache.get_or_render("page:1", 1, lambda: "rendered again") == "1"
+    assert cache.get_or_render("page:2", 1, lambda: "rendered again") == "rendered again"
+
+    cache.get_or_render("page:1", 2, lambda: "1 v2")
+    assert len(cache) == 1
+    assert cache.get_or_render("page:2", 1, lambda: "older") == "older"
+    assert len(cache) == 1
+
+
+def test_clubs_board_reused_until_data_changes():
+    """
+    GIVEN the index page
+    WHEN it is displayed twice, then after a change of the clubs
+    THEN the clubs' points board is reused, then rendered again with the new points
+    """
+    clubs = load_clubs()
+    client = app.test_client()
+    client.get("/").close()
+    hits = fragment_cache.stats()["hits"]
+
+    client.get("/").close()
+    assert fragment_cache.stats()["hits"] == hits + 1
+    assert client.get("/cacheStats").json["fragments"] == fragment_cache.stats()
+
+    changed_clubs = load_clubs()
+    changed_clubs[0]["points"] = "1000"
+    update_clubs_json({"clubs": changed_clubs})
+    try:
+        response = client.get("/")
+        assert str.encode(f'{clubs[0]["name"]}: 1000 points') in response.data
+    finally:
+        update_clubs_json({"clubs": clubs})
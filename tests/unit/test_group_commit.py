@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from group_commit import GroupCommitQueue
+
+
+def test_items_committed_by_groups():
+    """
+    GIVEN a queue whose writer is committing a first item
+    WHEN other items are submitted meanwhile
+    THEN they are committed together in one group, in their order, and each one gets its own result
+    """
+    groups = []
+    first_commit_started = threading.Event()
+    release_first_commit = threading.Event()
+
+    def commit(items):
+        groups.append(list(items))
+        if len(groups) == 1:
+            first_commit_started.set()
+            release_first_commit.wait()
+        return [item * 10 for item in items]
+
+    group_commit_queue = GroupCommitQueue(commit)
+    results = {}
+
+    def submit(item):
+        results[item] = group_commit_queue.submit(item)
+
+    first = threading.Thread(target=submit, args=(0,))
+    first.start()
+    first_commit_started.wait()
+    others = [threading.Thread(target=submit, args=(item,)) for item in range(1, 6)]
+    for thread in others:
+        thread.start()
+    while group_commit_queue._queue.qsize() < 5:
+        time.sleep(0.001)
+    release_first_commit.set()
+    for thread in [first] + others:
+        thread.join()
+
+    assert groups[0] == [0]
+    assert sorted(groups[1]) == [1, 2, 3, 4, 5]
+    assert results == {item: item * 10 for item in range(6)}
+    assert group_commit_queue.stats() == {"groups": 2, "items": 6}
+
+
+def test_commit_error_given_to_the_group():
+    """
+    GIVEN a commit which fails
+    WHEN an item is submitted
+    THEN the error of the commit is raised by submit(), and the next items are still committed
+    """
+    def commit(items):
+        if items == ["bad"]:
+            raise OSError("disk full")
+        return items
+
+    group_commit_queue = GroupCommitQueue(commit)
+
+    with pytest.raises(OSError):
+        group_commit_queue.submit("bad")
+    assert group_commit_queue.submit("good") == "good"
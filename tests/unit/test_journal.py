@@ -0,0 +1,236 @@
+from datetime import timedelta, datetime
+import fcntl
+import os
+import threading
+import time
+
+import pytest
+
+import server
+import storage
+from journal import BookingJournal
+from records import Club, Competition
+from serialization import write_json
+from server import app, load_clubs, load_competitions, update_clubs_json, update_competitions_json
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return BookingJournal(str(tmp_path / "bookings.journal"))
+
+
+@pytest.fixture
+def journal_client(tmp_path):
+    """Run the app with a booking journal, on a future competition."""
+    original_clubs = load_clubs()
+    original_competitions = load_competitions()
+    competitions = load_competitions()
+    competitions[0]["date"] = (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d %H:%M:%S')
+    update_competitions_json({"competitions": competitions})
+
+    server.configure_data(dict(app.config, BOOKING_JOURNAL=str(tmp_path / "bookings.journal")))
+    app.config["TESTING"] = True
+    yield app.test_client()
+
+    server.configure_data(app.config)
+    update_clubs_json({"clubs": original_clubs})
+    update_competitions_json({"competitions": original_competitions})
+
+
+def test_replay_bookings(journal):
+    """
+    GIVEN a journal with two bookings of the same club
+    WHEN the journal is replayed over the clubs and the competitions
+    THEN the records have the values of the last booking
+    """
+    journal.append("Simply Lift", 10, "Spring Festival", 24)
+    # The journals written before the typed records keep strings.
+    journal.append("Simply Lift", "7", "Fall Classic", "12")
+    date = datetime(2020, 3, 27, 10)
+
+    clubs = journal.replay("clubs", [Club("Simply Lift", "john@simplylift.co", 13)])
+    competitions = journal.replay("competitions", [
+        Competition("Spring Festival", date, 25),
+        Competition("Fall Classic", date, 13),
+    ])
+
+    assert clubs == [Club("Simply Lift", "john@simplylift.co", 7)]
+    assert competitions == [
+        Competition("Spring Festival", date, 24),
+        Competition("Fall Classic", date, 12),
+    ]
+
+
+def test_incomplete_record_ignored(journal):
+    """
+    GIVEN a journal whose last record was not completely written
+    WHEN the journal is read and a new booking is appended
+    THEN the incomplete record is ignored, and the new booking is written on its own line
+    """
+    journal.append("Simply Lift", "10", "Spring Festival", "24")
+    with open(journal.path, "ab") as f:
+        f.write(b'{"club": "Simply')
+
+    assert len(journal.records()) == 1
+
+    journal.append("Simply Lift", "7", "Spring Festival", "23")
+    assert [record["points"] for record in BookingJournal(journal.path).records()] == ["10", "7"]
+
+
+def test_booking_written_to_journal_then_compacted(journal_client, tmp_path):
+    """
+    GIVEN the app using a booking journal
+    WHEN a club books places, then the journal is compacted
+    THEN the json files are not rewritten by the booking, and they get the booking after compaction
+    """
+    with open("clubs.json") as f:
+        clubs_json = f.read()
+    club = load_clubs()[0]
+    competition = load_competitions()[0]
+
+    response = journal_client.post("/purchasePlaces", data=dict(
+        places=1,
+        club=club["name"],
+        competition=competition["name"],
+    ))
+
+    assert response.status_code == 200
+    with open("clubs.json") as f:
+        assert f.read() == clubs_json
+    assert len(server.storage.journal.records()) == 1
+    assert load_clubs()[0]["points"] == str(int(club["points"]) - server.NUMBER_OF_POINTS_PER_PLACE)
+
+    result = app.test_cli_runner().invoke(args=["compact-journal"])
+
+    assert result.exit_code == 0
+    assert server.storage.journal.records() == []
+    server.invalidate_data_cache()
+    assert load_clubs()[0]["points"] == str(int(club["points"]) - server.NUMBER_OF_POINTS_PER_PLACE)
+    assert load_competitions()[0]["number_of_places"] == str(int(competition["number_of_places"]) - 1)
+
+
+def test_compaction_writes_durable_snapshots_first(journal_client, monkeypatch):
+    """
+    GIVEN the app using a booking journal, with a booking
+    WHEN the journal is compacted
+    THEN both json snapshots are written durably (fsync) before the journal is emptied
+    """
+    club = load_clubs()[0]
+    journal_client.post("/purchasePlaces", data=dict(
+        places=1, club=club["name"], competition=load_competitions()[0]["name"]))
+    steps = []
+    write_json = storage.write_json
+    monkeypatch.setattr("storage.write_json", lambda path, data, json_format, durable=False: (
+        steps.append((path, durable)), write_json(path, data, json_format, durable)))
+    truncate = server.storage.journal.truncate
+    monkeypatch.setattr(server.storage.journal, "truncate", lambda: (steps.append("truncate"), truncate()))
+
+    server.storage.compact()
+
+    assert steps == [("clubs.json", True), ("competitions.json", True), "truncate"]
+
+
+def test_no_compaction_between_the_file_and_the_journal(tmp_path, monkeypatch):
+    """
+    GIVEN a booking in the journal, and another process compacting the journal
+    WHEN the clubs are loaded (clubs.json, then the journal)
+    THEN the compaction waits for the load: the loaded clubs have the booking
+    """
+    clubs_path = str(tmp_path / "clubs.json")
+    competitions_path = str(tmp_path / "competitions.json")
+    journal_path = str(tmp_path / "bookings.journal")
+    write_json(clubs_path, {"clubs": [{"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}]})
+    write_json(competitions_path, {"competitions": [
+        {"name": "Spring Festival", "date": "2020-03-27 10:00:00", "number_of_places": "25"}]})
+    BookingJournal(journal_path).append("Simply Lift", 10, "Spring Festival", 24)
+    loader = storage.JsonStorage(clubs_path, competitions_path, journal_path)
+    compactor = storage.JsonStorage(clubs_path, competitions_path, journal_path)
+    compaction = threading.Thread(target=compactor.compact)
+    records = loader.journal.records
+
+    def records_after_a_compaction():
+        # clubs.json is read: a compaction tries to run before the journal is read.
+        compaction.start()
+        compaction.join(0.5)
+        assert compaction.is_alive()
+        return records()
+
+    monkeypatch.setattr(loader.journal, "records", records_after_a_compaction)
+
+    assert loader.load_clubs()[0].points == 10
+    compaction.join()
+
+
+def journal_storage(tmp_path):
+    """A json storage with a journal, on one club and one competition."""
+    clubs_path = str(tmp_path / "clubs.json")
+    competitions_path = str(tmp_path / "competitions.json")
+    write_json(clubs_path, {"clubs": [{"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}]})
+    write_json(competitions_path, {"competitions": [
+        {"name": "Spring Festival", "date": "2020-03-27 10:00:00", "number_of_places": "25"}]})
+    return storage.JsonStorage(clubs_path, competitions_path, str(tmp_path / "bookings.journal"))
+
+
+def test_compaction_alongside_a_reload(tmp_path, monkeypatch):
+    """
+    GIVEN a storage whose cached clubs are stale, compacting its journal
+    WHEN the clubs are reloaded by another thread meanwhile
+    THEN neither waits for the other forever: the locks are taken in the same order
+    """
+    data = journal_storage(tmp_path)
+    data.load_clubs()
+    BookingJournal(data.journal.path).append("Simply Lift", 10, "Spring Festival", 24)
+    compaction_started = threading.Event()
+    get = data.clubs_cache.get
+
+    def get_under_the_journal_lock(journal_locked=False):
+        if journal_locked:
+            compaction_started.set()
+            # The reload starts while the compaction holds the lock of the journal.
+            time.sleep(0.2)
+        return get(journal_locked)
+
+    monkeypatch.setattr(data.clubs_cache, "get", get_under_the_journal_lock)
+    loaded = []
+    compaction = threading.Thread(target=data.compact, daemon=True)
+    reload = threading.Thread(target=lambda: loaded.append(data.load_clubs()), daemon=True)
+    compaction.start()
+    compaction_started.wait(5)
+    reload.start()
+    compaction.join(5)
+    reload.join(5)
+
+    assert not compaction.is_alive() and not reload.is_alive()
+    assert loaded[0][0].points == 10
+    assert data.journal.records() == []
+
+
+def test_saved_clubs_replace_the_journal_at_once(tmp_path, monkeypatch):
+    """
+    GIVEN a storage with a booking in its journal
+    WHEN new clubs are saved
+    THEN the journal stays locked from the compaction until the new clubs are written and cached
+    """
+    data = journal_storage(tmp_path)
+    data.journal.append("Simply Lift", 10, "Spring Festival", 24)
+    journal_free = []
+    write_records = storage.write_records
+
+    def write_records_and_check_the_lock(path, *args, **kwargs):
+        write_records(path, *args, **kwargs)
+        fd = os.open(data.journal.path + ".lock", os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            journal_free.append(path)
+        except BlockingIOError:
+            pass
+        finally:
+            os.close(fd)
+
+    monkeypatch.setattr("storage.write_records", write_records_and_check_the_lock)
+    data.save_clubs([Club("Simply Lift", "john@simplylift.co", 50)])
+
+    assert journal_free == []
+    assert data.journal.records() == []
+    assert data.load_clubs()[0].points == 50
+    assert storage.JsonStorage(data.clubs_path, data.competitions_path, data.journal.path).load_clubs()[0].points == 50
@@ -0,0 +1,80 @@
+import threading
+
+import server
+from metrics import Metrics, COUNTER, HISTOGRAM
+from server import app, metrics, BOOKINGS, PHASE_DURATION, REQUEST_DURATION
+
+
+def test_histogram_and_counter_in_prometheus_format():
+    """
+    GIVEN a histogram and a counter
+    WHEN values are observed and counted
+    THEN they are given in the Prometheus text format, with cumulative buckets
+    """
+    registry = Metrics(buckets=(0.1, 1.0))
+    registry.declare("latency_seconds", HISTOGRAM, "Latency.")
+    registry.declare("bookings_total", COUNTER, "Bookings.")
+
+    for value in (0.05, 0.5, 0.5, 3):
+        registry.observe("latency_seconds", value, route="/a")
+    registry.increment("bookings_total", reason='say "no"')
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{route="/a"} 4.05' in text
+    assert 'latency_seconds_count{route="/a"} 4' in text
+    assert 'bookings_total{reason="say \\"no\\""} 1' in text
+
+
+def test_metrics_of_many_threads():
+    """
+    GIVEN a histogram updated by many threads at the same time
+    WHEN they are done
+    THEN no observation is lost
+    """
+    registry = Metrics()
+    registry.declare("latency_seconds", HISTOGRAM, "Latency.")
+
+    def observe():
+        for _ in range(1000):
+            registry.observe("latency_seconds", 0.01, route="/")
+
+    threads = [threading.Thread(target=observe) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry.value("latency_seconds", route="/") == 8000
+
+
+def test_metrics_of_the_requests():
+    """
+    GIVEN the app
+    WHEN a booking is refused, then the metrics are asked
+    THEN the booking is counted by reason, and the request and its phases are timed by route
+    """
+    repository = server.get_repository()
+    club, competition = repository.clubs[0], repository.competitions[0]
+    refusal = server.check_booking(repository, club, competition, -1)
+    request_labels = dict(route="/purchasePlaces", method="POST", status=refusal.status_code)
+    refused = metrics.value(BOOKINGS, outcome="rejected", reason=refusal.reason)
+    requests = metrics.value(REQUEST_DURATION, **request_labels)
+    validations = metrics.value(PHASE_DURATION, route="/purchasePlaces", phase="validation")
+    client = app.test_client()
+
+    response = client.post("/purchasePlaces", data=dict(places=-1, club=club.name, competition=competition.name))
+    assert response.status_code == refusal.status_code
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert metrics.value(BOOKINGS, outcome="rejected", reason=refusal.reason) == refused + 1
+    assert metrics.value(REQUEST_DURATION, **request_labels) == requests + 1
+    assert metrics.value(PHASE_DURATION, route="/purchasePlaces", phase="validation") == validations + 1
+    text = response.get_data(as_text=True)
+    assert f'gudlft_bookings_total{{outcome="rejected",reason="{refusal.reason}"}}' in text
+    assert 'gudlft_request_phase_duration_seconds_count{phase="validation",route="/purchasePlaces"}' in text
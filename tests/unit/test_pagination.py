@@ -0,0 +1,75 @@
+from datetime import timedelta, datetime
+
+import pytest
+
+from pagination import Page, page_arguments
+from server import app, load_clubs, load_competitions, update_competitions_json
+
+# The original data
+COMPETITIONS = load_competitions()
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    yield app.test_client()
+    app.config["STREAM_MIN_RECORDS"] = 500
+    update_competitions_json({"competitions": COMPETITIONS})
+
+
+def test_page():
+    page = Page(list(range(5)), number=2, limit=2)
+    assert page.items == [2, 3]
+    assert page.pages == 3
+    assert page.has_previous and page.has_next
+
+    records = [1, 2]
+    assert Page(records).items is records
+
+    last = Page(list(range(5)), number=1000, limit=2)
+    assert last.number == 3
+    assert last.items == [4]
+
+
+def test_page_arguments():
+    assert page_arguments({}, None) == (1, None)
+    assert page_arguments({"page": "3", "limit": "10"}, None) == (3, 10)
+    assert page_arguments({}, 20) == (1, 20)
+    with pytest.raises(ValueError):
+        page_arguments({"page": "0"})
+
+
+def test_index_page_of_clubs_streamed(client):
+    """
+    GIVEN the index page with pages of 2 clubs, sent while it is rendered
+    WHEN the second page is displayed
+    THEN only the clubs of the second page are shown
+    """
+    app.config["STREAM_MIN_RECORDS"] = 0
+    clubs = load_clubs()
+    response = client.get("/?page=2&limit=2")
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert str.encode(f'{clubs[2]["name"]}: {clubs[2]["points"]} points') in response.data
+    assert str.encode(f'{clubs[0]["name"]}: {clubs[0]["points"]} points') not in response.data
+    assert b"Page 2 / 2" in response.data
+    assert client.get("/?page=0").status_code == 400
+
+
+def test_summary_of_upcoming_competitions(client):
+    """
+    GIVEN a past and a future competition
+    WHEN a club logs in asking for upcoming competitions only
+    THEN only the future competition is shown
+    """
+    competitions = load_competitions()
+    competitions[0]["date"] = (datetime.now() + timedelta(days=10)).strftime('%Y-%m-%d %H:%M:%S')
+    competitions[1]["date"] = (datetime.now() - timedelta(days=10)).strftime('%Y-%m-%d %H:%M:%S')
+    update_competitions_json({"competitions": competitions})
+
+    response = client.post("/showSummary", data=dict(email=load_clubs()[0]["email"], upcoming="1"))
+
+    assert response.status_code == 200
+    assert str.encode(competitions[0]["name"]) in response.data
+    assert str.encode(competitions[1]["name"]) not in response.data
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+import server
+from profiling import RequestProfiler, hotspots, parse_profile_file_name, profile_file_name
+from server import app
+
+
+@pytest.fixture
+def profiled_app(tmp_path, monkeypatch):
+    """The app profiling the requests with the header X-Profile, and 1 request in 1000."""
+    directory = str(tmp_path / "profiles")
+    monkeypatch.setattr(server, "profiler", RequestProfiler(directory, 0.001, "X-Profile"))
+    return directory
+
+
+def test_profile_file_name():
+    """
+    GIVEN a route and the duration of a request
+    WHEN the name of its profile file is built
+    THEN the route and the duration can be read back from it
+    """
+    name = profile_file_name("/book/<competition>/<club>", 0.0123)
+
+    assert "/" not in name
+    assert parse_profile_file_name(name) == ("/book/<competition>/<club>", 0.012)
+
+
+def test_requests_with_the_header_are_profiled(profiled_app):
+    """
+    GIVEN the app profiling the requests with a header
+    WHEN requests are sent with and without the header
+    THEN only the requests with the header are profiled, and the report gives their functions by route
+    """
+    client = app.test_client()
+    server.profiler.sample_rate = 0
+    client.get("/")
+    client.get("/", headers={"X-Profile": "1"})
+    client.get("/logout", headers={"X-Profile": "1"})
+
+    names = os.listdir(profiled_app)
+    assert sorted(parse_profile_file_name(name)[0] for name in names) == ["/", "/logout"]
+    report = hotspots(profiled_app, top=5)
+    number, _, rows = report["/"]
+    assert number == 1
+    assert len(rows) == 5
+    assert any("index" in function for function, _, _, _ in hotspots(profiled_app, top=1000)["/"][2])
+
+
+def test_sampled_requests(profiled_app, monkeypatch):
+    """
+    GIVEN the app profiling a part of the requests
+    WHEN requests are sent
+    THEN only the sampled ones are profiled
+    """
+    draws = iter([0.5, 0.0001, 0.9])
+    monkeypatch.setattr("profiling.random.random", lambda: next(draws))
+    client = app.test_client()
+
+    for _ in range(3):
+        client.get("/logout")
+
+    assert len(os.listdir(profiled_app)) == 1
+
+
+def test_rotation(tmp_path):
+    """
+    GIVEN profiles taking more than the maximum size
+    WHEN a new profile is written
+    THEN the oldest ones are removed
+    """
+    profiler = RequestProfiler(str(tmp_path), max_bytes=2500)
+    for number in range(5):
+        (tmp_path / f"{number}-1-%2F-1ms.prof").write_bytes(b"x" * 1000)
+
+    profiler.rotate()
+
+    assert sorted(os.listdir(tmp_path)) == ["3-1-%2F-1ms.prof", "4-1-%2F-1ms.prof"]
+
+
+def test_profile_report_command(profiled_app):
+    """
+    GIVEN profiled requests
+    WHEN the profile-report command is run
+    THEN it gives the functions which take the most time by route
+    """
+    app.test_client().get("/logout", headers={"X-Profile": "1"})
+
+    result = app.test_cli_runner().invoke(args=["profile-report", "--directory", profiled_app, "--top", "3"])
+
+    assert result.exit_code == 0
+    assert "/logout: 1 profiles" in result.output
+    assert len(result.output.splitlines()) == 1 + 1 + 3 + 1
@@ -0,0 +1,97 @@
+import pytest
+
+import server
+from pagination import Page
+from record_index import RecordIndex, IndexedRecords
+from records import Club
+from serialization import write_json, JSON_FORMATS
+from server import app
+
+CLUBS = [
+    {"name": f"Club {{{index}}}", "email": f"club{index}@gudlft.com", "points": str(index)}
+    for index in range(50)
+]
+
+
+@pytest.fixture(params=JSON_FORMATS)
+def clubs_path(request, tmp_path):
+    path = str(tmp_path / "clubs.json")
+    write_json(path, {"clubs": CLUBS}, request.param)
+    return path
+
+
+def test_find_by_indexed_fields(clubs_path):
+    """
+    GIVEN a json file of clubs, in any format
+    WHEN a club is searched by email or by name through the index
+    THEN its record is found, without loading the others
+    """
+    index = RecordIndex(clubs_path, "clubs", ("email", "name"))
+
+    assert index.find("email", "club7@gudlft.com") == CLUBS[7]
+    assert index.find("name", "Club {42}") == CLUBS[42]
+    assert index.find("email", "unknown@gudlft.com") is None
+    assert len(index) == 50
+    assert index.records(48) == CLUBS[48:]
+
+
+def test_index_rebuilt_only_when_the_file_changes(clubs_path):
+    """
+    GIVEN an index file built for a json file
+    WHEN another process opens the index, then the json file changes
+    THEN the index file is reused, then built again
+    """
+    RecordIndex(clubs_path, "clubs", ("email",)).find("email", "club1@gudlft.com")
+    index = RecordIndex(clubs_path, "clubs", ("email",))
+
+    assert index.find("email", "club1@gudlft.com") == CLUBS[1]
+    assert index.builds == 0
+
+    write_json(clubs_path, {"clubs": CLUBS[:1] + [dict(CLUBS[1], points="99")]})
+
+    assert index.find("email", "club1@gudlft.com")["points"] == "99"
+    assert len(index) == 2
+    assert index.builds == 1
+
+
+def test_indexed_records_by_page(clubs_path):
+    """
+    GIVEN the clubs read through the index
+    WHEN a page of them is asked
+    THEN only the records of the page are given, as Club records
+    """
+    clubs = IndexedRecords(RecordIndex(clubs_path, "clubs", ("email",)), Club)
+
+    page = Page(clubs, 2, 20)
+
+    assert page.pages == 3
+    assert page.items == CLUBS[20:40]
+    assert clubs[-1] == CLUBS[-1]
+
+
+def test_login_without_loading_the_clubs(tmp_path, monkeypatch):
+    """
+    GIVEN the app with a record index
+    WHEN a club logs in, the index page is displayed and a booking page is opened
+    THEN the club is found and the pages displayed without loading all the clubs
+    """
+    write_json(str(tmp_path / "clubs.json"), {"clubs": CLUBS})
+    write_json(str(tmp_path / "competitions.json"), {"competitions": [
+        {"name": "Spring Festival", "date": "2020-03-27 10:00:00", "number_of_places": "25"}]})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(app.config, "PAGE_SIZE", 10)
+    server.configure_data(dict(app.config, RECORD_INDEX=True))
+    try:
+        client = app.test_client()
+        response = client.post("/showSummary", data=dict(email="club7@gudlft.com"))
+        assert response.status_code == 200
+        assert b"Points available: 7" in response.data
+        assert client.post("/showSummary", data=dict(email="unknown@gudlft.com")).status_code == 404
+        assert b"Club {9}: 9 points" in client.get("/").data
+        response = client.get("/book/Spring Festival/Club {7}")
+        assert b'name="club" value="Club {7}"' in response.data
+        assert server.storage.clubs_cache.stats()["misses"] == 0
+        assert server.page_data() is server.page_data()
+    finally:
+        monkeypatch.undo()
+        server.configure_data(app.config)
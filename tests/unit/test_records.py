@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from records import Club, Competition
+
+
+def test_json_round_trip():
+    """
+    GIVEN a club and a competition in the json schema of the data files
+    WHEN they are converted into records and back
+    THEN the records have typed fields, and the json form is unchanged
+    """
+    club_json = {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}
+    competition_json = {"name": "Spring Festival", "date": "2020-03-27 10:00:00", "number_of_places": "25"}
+
+    club = Club.from_json(club_json)
+    competition = Competition.from_json(competition_json)
+
+    assert club.points == 13
+    assert competition.date == datetime(2020, 3, 27, 10)
+    assert competition.number_of_places == 25
+    assert club.to_json() == club_json
+    assert competition.to_json() == competition_json
+
+
+def test_record_compared_with_its_json_form():
+    """
+    GIVEN a club record
+    WHEN it is compared with a record or a dict
+    THEN it is equal to the same values, with the numbers given as ints or strings
+    """
+    club = Club("Simply Lift", "john@simplylift.co", 13)
+
+    assert club == Club("Simply Lift", "john@simplylift.co", 13)
+    assert club == {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}
+    assert club == {"name": "Simply Lift", "email": "john@simplylift.co", "points": 13}
+    assert club != {"name": "Simply Lift", "email": "john@simplylift.co", "points": "12"}
+    assert club != {"name": "Simply Lift"}
+    assert club["points"] == 13
+
+
+def test_record_has_no_dict():
+    """
+    GIVEN a club record
+    WHEN a field which is not in its slots is set
+    THEN it is refused: the record keeps only its fixed fields
+    """
+    club = Club("Simply Lift", "john@simplylift.co", 13)
+
+    assert not hasattr(club, "__dict__")
+    with pytest.raises(AttributeError):
+        club.phone = "0123"
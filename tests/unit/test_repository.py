@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+
+from records import Club, Competition
+from repository import Repository
+
+
+@pytest.fixture
+def repository():
+    clubs = [
+        Club("Simply Lift", "john@simplylift.co", 13),
+        Club("Iron Temple", "admin@irontemple.com", 4),
+    ]
+    competitions = [
+        Competition("Spring Festival", datetime(2020, 3, 27, 10), 25),
+    ]
+    return Repository(clubs, competitions)
+
+
+def test_lookups_return_records_of_the_lists(repository):
+    """
+    GIVEN a repository of clubs and competitions
+    WHEN a club or a competition is searched by email or by name
+    THEN the record of the list itself is found, without copy
+    """
+    assert repository.club_by_email("admin@irontemple.com") is repository.clubs[1]
+    assert repository.club_by_name("Simply Lift") is repository.clubs[0]
+    assert repository.competition_by_name("Spring Festival") is repository.competitions[0]
+    assert repository.club_by_email("unknown@club.com") is None
+    assert repository.competition_by_name("Unknown") is None
+
+
+def test_update_in_place(repository):
+    """
+    GIVEN a repository of clubs and competitions
+    WHEN a booking changes the points of a club and the places of a competition
+    THEN the records are changed in the lists and in the indexes
+    """
+    repository.update_club("Simply Lift", points=10)
+    repository.update_competition("Spring Festival", number_of_places=24)
+
+    assert repository.clubs[0].points == 10
+    assert repository.club_by_email("john@simplylift.co").points == 10
+    assert repository.competitions[0].number_of_places == 24
+
+
+def test_update_indexed_fields(repository):
+    """
+    GIVEN a repository of clubs
+    WHEN the email and the name of a club change
+    THEN the club is found only with the new email and name
+    """
+    repository.update_club("Iron Temple", name="Iron Temple 2", email="new@irontemple.com")
+
+    assert repository.club_by_name("Iron Temple") is None
+    assert repository.club_by_email("admin@irontemple.com") is None
+    assert repository.club_by_name("Iron Temple 2") is repository.clubs[1]
+    assert repository.club_by_email("new@irontemple.com") is repository.clubs[1]
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+
+import serialization
+from records import Club
+from serialization import read_json, write_json, JSON_FORMATS, PRETTY, COMPACT, FAST
+from storage import JsonStorage, create_storage
+
+CLUBS = {"clubs": [{"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"}]}
+
+
+@pytest.mark.parametrize("json_format", JSON_FORMATS)
+def test_write_then_read(tmp_path, json_format):
+    """
+    GIVEN data written in one of the json formats
+    WHEN the file is read
+    THEN the same data is given, and no temporary file is left
+    """
+    path = str(tmp_path / "clubs.json")
+
+    write_json(path, CLUBS, json_format)
+
+    assert read_json(path) == CLUBS
+    assert [file.name for file in tmp_path.iterdir()] == ["clubs.json"]
+
+
+def test_pretty_and_compact_outputs(tmp_path):
+    """
+    GIVEN the pretty and the compact formats
+    WHEN data is written
+    THEN the pretty file is indented as before, and the compact file has no whitespace
+    """
+    path = str(tmp_path / "clubs.json")
+
+    write_json(path, CLUBS, PRETTY)
+    with open(path) as f:
+        assert f.read() == json.dumps(CLUBS, sort_keys=True, indent=4, separators=(',', ': '))
+
+    write_json(path, CLUBS, COMPACT)
+    with open(path) as f:
+        assert f.read() == '{"clubs":[{"email":"john@simplylift.co","name":"Simply Lift","points":"13"}]}'
+
+
+def test_fast_format_without_orjson(monkeypatch):
+    """
+    GIVEN the fast format, without orjson
+    WHEN data is encoded and decoded
+    THEN the standard json module is used, with the compact format
+    """
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert serialization.dumps(CLUBS, FAST) == serialization.dumps(CLUBS, COMPACT)
+    assert serialization.loads(serialization.dumps(CLUBS, FAST)) == CLUBS
+
+
+def test_storage_writes_in_its_format(tmp_path):
+    """
+    GIVEN a json storage configured with the compact format
+    WHEN the clubs are saved
+    THEN the file is compact, and read back by a new storage
+    """
+    storage = JsonStorage(str(tmp_path / "clubs.json"), str(tmp_path / "competitions.json"), json_format=COMPACT)
+
+    storage.save_clubs([Club.from_json(club) for club in CLUBS["clubs"]])
+
+    assert (tmp_path / "clubs.json").read_bytes() == serialization.dumps(CLUBS, COMPACT)
+    assert JsonStorage(str(tmp_path / "clubs.json")).load_clubs() == CLUBS["clubs"]
+
+
+def test_json_format_of_the_config():
+    assert create_storage({"JSON_FORMAT": FAST}).json_format == FAST
+    assert create_storage({}).json_format == PRETTY
+    with pytest.raises(ValueError):
+        create_storage({"JSON_FORMAT": "yaml"})
+
+
+def test_durable_write(tmp_path, monkeypatch):
+    """
+    GIVEN a durable write of a json file
+    WHEN it returns
+    THEN the file and its directory (the rename) were synced to disk
+    """
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced.append(os.readlink(f"/proc/self/fd/{fd}")), fsync(fd)))
+    path = str(tmp_path / "clubs.json")
+
+    write_json(path, {"clubs": []}, durable=True)
+
+    assert synced == [path + ".tmp", str(tmp_path)]
+    assert read_json(path) == {"clubs": []}
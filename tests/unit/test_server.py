@@ -177,7 +177,7 @@ def test_purchase_places_using_more_than_club_points__failure(client, club, futu
     competition_name = competition['name']
 
     # Case not allowed: places required is greater than a third of the available points of the club
-    places_required = int(club["points"]/3) + 1
+    places_required = int(int(club["points"])/3) + 1
     response = client.post("/purchasePlaces", data=dict(
         places=places_required,
         club=club_name,
@@ -0,0 +1,166 @@
+import json
+import os
+
+import pytest
+
+import server
+from data_cache import file_signature
+from repository import Repository
+from serialization import read_json
+from server import app
+from storage import ShardedStorage, club_shard, competition_file_name
+
+CLUBS = [
+    {"name": "Club " + str(index), "email": f"club{index}@gudlft.com", "points": str(index)}
+    for index in range(10)
+]
+COMPETITIONS = [
+    {"name": "Spring Festival", "date": "2020-03-27 10:00:00", "number_of_places": "25"},
+    {"name": "Fall Classic", "date": "2020-10-22 13:30:00", "number_of_places": "13"},
+]
+
+
+@pytest.fixture
+def json_files(tmp_path):
+    clubs_path = tmp_path / "clubs.json"
+    competitions_path = tmp_path / "competitions.json"
+    clubs_path.write_text(json.dumps({"clubs": CLUBS}))
+    competitions_path.write_text(json.dumps({"competitions": COMPETITIONS}))
+    return str(clubs_path), str(competitions_path)
+
+
+@pytest.fixture
+def directory(tmp_path, json_files):
+    """A sharded layout of the json files, with 4 club shards."""
+    directory = str(tmp_path / "data")
+    ShardedStorage(directory).import_json(*json_files, club_shards=4)
+    return directory
+
+
+def file_signatures(directory):
+    return {
+        os.path.join(root, name): file_signature(os.path.join(root, name))
+        for root, _, names in os.walk(directory) for name in names
+    }
+
+
+def test_shard_then_unshard(directory, json_files, tmp_path):
+    """
+    GIVEN clubs and competitions converted into the sharded layout
+    WHEN they are read, then converted back into single json files
+    THEN they are the same records, in the same order
+    """
+    storage = ShardedStorage(directory)
+
+    assert storage.load_clubs() == CLUBS
+    assert storage.load_competitions() == COMPETITIONS
+    assert len(os.listdir(os.path.join(directory, "clubs"))) == 4
+    assert len(os.listdir(os.path.join(directory, "competitions"))) == 2
+
+    assert storage.export_json(str(tmp_path / "clubs2.json"), str(tmp_path / "competitions2.json")) == (10, 2)
+    assert read_json(str(tmp_path / "clubs2.json")) == read_json(json_files[0])
+    assert read_json(str(tmp_path / "competitions2.json")) == read_json(json_files[1])
+
+
+def test_booking_rewrites_only_its_files(directory):
+    """
+    GIVEN the sharded layout
+    WHEN a booking is saved
+    THEN only the shard of the club and the file of the competition are written (and the generation file bumped),
+    and another process reads only them again
+    """
+    storage = ShardedStorage(directory)
+    other_storage = ShardedStorage(directory)
+    # "Club 0" is not in the shard of "Club 7".
+    unchanged_club = other_storage.load_clubs()[0]
+    before = file_signatures(directory)
+    repository = Repository(storage.load_clubs(), storage.load_competitions())
+    club = repository.update_club("Club 7", points=1)
+    competition = repository.update_competition("Fall Classic", number_of_places=12)
+
+    storage.save_booking(repository, club, competition)
+
+    changed = {path for path, signature in file_signatures(directory).items() if before[path] != signature}
+    assert changed == {
+        storage.club_shard_path(club_shard("Club 7", 4)),
+        storage.competition_path(competition_file_name("Fall Classic")),
+        storage.generation_path,
+    }
+    assert storage.load_clubs() is repository.clubs
+    assert other_storage.load_clubs()[7].points == 1
+    assert other_storage.load_competitions()[1].number_of_places == 12
+    assert other_storage.load_clubs()[0] is unchanged_club
+
+
+def test_bookings_of_other_shards_do_not_wait(directory):
+    """
+    GIVEN clubs of different shards and different competitions
+    WHEN their booking locks are asked
+    THEN they don't share any lock
+    """
+    storage = ShardedStorage(directory)
+    names = [club["name"] for club in CLUBS]
+    first, second = next(
+        (name, other) for name in names for other in names if club_shard(name, 4) != club_shard(other, 4))
+
+    assert not set(storage.booking_lock_keys(first, "Spring Festival")) & set(
+        storage.booking_lock_keys(second, "Fall Classic"))
+
+
+def test_app_with_sharded_backend(directory):
+    """
+    GIVEN the app configured with the sharded layout
+    WHEN a club logs in
+    THEN its data comes from the sharded files
+    """
+    server.configure_data(dict(app.config, STORAGE_BACKEND="sharded", SHARDED_DIRECTORY=directory))
+    try:
+        response = app.test_client().post("/showSummary", data=dict(email="club9@gudlft.com"))
+        assert b"Points available: 9" in response.data
+    finally:
+        server.configure_data(app.config)
+
+
+def test_shard_json_command(json_files, tmp_path):
+    """
+    GIVEN the json files of clubs and competitions
+    WHEN the shard-json command is run
+    THEN the sharded layout is written in the directory of the config
+    """
+    directory = str(tmp_path / "sharded")
+    app.config["SHARDED_DIRECTORY"] = directory
+    try:
+        clubs_path, competitions_path = json_files
+        result = app.test_cli_runner().invoke(
+            args=["shard-json", "--clubs", clubs_path, "--competitions", competitions_path, "--club-shards", "3"])
+    finally:
+        app.config["SHARDED_DIRECTORY"] = "data"
+
+    assert result.exit_code == 0
+    assert "Wrote 10 clubs in 3 shards and 2 competitions" in result.output
+    assert ShardedStorage(directory).load_clubs() == CLUBS
+
+
+def test_fresh_load_checks_only_the_generation(directory, monkeypatch):
+    """
+    GIVEN the sharded layout, already loaded
+    WHEN it is loaded again, then after a booking of another process
+    THEN the first load checks only the generation file, and the second one reads the booking
+    """
+    storage = ShardedStorage(directory)
+    other_storage = ShardedStorage(directory)
+    clubs = storage.load_clubs()
+
+    def no_signature(path):
+        raise AssertionError(f"{path} was checked.")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("storage.file_signature", no_signature)
+        assert storage.load_clubs() is clubs
+        assert storage.booking_lock_keys("Club 7", "Fall Classic")
+
+    repository = Repository(other_storage.load_clubs(), other_storage.load_competitions())
+    club = repository.update_club("Club 7", points=1)
+    other_storage.save_booking(repository, club, repository.competition_by_name("Fall Classic"))
+
+    assert storage.load_clubs()[7].points == 1
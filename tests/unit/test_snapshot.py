@@ -0,0 +1,148 @@
+import json
+
+import pytest
+
+import server
+from records import Club, Competition
+from server import app
+from snapshot import Snapshot, SnapshotRepository, build_snapshot
+from storage import SnapshotStorage
+
+CLUBS = [
+    {"name": "Club " + str(index), "email": f"club{index}@gudlft.com", "points": str(index)}
+    for index in range(10)
+] + [{"name": "Clüb Été", "email": "ete@gudlft.com", "points": "4"}]
+COMPETITIONS = [
+    {"name": "Spring Festival", "date": "2099-03-27 10:00:00", "number_of_places": "25"},
+    {"name": "Fall Classic", "date": "2020-10-22 13:30:00", "number_of_places": "13"},
+]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    clubs_path = tmp_path / "clubs.json"
+    competitions_path = tmp_path / "competitions.json"
+    clubs_path.write_text(json.dumps({"clubs": CLUBS}))
+    competitions_path.write_text(json.dumps({"competitions": COMPETITIONS}))
+    path = str(tmp_path / "gudlft.snapshot")
+    SnapshotStorage(path).import_json(str(clubs_path), str(competitions_path))
+    return path
+
+
+def test_records_of_the_snapshot(snapshot_path):
+    """
+    GIVEN a snapshot of the json files
+    WHEN its records are loaded
+    THEN they are equal to the records of the json files, in the same order
+    """
+    storage = SnapshotStorage(snapshot_path)
+
+    assert list(storage.load_clubs()) == CLUBS
+    assert list(storage.load_competitions()) == COMPETITIONS
+    assert storage.load_clubs()[-1] == Club.from_json(CLUBS[-1])
+    assert storage.load_clubs()[2:4] == CLUBS[2:4]
+    assert storage.load_clubs() is storage.load_clubs()
+    assert storage.stats()["version"] == 1
+
+
+def test_find_records(snapshot_path):
+    """
+    GIVEN a snapshot
+    WHEN clubs and competitions are found by email or by name
+    THEN the records are found through the hashes of the snapshot, and the unknown ones are None
+    """
+    storage = SnapshotStorage(snapshot_path)
+    repository = storage.make_repository(storage.load_clubs(), storage.load_competitions())
+
+    assert repository.club_by_email("club7@gudlft.com") == CLUBS[7]
+    assert repository.club_by_name("Clüb Été") == CLUBS[-1]
+    assert repository.competition_by_name("Fall Classic") == COMPETITIONS[1]
+    assert repository.club_by_email("unknown@gudlft.com") is None
+    assert repository.competition_by_name("Unknown") is None
+    assert repository.competition_index.upcoming() == [COMPETITIONS[0]]
+
+
+def test_same_hash(monkeypatch, tmp_path):
+    """
+    GIVEN a snapshot where all the values have the same hash
+    WHEN a club is found by email
+    THEN the club with this email is found
+    """
+    monkeypatch.setattr("snapshot.key_hash", lambda column, value: 1)
+    path = tmp_path / "gudlft.snapshot"
+    path.write_bytes(build_snapshot(1, [Club.from_json(club) for club in CLUBS], []))
+
+    snapshot = Snapshot(str(path))
+
+    assert snapshot.find("club_emails", "club3@gudlft.com") == 3
+    assert snapshot.find("club_emails", "unknown@gudlft.com") is None
+
+
+def test_booking_publishes_the_next_version(snapshot_path):
+    """
+    GIVEN two processes (two storages) reading the same snapshot
+    WHEN one of them saves a booking
+    THEN the other one reads the next version with the booking, and the records read before keep their values
+    """
+    writer = SnapshotStorage(snapshot_path)
+    reader = SnapshotStorage(snapshot_path)
+    old_club = reader.load_clubs()[3]
+    repository = writer.make_repository(writer.load_clubs(), writer.load_competitions())
+
+    club = repository.update_club("Club 3", points=1)
+    competition = repository.update_competition("Spring Festival", number_of_places=23)
+    writer.save_booking(repository, club, competition)
+
+    assert reader.load_clubs()[3]["points"] == 1
+    assert reader.load_competitions()[0]["number_of_places"] == 23
+    assert reader.stats()["version"] == 2
+    assert old_club.points == 3
+    assert writer.load_clubs()[3].points == 1
+
+
+def test_only_int_fields_change(snapshot_path):
+    """
+    GIVEN the repository of a snapshot
+    WHEN other fields than the points and the number of places are updated
+    THEN it is refused
+    """
+    storage = SnapshotStorage(snapshot_path)
+    repository = SnapshotRepository(storage.load_clubs(), storage.load_competitions())
+
+    with pytest.raises(ValueError):
+        repository.update_club("Club 3", email="new@gudlft.com")
+    with pytest.raises(KeyError):
+        repository.update_competition("Unknown", number_of_places=2)
+
+
+def test_save_records(snapshot_path):
+    """
+    GIVEN a snapshot
+    WHEN all the clubs are replaced
+    THEN the next snapshot has the new clubs and the same competitions
+    """
+    storage = SnapshotStorage(snapshot_path)
+
+    storage.save_clubs([Club("New Club", "new@gudlft.com", 5)])
+
+    assert list(SnapshotStorage(snapshot_path).load_clubs()) == [Club("New Club", "new@gudlft.com", 5)]
+    assert list(storage.load_competitions()) == [Competition.from_json(competition) for competition in COMPETITIONS]
+
+
+def test_booking_through_the_app(snapshot_path, tmp_path):
+    """
+    GIVEN the app with the snapshot backend
+    WHEN a club books places
+    THEN the next snapshot has the booking
+    """
+    server.configure_data(dict(app.config, STORAGE_BACKEND="snapshot", SNAPSHOT_PATH=snapshot_path,
+                               LOCK_DIR=str(tmp_path / ".locks")))
+    try:
+        response = app.test_client().post(
+            "/purchasePlaces", data={"club": "Club 9", "competition": "Spring Festival", "places": "2"})
+
+        assert response.status_code == 200
+        assert b"Points available: 3" in response.data
+        assert SnapshotStorage(snapshot_path).load_competitions()[0].number_of_places == 23
+    finally:
+        server.configure_data(app.config)
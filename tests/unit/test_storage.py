@@ -0,0 +1,151 @@
+import json
+
+import pytest
+
+import server
+from records import Club
+from repository import Repository
+from server import app
+from storage import JsonStorage, ShardedStorage, SnapshotStorage, SqliteStorage
+
+CLUBS = [
+    {"name": "Simply Lift", "email": "john@simplylift.co", "points": "13"},
+    {"name": "Iron Temple", "email": "admin@irontemple.com", "points": "4"},
+]
+COMPETITIONS = [
+    {"name": "Spring Festival", "date": "2020-03-27 10:00:00", "number_of_places": "25"},
+]
+
+
+@pytest.fixture
+def json_files(tmp_path):
+    clubs_path = tmp_path / "clubs.json"
+    competitions_path = tmp_path / "competitions.json"
+    clubs_path.write_text(json.dumps({"clubs": CLUBS}))
+    competitions_path.write_text(json.dumps({"competitions": COMPETITIONS}))
+    return str(clubs_path), str(competitions_path)
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return str(tmp_path / "gudlft.db")
+
+
+def test_sqlite_import_json(json_files, database_path):
+    """
+    GIVEN the json files of clubs and competitions
+    WHEN they are imported into a SQLite database
+    THEN the database gives the same records, in the same order
+    """
+    database = SqliteStorage(database_path)
+    assert database.import_json(*json_files) == (2, 1)
+
+    other_database = SqliteStorage(database_path)
+    assert other_database.load_clubs() == CLUBS
+    assert other_database.load_competitions() == COMPETITIONS
+
+
+def test_sqlite_booking_updates_rows(json_files, database_path):
+    """
+    GIVEN a SQLite database
+    WHEN a booking is saved
+    THEN the cached data is kept, and another process sees the new points and places
+    """
+    database = SqliteStorage(database_path)
+    database.import_json(*json_files)
+    repository = Repository(database.load_clubs(), database.load_competitions())
+    club = repository.update_club("Iron Temple", points=1)
+    competition = repository.update_competition("Spring Festival", number_of_places=24)
+
+    database.save_booking(repository, club, competition)
+
+    assert database.load_clubs() is repository.clubs
+    other_database = SqliteStorage(database_path)
+    assert other_database.load_clubs()[1].points == 1
+    assert other_database.load_competitions()[0].number_of_places == 24
+
+
+def test_sqlite_reload_after_commit_of_other_connection(json_files, database_path):
+    """
+    GIVEN two connections to the same SQLite database
+    WHEN one of them changes the clubs
+    THEN the other one reloads its cached data
+    """
+    database = SqliteStorage(database_path)
+    database.import_json(*json_files)
+    clubs = database.load_clubs()
+    assert database.load_clubs() is clubs
+
+    SqliteStorage(database_path).save_clubs([Club.from_json(dict(CLUBS[0], points="7"))])
+
+    assert database.load_clubs() == [dict(CLUBS[0], points="7")]
+    assert database.stats()["reloads"] == 1
+
+
+def test_import_json_command(json_files, database_path):
+    """
+    GIVEN the json files of clubs and competitions
+    WHEN the import-json command is run
+    THEN the SQLite database of the config gets their records
+    """
+    clubs_path, competitions_path = json_files
+    app.config["SQLITE_DATABASE"] = database_path
+    try:
+        result = app.test_cli_runner().invoke(
+            args=["import-json", "--clubs", clubs_path, "--competitions", competitions_path])
+    finally:
+        app.config["SQLITE_DATABASE"] = "gudlft.db"
+
+    assert result.exit_code == 0
+    assert "Imported 2 clubs and 1 competitions" in result.output
+    assert SqliteStorage(database_path).load_clubs() == CLUBS
+
+
+def test_app_with_sqlite_backend(json_files, database_path):
+    """
+    GIVEN the app configured with the SQLite backend
+    WHEN a club logs in
+    THEN its data comes from the database
+    """
+    SqliteStorage(database_path).import_json(*json_files)
+    server.configure_data(dict(app.config, STORAGE_BACKEND="sqlite", SQLITE_DATABASE=database_path))
+    try:
+        response = app.test_client().post("/showSummary", data=dict(email="admin@irontemple.com"))
+    finally:
+        server.configure_data(app.config)
+
+    assert response.status_code == 200
+    assert b"Points available: 4" in response.data
+
+
+def failing_write(*args, **kwargs):
+    raise OSError(28, "No space left on device")
+
+
+@pytest.mark.parametrize("backend", ["json", "sharded", "snapshot"])
+def test_failed_save_keeps_the_disk_data(json_files, tmp_path, monkeypatch, backend):
+    """
+    GIVEN a booking applied to the records of a storage
+    WHEN it can't be written to disk
+    THEN the error is raised, and the records are read from the disk again, without the booking
+    """
+    if backend == "json":
+        data_storage = JsonStorage(*json_files)
+    elif backend == "sharded":
+        data_storage = ShardedStorage(str(tmp_path / "data"))
+        data_storage.import_json(*json_files)
+    else:
+        data_storage = SnapshotStorage(str(tmp_path / "gudlft.snapshot"))
+        data_storage.import_json(*json_files)
+    make_repository = getattr(data_storage, "make_repository", Repository)
+    repository = make_repository(data_storage.load_clubs(), data_storage.load_competitions())
+    club = repository.update_club("Simply Lift", points=10)
+    competition = repository.update_competition("Spring Festival", number_of_places=24)
+    monkeypatch.setattr("storage.write_json", failing_write)
+    monkeypatch.setattr("storage.write_snapshot", failing_write)
+
+    with pytest.raises(OSError):
+        data_storage.save_bookings(repository, [(club, competition)])
+
+    assert data_storage.load_clubs()[0].points == 13
+    assert data_storage.load_competitions()[0].number_of_places == 25
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from jinja2 import DictLoader, Environment
+
+import server
+from server import app, create_app
+from template_cache import SharedBytecodeCache
+
+TEMPLATES = {"page.html": "<h1>{{ title }}</h1>{% for item in items %}<p>{{ item }}</p>{% endfor %}"}
+
+
+def refuse_compile(*args, **kwargs):
+    raise AssertionError("The template was compiled.")
+
+
+def test_bytecode_shared_by_environments(tmp_path):
+    """
+    GIVEN a template compiled by one environment (e.g. one worker) into the bytecode cache
+    WHEN another environment with the same cache loads it
+    THEN it loads its bytecode instead of compiling it
+    """
+    first = Environment(loader=DictLoader(TEMPLATES), bytecode_cache=SharedBytecodeCache(str(tmp_path / "cache")))
+    first.get_template("page.html")
+    second = Environment(loader=DictLoader(TEMPLATES), bytecode_cache=SharedBytecodeCache(str(tmp_path / "cache")))
+    second.compile = refuse_compile
+
+    assert second.get_template("page.html").render(title="Clubs", items=[1]) == "<h1>Clubs</h1><p>1</p>"
+    # Only the cache file itself: the temporary file was renamed.
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+
+@pytest.fixture
+def template_cache_dir(tmp_path):
+    config = dict(app.config)
+    yield str(tmp_path / "templates")
+    app.config.clear()
+    app.config.update(config)
+    server.configure_app(app.config)
+
+
+def test_compile_templates_command(template_cache_dir):
+    """
+    GIVEN the templates of the app
+    WHEN `flask compile-templates` is run
+    THEN all of them are compiled into the cache
+    """
+    result = app.test_cli_runner().invoke(args=["compile-templates", "--directory", template_cache_dir])
+
+    assert result.exit_code == 0
+    assert len(os.listdir(template_cache_dir)) == len(server.PAGE_TEMPLATES)
+
+
+def test_templates_loaded_by_create_app(template_cache_dir):
+    """
+    GIVEN the app created with a template cache
+    WHEN the first page is asked
+    THEN its templates were loaded at startup: none is compiled by the request
+    """
+    app.jinja_env.cache.clear()
+    client = create_app(dict(TEMPLATE_CACHE_DIR=template_cache_dir)).test_client()
+    app.jinja_env.compile = refuse_compile
+    try:
+        response = client.get("/")
+    finally:
+        del app.jinja_env.compile
+
+    assert response.status_code == 200
+    assert os.listdir(template_cache_dir)